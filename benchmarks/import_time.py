@@ -0,0 +1,56 @@
+"""This benchmark measures how long importing the scripts takes, e.g. before `--help` is shown or a cached run starts.
+It runs every import in a fresh interpreter with `-X importtime` and fails if a heavy dependency is imported at
+module load or an import takes longer than the budget.
+
+Run it from the project directory:
+    python -m benchmarks.import_time --max_seconds 1.0
+"""
+import argparse
+import sys
+
+from tests.import_time import heavy_imports, import_times
+
+MODULES = ("translate_lecture", "subtitles_en", "subtitles_en_original")
+
+
+def main(max_seconds: float, top: int) -> None:
+    failures = []
+    for module in MODULES:
+        times = import_times(module)
+        total = times[module]
+        heavy = heavy_imports(times)
+        print(f"{module}: {total:.3f} s")
+        for name, seconds in sorted(times.items(), key=lambda item: -item[1])[
+            1 : top + 1
+        ]:
+            print(f"    {name:<40} {seconds:.3f} s")
+
+        if heavy:
+            failures.append(f"{module} imports {', '.join(heavy)} at module load")
+        if total > max_seconds:
+            failures.append(
+                f"{module} takes {total:.3f} s to import, more than {max_seconds} s"
+            )
+
+    if failures:
+        print("\n".join(failures), file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--max_seconds",
+        help="the maximum import time of every script",
+        type=float,
+        default=1.0,
+    )
+    parser.add_argument(
+        "--top",
+        help="the number of slowest imports shown per script",
+        type=int,
+        default=5,
+    )
+    args = parser.parse_args()
+
+    main(args.max_seconds, args.top)
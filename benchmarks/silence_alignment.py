@@ -0,0 +1,155 @@
+"""This benchmark compares the alignment of whisper segments and silences with the former implementation.
+It checks that both return the same segments on random lectures and measures how both scale with the number of
+segments.
+
+Run it from the project directory:
+    python -m benchmarks.silence_alignment --cases 2000 --segments 10000 100000 300000
+"""
+import argparse
+import copy
+import random
+import time
+
+from src.silence import Silence
+from tests.legacy_alignment import LegacyAlignment, run
+
+
+def make_lecture(
+    segments: int, generator: random.Random, degenerate: float, position: float = 0.0
+) -> tuple:
+    """Creates whisper segments and silences in seconds, similar to a lecture. Some segments are separated by gaps,
+    some contain silences and a few are empty, very short or contain `...`.
+
+    Args:
+        segments (int): The number of whisper segments.
+        generator (random.Random): The random number generator.
+        degenerate (float): The probability of an empty or very short segment.
+        position (float, optional): The start of the lecture in seconds. Defaults to 0.
+    """
+    whisper_segments = []
+    silences = []
+    for _ in range(segments):
+        if generator.random() < 0.3:
+            gap = generator.choice([0.05, 0.1, 0.5, generator.uniform(0, 5)])
+            if gap >= 1 and generator.random() < 0.8:
+                silences.append({"start": position, "end": position + gap})
+            position += gap
+
+        if generator.random() < degenerate:
+            duration = generator.choice([0.0, 0.01, 0.3])
+        else:
+            duration = generator.uniform(2, 20)
+        start = round(position, generator.choice([2, 3]))
+        end = round(position + duration, generator.choice([2, 3]))
+        text = "..." if generator.random() < 0.02 else f" word {len(whisper_segments)}"
+        whisper_segments.append({"start": start, "end": end, "text": text})
+
+        # silences inside the segment, at its start or end, or crossing into the next segment
+        silence_start = position
+        while generator.random() < 0.4:
+            silence_start += generator.uniform(0, duration / 2 + 0.5)
+            length = generator.uniform(1, 2.5)
+            silences.append(
+                {
+                    "start": round(silence_start, 3),
+                    "end": round(silence_start + length, 3),
+                }
+            )
+            silence_start += length
+        position = max(position + duration, silence_start)
+
+    return whisper_segments, silences
+
+
+def make_long_lecture(segments: int, generator: random.Random) -> tuple:
+    """Joins short random lectures the alignment accepts to a long lecture, since a single invalid segment stops the
+    alignment."""
+    whisper_segments = []
+    silences = []
+    position = 0.0
+    while len(whisper_segments) < segments:
+        part = make_lecture(60, generator, degenerate=0, position=position)
+        if isinstance(run(Silence.align_silences, *part, 30), str):
+            continue
+        whisper_segments.extend(part[0])
+        silences.extend(part[1])
+        position = float(int(max(part[0][-1]["end"], position)) + 10)
+
+    return whisper_segments[:segments], silences
+
+
+def check_equivalence(cases: int, seed: int = 0) -> None:
+    """Compares both alignments on random lectures, including lectures both alignments reject."""
+    generator = random.Random(seed)
+    rejected = 0
+    for case in range(cases):
+        segments, silences = make_lecture(
+            generator.randint(0, 40), generator, degenerate=generator.choice([0, 0.05])
+        )
+        max_duration = generator.choice([None, 5, 30, 30, 30])
+        expected = run(LegacyAlignment.align, segments, silences, max_duration)
+        actual = run(Silence.align_silences, segments, silences, max_duration)
+        assert actual == expected, (case, segments, silences, max_duration)
+        rejected += isinstance(expected, str)
+    print(
+        f"Both alignments return the same segments for {cases} random lectures ({rejected} rejected by both)."
+    )
+
+
+def measure(function, segments: list, silences: list) -> tuple:
+    """Returns the result and the duration of an alignment in seconds."""
+    segments, silences = copy.deepcopy(segments), copy.deepcopy(silences)
+    start = time.perf_counter()
+    result = function(segments, silences, 30)
+    return result, time.perf_counter() - start
+
+
+def main(cases: int, lengths: list, skip_legacy: bool) -> None:
+    check_equivalence(cases)
+
+    generator = random.Random(1)
+    for length in lengths:
+        segments, silences = make_long_lecture(length, generator)
+        try:
+            result, duration = measure(Silence.align_silences, segments, silences)
+        except RuntimeError:
+            print(f"{length:>7} segments: skipped, the random lecture is invalid")
+            continue
+
+        line = (
+            f"{length:>7} segments, {len(silences):>6} silences: sweep {duration:.3f} s"
+        )
+        if not skip_legacy:
+            expected, legacy_duration = measure(
+                LegacyAlignment.align, segments, silences
+            )
+            assert result == expected
+            line += (
+                f", former {legacy_duration:.3f} s ({legacy_duration / duration:.1f}x)"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--cases",
+        help="the number of random lectures compared",
+        type=int,
+        default=2000,
+    )
+    parser.add_argument(
+        "--segments",
+        help="the numbers of whisper segments of the measured lectures",
+        type=int,
+        nargs="+",
+        default=[10000, 100000, 300000],
+    )
+    parser.add_argument(
+        "--skip_legacy",
+        help="only measure the sweep, e.g. for very long lectures",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    main(args.cases, args.segments, args.skip_legacy)
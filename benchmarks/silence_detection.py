@@ -0,0 +1,181 @@
+"""This benchmark compares the numpy silence detection with `pydub.silence.detect_silence`.
+It checks that both return the same silences on synthetic lectures and measures the time of both.
+It also checks the chunked detection over a memory-mapped wav file and measures how it scales with the number of
+worker processes.
+
+Run it from the project directory:
+    python -m benchmarks.silence_detection --minutes 1 5 --silence_duration 1 --workers 1 2 4
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+import pydub.silence
+import soundfile as sf
+
+from src.silence_detector import CHUNK_LENGTH, detect_silence
+from utils.audio import DecodedAudio
+
+
+def make_lecture(
+    minutes: float, sample_rate: int = 44100, channels: int = 2, seed: int = 0
+) -> DecodedAudio:
+    """Creates noise of different loudness with pauses of different lengths, similar to speech."""
+    generator = np.random.default_rng(seed)
+    frames = int(minutes * 60 * sample_rate)
+    samples = np.zeros((frames, channels), dtype=np.int16)
+
+    position = 0
+    while position < frames:
+        speech = int(generator.uniform(0.2, 8) * sample_rate)
+        loudness = generator.choice([20, 200, 3000])
+        end = min(position + speech, frames)
+        samples[position:end] = generator.normal(
+            0, loudness, (end - position, channels)
+        ).astype(np.int16)
+        # the pauses contain some quiet noise, a few of them are close to the threshold
+        position = end + int(generator.uniform(0.05, 3) * sample_rate)
+        quiet = generator.choice([0, 2, 8])
+        samples[end : min(position, frames)] = generator.normal(
+            0, quiet, (min(position, frames) - end, channels)
+        ).astype(np.int16)
+
+    return DecodedAudio(samples, sample_rate)
+
+
+def check_equivalence(silence_duration: int, silence_threshold: float) -> None:
+    """Compares both detectors on short audio of several formats and lengths."""
+    for seed, (sample_rate, channels) in enumerate(
+        [(44100, 2), (44100, 1), (16000, 1), (22050, 2), (48000, 2)]
+    ):
+        for minutes in (0.01, 0.2, 0.5):
+            audio = make_lecture(minutes, sample_rate, channels, seed=seed)
+            expected = pydub.silence.detect_silence(
+                audio.to_audio_segment(), silence_duration, silence_threshold
+            )
+            actual = detect_silence(audio, silence_duration, silence_threshold)
+            assert actual == expected, (sample_rate, channels, minutes)
+    print("numpy and pydub detect the same silences.")
+
+    # chunks shorter than the silences, so silences cross the borders of several chunks
+    audio = make_lecture(0.5, seed=1)
+    expected = pydub.silence.detect_silence(
+        audio.to_audio_segment(), silence_duration, silence_threshold
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        mapped = write_wav(audio, directory)
+        for chunk_length in (1, silence_duration // 3, silence_duration, 2999):
+            for workers in (1, 2):
+                actual = detect_silence(
+                    mapped, silence_duration, silence_threshold, chunk_length, workers
+                )
+                assert actual == expected, (chunk_length, workers)
+    print("The chunked detection detects the same silences.")
+
+
+def write_wav(audio: DecodedAudio, directory: str) -> DecodedAudio:
+    """Writes the audio to a wav file and maps it from there."""
+    path = os.path.join(directory, "lecture.wav")
+    sf.write(path, audio.samples, audio.sample_rate, subtype="PCM_16")
+    return DecodedAudio.from_file(path, audio.sample_rate, audio.channels)
+
+
+def measure(function, *args) -> tuple:
+    """Returns the result and the duration of a call in seconds."""
+    start = time.perf_counter()
+    result = function(*args)
+    return result, time.perf_counter() - start
+
+
+def main(
+    minutes: list,
+    silence_duration: float,
+    silence_threshold: float,
+    skip_pydub: bool,
+    workers: list,
+) -> None:
+    silence_duration = int(silence_duration * 1000)
+    check_equivalence(silence_duration, silence_threshold)
+
+    for length in minutes:
+        audio = make_lecture(length)
+        silences, numpy_time = measure(
+            detect_silence, audio, silence_duration, silence_threshold
+        )
+        line = f"{length:>6} min: numpy {numpy_time:.3f} s"
+        if not skip_pydub:
+            expected, pydub_time = measure(
+                pydub.silence.detect_silence,
+                audio.to_audio_segment(),
+                silence_duration,
+                silence_threshold,
+            )
+            assert silences == expected
+            line += f", pydub {pydub_time:.3f} s ({pydub_time / numpy_time:.1f}x)"
+        print(f"{line}, {len(silences)} silences")
+
+        with tempfile.TemporaryDirectory() as directory:
+            mapped = write_wav(audio, directory)
+            del audio
+            baseline = None
+            for count in workers:
+                result, duration = measure(
+                    detect_silence,
+                    mapped,
+                    silence_duration,
+                    silence_threshold,
+                    CHUNK_LENGTH,
+                    count,
+                )
+                assert result == silences
+                baseline = baseline or duration
+                print(
+                    f"{'':>10} {count:>2} workers: {duration:.3f} s ({baseline / duration:.2f}x)"
+                )
+            del mapped
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--minutes",
+        help="the lengths of the synthetic lectures",
+        type=float,
+        nargs="+",
+        default=[1, 5],
+    )
+    parser.add_argument(
+        "--silence_duration",
+        help="the minimum duration of silence in seconds",
+        type=float,
+        default=1,
+    )
+    parser.add_argument(
+        "--silence_threshold",
+        help="the silence threshold in dBFS",
+        type=float,
+        default=-50,
+    )
+    parser.add_argument(
+        "--skip_pydub",
+        help="only measure the numpy detection, e.g. for long lectures",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--workers",
+        help="the numbers of processes scanning the memory-mapped wav file",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4],
+    )
+    args = parser.parse_args()
+
+    main(
+        args.minutes,
+        args.silence_duration,
+        args.silence_threshold,
+        args.skip_pydub,
+        args.workers,
+    )
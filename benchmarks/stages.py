@@ -0,0 +1,469 @@
+"""This benchmark measures the stages of the pipeline on synthetic lectures of several lengths.
+The lectures are generated locally: harmonic tones and noise as speech, with pauses of digital silence at known
+positions. Whisper and TTS are replaced by stub models, so the benchmark measures the code of this project and not
+the models. If ffmpeg is installed, a test video is generated for every lecture and the ffmpeg wrappers are measured
+too.
+
+The results are written as json. Pass the results of another commit as baseline to compare both:
+    python -m benchmarks.stages --minutes 1 10 30 --output before.json
+    python -m benchmarks.stages --minutes 1 10 30 --output after.json --baseline before.json --max_regression 1.2
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import soundfile as sf
+
+from src import silence as silence_module
+from src import speaker as speaker_module
+from src import tts_wrapper
+from src.silence import Silence
+from src.speaker import SegmentsSpeaker
+from src.subtitles import write_subtitles
+from utils import file_handler
+from utils.audio import DecodedAudio
+from utils.cache import DiskCache
+from utils.time_stretch import PHASE_VOCODER, WSOLA
+
+SAMPLE_RATE = 44100
+SILENCE_DURATION = 1
+SILENCE_THRESHOLD = -50
+WORDS = (
+    "the search algorithm expands every node of the frontier until it reaches the goal and a heuristic "
+    "estimates the remaining cost so fewer nodes have to be expanded"
+).split()
+
+
+class StubWhisperModel:
+    """Transcribes a synthetic lecture like whisper: every speech interval is split into segments of a few seconds
+    with about two words per second."""
+
+    def __init__(self, speech: list, seed: int = 0):
+        self.speech = speech
+        self.seed = seed
+
+    def transcribe(self, audio=None, **kwargs) -> dict:
+        generator = np.random.default_rng(self.seed)
+        segments = []
+        for start, end in self.speech:
+            position = start
+            while position < end:
+                segment_end = min(position + generator.uniform(2, 6), end)
+                words = generator.choice(
+                    WORDS, size=max(1, int(2 * (segment_end - position)))
+                )
+                segments.append(
+                    {
+                        "id": len(segments),
+                        "start": round(position, 2),
+                        "end": round(segment_end, 2),
+                        "text": " " + " ".join(words) + ".",
+                    }
+                )
+                position = segment_end
+        return {"segments": segments, "language": "en"}
+
+
+class StubTTS:
+    """Synthesizes a tone of 60 ms per character, about as long as the speech of the TTS model. It has the
+    interface of `TTS.api.TTS` used by `tts_wrapper`."""
+
+    class Synthesizer:
+        output_sample_rate = 22050
+        vocoder_model = None
+
+    def __init__(self):
+        self.synthesizer = self.Synthesizer()
+        t = (
+            np.arange(self.synthesizer.output_sample_rate)
+            / self.synthesizer.output_sample_rate
+        )
+        self._tone = (0.3 * np.sin(2 * np.pi * 150 * t)).astype(np.float32)
+
+    def tts(self, text: str) -> np.ndarray:
+        frames = int(0.06 * len(text) * self.synthesizer.output_sample_rate)
+        return np.resize(self._tone, frames)
+
+
+class NullCache:
+    """A TTS cache that stores nothing, so the speakers measure synthesis and assembly without writing the cache."""
+
+    def get(self, key: str, default=None):
+        return default
+
+    def put(self, key: str, value, evict: bool = True) -> None:
+        pass
+
+    def evict(self) -> None:
+        pass
+
+
+def make_lecture(minutes: float, path: str, seed: int = 0) -> tuple:
+    """Writes a stereo 16 bit lecture to a wav file. Speech alternates with short pauses, which are not silences, and
+    long pauses, which are. The audio is written interval by interval, so long lectures fit in memory.
+
+    Returns:
+        tuple: The speech intervals and the silences longer than `SILENCE_DURATION`, both in seconds.
+    """
+    generator = np.random.default_rng(seed)
+    frames = int(minutes * 60 * SAMPLE_RATE)
+    speech, silences = [], []
+
+    with sf.SoundFile(
+        path, "w", samplerate=SAMPLE_RATE, channels=2, subtype="PCM_16"
+    ) as f:
+        position = 0
+        while position < frames:
+            length = min(int(generator.uniform(3, 20) * SAMPLE_RATE), frames - position)
+            t = np.arange(length) / SAMPLE_RATE
+            pitch = generator.uniform(100, 250)
+            y = 0.2 * np.sin(2 * np.pi * pitch * t) + generator.normal(0, 0.02, length)
+            y *= 0.6 + 0.4 * np.sin(2 * np.pi * generator.uniform(2, 6) * t)
+            f.write(np.repeat(y[:, None], 2, axis=1))
+            speech.append((position / SAMPLE_RATE, (position + length) / SAMPLE_RATE))
+            position += length
+
+            pause = generator.choice([0.3, 0.6, 1.5, 3.0])
+            pause = min(int(pause * SAMPLE_RATE), frames - position)
+            f.write(np.zeros((pause, 2)))
+            if pause >= SILENCE_DURATION * SAMPLE_RATE:
+                silences.append(
+                    (position / SAMPLE_RATE, (position + pause) / SAMPLE_RATE)
+                )
+            position += pause
+
+    return speech, silences
+
+
+def make_video(audio_path: str, path: str) -> None:
+    """Writes a small test video with the lecture as audio track using ffmpeg."""
+    duration = sf.info(audio_path).duration
+    subprocess.run(
+        [
+            "ffmpeg",
+            "-y",
+            "-f",
+            "lavfi",
+            "-i",
+            f"testsrc=size=320x240:rate=5:duration={duration}",
+            "-i",
+            audio_path,
+            "-c:v",
+            "libx264",
+            "-preset",
+            "ultrafast",
+            "-c:a",
+            "aac",
+            "-shortest",
+            path,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+        ],
+        check=True,
+    )
+
+
+def measure(function, repeats: int, setup=None) -> list:
+    """Returns the durations of several calls in seconds. One call before them warms up imports, compiled code and
+    caches and is not measured. The setup runs before every call and is not measured either.
+    """
+    if setup:
+        setup()
+    function()
+
+    durations = []
+    for _ in range(repeats):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def remove(*paths) -> None:
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def check_silences(detected: list, expected: list) -> None:
+    """Checks that the detection finds the known silences, up to the 10 ms steps of the detection."""
+    assert len(detected) == len(expected), (len(detected), len(expected))
+    for found, (start, end) in zip(detected, expected):
+        assert abs(found["start"] - start) < 0.02, (found, start)
+        assert abs(found["end"] - end) < 0.02, (found, end)
+
+
+def benchmark_lecture(minutes: float, repeats: int, directory: Path, ffmpeg: bool):
+    """Measures every stage on a lecture of the given length and yields the name and the durations of each stage."""
+    audio_path = str(directory / "lecture.wav")
+    speech, silences = make_lecture(minutes, audio_path)
+    audio = DecodedAudio.from_file(audio_path)
+    result = StubWhisperModel(speech).transcribe(audio)
+    output = str(directory / "output.wav")
+
+    detected = Silence.get_silence_segments_pydub(
+        audio, SILENCE_DURATION, SILENCE_THRESHOLD
+    )
+    check_silences(detected, silences)
+    yield "silence_detection", measure(
+        lambda: Silence.get_silence_segments_pydub(
+            audio, SILENCE_DURATION, SILENCE_THRESHOLD
+        ),
+        repeats,
+    )
+
+    segments = Silence.add_silence_segments_pydub_whisper(
+        result["segments"], audio, SILENCE_DURATION, SILENCE_THRESHOLD
+    )
+    yield "silence_alignment", measure(
+        lambda: Silence.add_silence_segments_pydub_whisper(
+            result["segments"], audio, SILENCE_DURATION, SILENCE_THRESHOLD
+        ),
+        repeats,
+    )
+
+    # the lecture audio stands in for the video, its length is read from the wav header
+    # the cached speaker fills its cache in the warm-up call
+    for stage, streaming, method, cache in (
+        ("speak", False, PHASE_VOCODER, NullCache()),
+        ("speak_wsola", False, WSOLA, NullCache()),
+        ("speak_streaming", True, PHASE_VOCODER, NullCache()),
+        (
+            "speak_cached",
+            False,
+            PHASE_VOCODER,
+            DiskCache(directory / "tts_cache", max_bytes=1 << 40),
+        ),
+    ):
+        speaker = SegmentsSpeaker(
+            "lecture_translated",
+            segments,
+            video_file=audio_path,
+            streaming=streaming,
+            stretch_method=method,
+            cache=cache,
+        )
+        yield stage, measure(lambda: speaker.speak(use_gpu=False), repeats)
+
+    length = audio.duration * 0.9
+    for stage, method in (
+        ("adjust_audio_length", PHASE_VOCODER),
+        ("adjust_audio_length_wsola", WSOLA),
+    ):
+        yield stage, measure(
+            lambda: file_handler.adjust_audio_length(
+                audio_path, length, output_path=output, method=method
+            ),
+            repeats,
+        )
+
+    outputs = {
+        key: str(directory / f"lecture.{key}") for key in ("srt", "vtt", "txt", "json")
+    }
+    yield "subtitles", measure(lambda: write_subtitles(segments, outputs), repeats)
+
+    if not ffmpeg:
+        return
+
+    video = str(directory / "lecture.mp4")
+    make_video(audio_path, video)
+    silent_video = str(directory / "silent.mp4")
+    merged = str(directory / "merged.mp4")
+    embedded = str(directory / "embedded.mp4")
+    yield "split_video", measure(
+        lambda: file_handler.split_video(
+            video, video_output_path=silent_video, audio_output_path=output
+        ),
+        repeats,
+    )
+    yield "merge_audio_and_video", measure(
+        lambda: file_handler.merge_audio_and_video_to_mp4(
+            silent_video, audio_path, output_path=merged
+        ),
+        repeats,
+    )
+    yield "mux_translated_video", measure(
+        lambda: file_handler.mux_translated_video(
+            silent_video, audio_path, outputs["srt"], "eng", output_path=merged
+        ),
+        repeats,
+    )
+    # embedding does not overwrite its output
+    yield "embed_subtitles", measure(
+        lambda: file_handler.embed_subtitles_in_mp4(
+            video, outputs["srt"], "eng", output_path=embedded
+        ),
+        repeats,
+        setup=lambda: remove(embedded),
+    )
+
+
+def environment() -> dict:
+    """Returns the commit and the machine the benchmark runs on, to tell results apart."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = bool(
+            subprocess.run(
+                ["git", "status", "--porcelain", "--untracked-files=no"],
+                capture_output=True,
+                text=True,
+            ).stdout.strip()
+        )
+    except (OSError, subprocess.CalledProcessError):
+        commit, dirty = None, None
+
+    return {
+        "commit": commit,
+        "dirty": dirty,
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "ffmpeg": shutil.which("ffmpeg") is not None,
+    }
+
+
+def compare(results: list, baseline_path: str) -> list:
+    """Prints the ratio of every stage to the baseline and returns the ratios."""
+    with open(baseline_path, "r") as f:
+        baseline = {
+            (entry["stage"], entry["minutes"]): entry
+            for entry in json.load(f)["results"]
+        }
+
+    ratios = []
+    print(f"\ncompared with {baseline_path}:")
+    for entry in results:
+        before = baseline.get((entry["stage"], entry["minutes"]))
+        if before is None:
+            continue
+        ratio = entry["min"] / before["min"]
+        ratios.append((entry["stage"], entry["minutes"], ratio))
+        print(
+            f"{entry['stage']:<26} {entry['minutes']:>6} min: "
+            f"{before['min']:.3f} s -> {entry['min']:.3f} s ({ratio:.2f}x)"
+        )
+    return ratios
+
+
+def main(
+    minutes: list,
+    repeats: int,
+    output: str,
+    baseline: str,
+    max_regression: float,
+    skip_ffmpeg: bool,
+) -> None:
+    ffmpeg = not skip_ffmpeg and shutil.which("ffmpeg") is not None
+    if not ffmpeg:
+        print("ffmpeg is not used, the ffmpeg wrappers are not measured.")
+
+    stub = StubTTS()
+    results = []
+    with tempfile.TemporaryDirectory() as directory, mock.patch.object(
+        tts_wrapper, "get_model", lambda model_name=None, gpu=True: stub
+    ), mock.patch.object(
+        silence_module, "VARIABLE_DIRECTORY", Path(directory)
+    ), mock.patch.object(
+        speaker_module, "AUDIO_TRANSLATED_SPEED_DIRECTORY", Path(directory)
+    ):
+        for length in minutes:
+            lecture_directory = Path(directory) / f"{length}"
+            lecture_directory.mkdir()
+            for stage, durations in benchmark_lecture(
+                length, repeats, lecture_directory, ffmpeg
+            ):
+                entry = {
+                    "stage": stage,
+                    "minutes": length,
+                    "seconds": durations,
+                    "min": min(durations),
+                    "median": statistics.median(durations),
+                    # the time per second of lecture audio
+                    "realtime_factor": min(durations) / (length * 60),
+                }
+                results.append(entry)
+                print(
+                    f"{stage:<26} {length:>6} min: {entry['min']:.3f} s "
+                    f"(median {entry['median']:.3f} s, rtf {entry['realtime_factor']:.5f})"
+                )
+            shutil.rmtree(lecture_directory)
+
+    with open(output, "w") as f:
+        json.dump({"environment": environment(), "results": results}, f, indent=2)
+    print(f"The results were written to {output}.")
+
+    if baseline:
+        regressions = [
+            f"{stage} at {length} min is {ratio:.2f}x slower"
+            for stage, length, ratio in compare(results, baseline)
+            if ratio > max_regression
+        ]
+        if regressions:
+            print("\n".join(regressions), file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--minutes",
+        help="the lengths of the synthetic lectures",
+        type=float,
+        nargs="+",
+        default=[1, 10, 30],
+    )
+    parser.add_argument(
+        "--repeats",
+        help="the number of measurements of every stage, the fastest is compared",
+        type=int,
+        default=3,
+    )
+    parser.add_argument(
+        "--output",
+        help="the json file the results are written to",
+        type=str,
+        default="benchmark_stages.json",
+    )
+    parser.add_argument(
+        "--baseline",
+        help="the json results of another commit to compare with",
+        type=str,
+        default=None,
+    )
+    parser.add_argument(
+        "--max_regression",
+        help="the ratio to the baseline above which a stage fails",
+        type=float,
+        default=1.2,
+    )
+    parser.add_argument(
+        "--skip_ffmpeg",
+        help="do not measure the ffmpeg wrappers, even if ffmpeg is installed",
+        action="store_true",
+    )
+    args = parser.parse_args()
+
+    main(
+        args.minutes,
+        args.repeats,
+        args.output,
+        args.baseline,
+        args.max_regression,
+        args.skip_ffmpeg,
+    )
@@ -0,0 +1,155 @@
+"""This benchmark compares writing subtitles with the former writers of `Transcriber`, which printed and flushed every
+cue. It checks that the srt, vtt and txt files are the same and measures writing all formats in one pass.
+
+Run it from the project directory:
+    python -m benchmarks.subtitle_writing --segments 100000
+"""
+import argparse
+import filecmp
+import json
+import os
+import random
+import tempfile
+import time
+
+from src.segments import SegmentTable
+from src.subtitles import write_subtitles
+
+
+class LegacyWriters:
+    """The writers of `Transcriber` before the subtitle module, without the logging."""
+
+    @classmethod
+    def write_vtt(cls, result, output_dir):
+        with open(str(output_dir), "w") as f:
+            print("WEBVTT\n", file=f)
+            for segment in result["segments"]:
+                print(
+                    f"{cls._format_timestamp(segment['start'])} --> {cls._format_timestamp(segment['end'])}\n"
+                    f"{segment['text'].strip().replace('-->', '->')}\n",
+                    file=f,
+                    flush=True,
+                )
+
+    @classmethod
+    def write_srt(cls, result: dict, output_dir: str):
+        with open(str(output_dir), "w") as f:
+            for i, segment in enumerate(result["segments"], start=1):
+                print(
+                    f"{i}\n"
+                    f"{cls._format_timestamp(segment['start'], always_include_hours=True, decimal_marker=',')} --> "
+                    f"{cls._format_timestamp(segment['end'], always_include_hours=True, decimal_marker=',')}\n"
+                    f"{segment['text'].strip().replace('-->', '->')}\n",
+                    file=f,
+                    flush=True,
+                )
+
+    @classmethod
+    def write_txt(cls, result: dict, output_dir: str):
+        with open(str(output_dir), "w") as f:
+            for segment in result["segments"]:
+                print(
+                    segment["text"].strip(),
+                    file=f,
+                    flush=True,
+                )
+
+    @classmethod
+    def _format_timestamp(
+        cls,
+        seconds: float,
+        always_include_hours: bool = False,
+        decimal_marker: str = ".",
+    ):
+        assert seconds >= 0, "non-negative timestamp expected"
+        milliseconds = round(seconds * 1000.0)
+
+        hours = milliseconds // 3_600_000
+        milliseconds -= hours * 3_600_000
+
+        minutes = milliseconds // 60_000
+        milliseconds -= minutes * 60_000
+
+        seconds = milliseconds // 1_000
+        milliseconds -= seconds * 1_000
+
+        hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
+        return f"{hours_marker}{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+
+
+def make_result(segments: int, seed: int = 0) -> dict:
+    """Creates a whisper result with timestamps beyond an hour, timestamps ending in half milliseconds and texts with
+    surrounding whitespace and arrows."""
+    generator = random.Random(seed)
+    position = 0.0
+    result = []
+    for i in range(segments):
+        start = position + generator.choice(
+            [0, 0.0005, 0.0015, generator.uniform(0, 2)]
+        )
+        end = start + generator.uniform(0.5, 12)
+        text = f" segment {i} --> {'ä' * (i % 3)} "
+        result.append({"start": start, "end": end, "text": text})
+        position = end
+    return {"segments": result}
+
+
+def main(segments: int) -> None:
+    result = make_result(segments)
+
+    with tempfile.TemporaryDirectory() as directory:
+        legacy = {
+            key: os.path.join(directory, f"legacy.{key}")
+            for key in ("srt", "vtt", "txt")
+        }
+        start = time.perf_counter()
+        LegacyWriters.write_srt(result, legacy["srt"])
+        LegacyWriters.write_vtt(result, legacy["vtt"])
+        LegacyWriters.write_txt(result, legacy["txt"])
+        legacy_duration = time.perf_counter() - start
+
+        outputs = {
+            key: os.path.join(directory, f"new.{key}") for key in ("srt", "vtt", "txt")
+        }
+        start = time.perf_counter()
+        write_subtitles(result, outputs)
+        duration = time.perf_counter() - start
+
+        for key in outputs:
+            assert filecmp.cmp(legacy[key], outputs[key], shallow=False), key
+
+        # a table and a generator are written the same way
+        table = SegmentTable.from_whisper(result)
+        generated = (segment for segment in result["segments"])
+        for source in (table, generated):
+            write_subtitles(source, {"srt": os.path.join(directory, "other.srt")})
+            assert filecmp.cmp(
+                legacy["srt"], os.path.join(directory, "other.srt"), shallow=False
+            )
+
+        json_path = os.path.join(directory, "new.json")
+        start = time.perf_counter()
+        write_subtitles(result, dict(outputs, json=json_path))
+        all_duration = time.perf_counter() - start
+        with open(json_path, encoding="utf-8") as f:
+            assert len(json.load(f)) == segments
+
+    print(f"The srt, vtt and txt files equal the former files for {segments} segments.")
+    print(f"former writers, srt vtt txt: {legacy_duration:.3f} s")
+    print(
+        f"one pass, srt vtt txt:       {duration:.3f} s ({legacy_duration / duration:.1f}x)"
+    )
+    print(f"one pass, srt vtt txt json:  {all_duration:.3f} s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--segments",
+        help="the number of segments",
+        type=int,
+        default=100000,
+    )
+    args = parser.parse_args()
+
+    main(args.segments)
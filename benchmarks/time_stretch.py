@@ -0,0 +1,149 @@
+"""This benchmark measures how long fitting synthesized segments to their durations takes.
+It compares the former round trip through a file, which also resampled to 22050 Hz, with the phase vocoder and WSOLA
+in memory. It also stretches a whole lecture in one call and in blocks, and compares the peak memory of both.
+
+Run it from the project directory:
+    python -m benchmarks.time_stretch --segments 50 --sample_rate 22050 --lecture_minutes 5
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+import librosa
+import numpy as np
+import soundfile as sf
+
+from utils.time_stretch import (
+    PHASE_VOCODER,
+    WSOLA,
+    stretch_file,
+    stretch_to_length,
+    time_stretch,
+)
+
+
+def make_segments(segments: int, sample_rate: int, seed: int = 0) -> list:
+    """Creates harmonic tones with a changing pitch and loudness, similar to synthesized speech, and the durations
+    they have to be fitted to."""
+    generator = np.random.default_rng(seed)
+    result = []
+    for _ in range(segments):
+        length = generator.uniform(1, 15)
+        t = np.arange(int(length * sample_rate)) / sample_rate
+        pitch = 120 + 40 * np.sin(2 * np.pi * generator.uniform(0.2, 2) * t)
+        phase = 2 * np.pi * np.cumsum(pitch) / sample_rate
+        y = sum(np.sin(h * phase) / h for h in range(1, 6))
+        y *= 0.2 * (0.6 + 0.4 * np.sin(2 * np.pi * 4 * t))
+        result.append((y.astype(np.float32), length * generator.uniform(0.7, 1.4)))
+    return result
+
+
+def file_round_trip(y: np.ndarray, sample_rate: int, length: float, directory: str):
+    """The former way: write the segment, load it with librosa and write the stretched segment again."""
+    path = os.path.join(directory, "segment.wav")
+    sf.write(path, y, sample_rate)
+    loaded, loaded_sr = librosa.load(path)
+    factor = (len(loaded) / loaded_sr) / length
+    sf.write(path, librosa.effects.time_stretch(loaded, rate=factor), loaded_sr)
+    return sf.read(path)[0]
+
+
+def measure_peak(function, *args, **kwargs) -> tuple:
+    """Returns the result, the duration in seconds and the peak memory in MB allocated by a function."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    duration = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1] / 1e6
+    tracemalloc.stop()
+    return result, duration, peak
+
+
+def full_lecture(minutes: float, sample_rate: int) -> None:
+    """Stretches a synthetic lecture in one call of the phase vocoder and in blocks with WSOLA. The result of the
+    blocks must equal WSOLA on the whole lecture, apart from the 16 bit quantization of the file.
+    """
+    data = make_segments(int(minutes * 60 / 8) + 1, sample_rate, seed=1)
+    y = np.concatenate([segment for segment, _ in data])[
+        : int(minutes * 60 * sample_rate)
+    ]
+    length = len(y) / sample_rate * 0.9
+
+    with tempfile.TemporaryDirectory() as directory:
+        source = os.path.join(directory, "lecture.wav")
+        output = os.path.join(directory, "stretched.wav")
+        sf.write(source, y, sample_rate)
+        y = sf.read(source, dtype="float32")[0]
+
+        for method in (PHASE_VOCODER, WSOLA):
+            _, duration, peak = measure_peak(
+                time_stretch, y, len(y) / (length * sample_rate), sample_rate, method
+            )
+            print(
+                f"{method + ' whole lecture':>22}: {duration:.2f} s, {peak:.0f} MB peak"
+            )
+
+        _, duration, peak = measure_peak(stretch_file, source, output, length)
+        print(f"{'wsola in blocks':>22}: {duration:.2f} s, {peak:.0f} MB peak")
+
+        streamed = sf.read(output, dtype="float32")[0]
+        expected = stretch_to_length(y, sample_rate, length, method=WSOLA)
+        assert len(streamed) == len(expected)
+        assert np.abs(streamed - expected).max() < 1e-4
+
+
+def main(segments: int, sample_rate: int, lecture_minutes: float) -> None:
+    data = make_segments(segments, sample_rate)
+    audio_length = sum(len(y) for y, _ in data) / sample_rate
+
+    # warm up librosa
+    stretch_to_length(data[0][0], sample_rate, data[0][1], method=PHASE_VOCODER)
+
+    with tempfile.TemporaryDirectory() as directory:
+        start = time.perf_counter()
+        for y, length in data:
+            file_round_trip(y, sample_rate, length, directory)
+        baseline = time.perf_counter() - start
+    print(
+        f"{'file round trip':>22}: {baseline:.2f} s for {audio_length:.0f} s of audio"
+    )
+
+    for method in (PHASE_VOCODER, WSOLA):
+        start = time.perf_counter()
+        for y, length in data:
+            stretched = stretch_to_length(y, sample_rate, length, method=method)
+            assert len(stretched) == int(round(length * sample_rate))
+        duration = time.perf_counter() - start
+        print(
+            f"{method + ' in memory':>22}: {duration:.2f} s ({baseline / duration:.1f}x)"
+        )
+
+    if lecture_minutes > 0:
+        full_lecture(lecture_minutes, sample_rate)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--segments",
+        help="the number of synthetic segments",
+        type=int,
+        default=50,
+    )
+    parser.add_argument(
+        "--sample_rate",
+        help="the sample rate of the segments, e.g. of the TTS model",
+        type=int,
+        default=22050,
+    )
+    parser.add_argument(
+        "--lecture_minutes",
+        help="the length of the lecture stretched as a whole, 0 to skip it",
+        type=float,
+        default=5,
+    )
+    args = parser.parse_args()
+
+    main(args.segments, args.sample_rate, args.lecture_minutes)
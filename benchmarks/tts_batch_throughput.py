@@ -0,0 +1,68 @@
+"""This benchmark measures the TTS throughput in segments per second for several batch sizes.
+
+Run it from the project directory:
+    python -m benchmarks.tts_batch_throughput --segments 32 --batch_sizes 1 2 4 8 --disable_cuda
+"""
+import argparse
+import random
+import time
+
+from src import tts_wrapper
+
+WORDS = (
+    "the agent explores the search space and expands the node with the lowest estimated cost "
+    "until the goal is reached or the frontier is empty"
+).split()
+
+
+def make_texts(segments: int, seed: int = 0) -> list:
+    """Creates sentences of different lengths, similar to the text segments of a lecture."""
+    generator = random.Random(seed)
+    return [
+        " ".join(generator.choices(WORDS, k=generator.randint(5, 40))) + "."
+        for _ in range(segments)
+    ]
+
+
+def measure(texts: list, batch_size: int, gpu: bool) -> float:
+    """Returns the number of synthesized segments per second."""
+    order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+    start = time.perf_counter()
+    if batch_size == 1:
+        for i in order:
+            tts_wrapper.synthesize(tts_wrapper.TTS_MODEL_NAME, texts[i], gpu=gpu)
+    else:
+        for i in range(0, len(order), batch_size):
+            tts_wrapper.synthesize_batch(
+                tts_wrapper.TTS_MODEL_NAME,
+                [texts[j] for j in order[i : i + batch_size]],
+                gpu=gpu,
+            )
+    return len(texts) / (time.perf_counter() - start)
+
+
+def main(segments: int, batch_sizes: list, gpu: bool) -> None:
+    texts = make_texts(segments)
+    # load the model before measuring
+    tts_wrapper.get_model(tts_wrapper.TTS_MODEL_NAME, gpu=gpu)
+
+    baseline = None
+    for batch_size in batch_sizes:
+        throughput = measure(texts, batch_size, gpu)
+        baseline = baseline or throughput
+        print(
+            f"batch size {batch_size:>3}: {throughput:.2f} segments/s "
+            f"({throughput / baseline:.2f}x)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=32)
+    parser.add_argument("--batch_sizes", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--disable_cuda", action="store_true")
+    args = parser.parse_args()
+
+    main(
+        segments=args.segments, batch_sizes=args.batch_sizes, gpu=not args.disable_cuda
+    )
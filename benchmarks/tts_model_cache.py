@@ -0,0 +1,66 @@
+"""This benchmark compares the per-segment TTS latency with and without the model registry.
+
+Run it from the project directory:
+    python -m benchmarks.tts_model_cache --segments 10 --disable_cuda
+"""
+import argparse
+import io
+import statistics
+import tempfile
+import time
+from contextlib import redirect_stdout
+from pathlib import Path
+
+from TTS.api import TTS
+
+from src import tts_wrapper
+
+TEXTS = [
+    "Welcome to the lecture on artificial intelligence.",
+    "Today we talk about search algorithms.",
+    "A heuristic estimates the cost to reach the goal.",
+    "The frontier contains all nodes that have not been expanded yet.",
+]
+
+
+def speak_without_registry(text: str, output_path: str, gpu: bool) -> None:
+    """The behaviour before the registry: the model is loaded for every segment."""
+    with redirect_stdout(io.StringIO()):
+        tts = TTS(model_name=tts_wrapper.TTS_MODEL_NAME, progress_bar=False, gpu=gpu)
+        tts.tts_to_file(text=text, file_path=output_path)
+
+
+def speak_with_registry(text: str, output_path: str, gpu: bool) -> None:
+    tts_wrapper.speak(tts_wrapper.TTS_MODEL_NAME, text, output_path, gpu=gpu)
+
+
+def measure(function, segments: int, gpu: bool, output_directory: Path) -> list:
+    latencies = []
+    for i in range(segments):
+        start = time.perf_counter()
+        function(TEXTS[i % len(TEXTS)], str(output_directory / f"{i}.wav"), gpu)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main(segments: int, gpu: bool) -> None:
+    with tempfile.TemporaryDirectory() as directory:
+        before = measure(speak_without_registry, segments, gpu, Path(directory))
+        after = measure(speak_with_registry, segments, gpu, Path(directory))
+
+    for label, latencies in (("before", before), ("after", after)):
+        print(
+            f"{label:>6}: mean {statistics.mean(latencies):.3f}s, "
+            f"median {statistics.median(latencies):.3f}s, "
+            f"first {latencies[0]:.3f}s per segment"
+        )
+    print(f"speedup (mean): {statistics.mean(before) / statistics.mean(after):.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--segments", type=int, default=10)
+    parser.add_argument("--disable_cuda", action="store_true")
+    args = parser.parse_args()
+
+    main(segments=args.segments, gpu=not args.disable_cuda)
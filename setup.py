@@ -6,4 +6,5 @@ create_folders()
 
 # download the models
 whisper = whisper_wrapper.Transcriber()
-tts = tts_wrapper.TTS(model_name="tts_models/en/ljspeech/tacotron2-DDC_ph")
+whisper.load_model()
+tts = tts_wrapper.get_model(model_name=tts_wrapper.TTS_MODEL_NAME, gpu=False)
@@ -0,0 +1,121 @@
+"""This module contains the manifest of a lecture. It records which stages of the pipeline have finished, with the
+digests of their inputs and outputs and their parameters, so an interrupted run resumes at the first stage that is
+missing or no longer valid."""
+import json
+import logging
+import os
+import time
+
+from utils.cache import DIGEST_INDEX_PATH, file_digest
+from utils.file_handler import atomic_output
+from utils.path_handler import VARIABLE_DIRECTORY
+
+MANIFEST_VERSION = 1
+
+
+class LectureManifest:
+    """This class stores the completed stages of a lecture in a json file. A stage is valid, if it was completed with
+    the same inputs and parameters and its outputs still exist with the recorded digests. The inputs of a stage are
+    usually the outputs of the previous stage, so a stage that runs again invalidates the following stages.
+    """
+
+    def __init__(
+        self, name: str, path: str = None, index_path: str = DIGEST_INDEX_PATH
+    ):
+        """Loads the manifest of a lecture. A missing or unreadable manifest is empty.
+
+        Args:
+            name (str): The name of the lecture.
+            path (str, optional): The path to the manifest. Defaults to `<name>_manifest.json` in
+                                  `VARIABLE_DIRECTORY`.
+            index_path (str, optional): The index the digests of the files are stored in, see `file_digest`.
+                                        Defaults to `DIGEST_INDEX_PATH`.
+        """
+        self.name = name
+        self.path = (
+            str(path) if path else str(VARIABLE_DIRECTORY / f"{name}_manifest.json")
+        )
+        self.index_path = index_path
+        self.stages = {}
+
+        try:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == MANIFEST_VERSION:
+                self.stages = data["stages"]
+        except (OSError, ValueError, KeyError):
+            pass
+
+    def is_valid(self, stage: str, inputs: dict, parameters: dict) -> bool:
+        """Returns whether the stage was completed with the given inputs and parameters and its outputs are unchanged.
+
+        Args:
+            stage (str): The name of the stage.
+            inputs (dict): The digests of the inputs by their name.
+            parameters (dict): The parameters changing the outputs of the stage. They must be serializable as json.
+
+        Returns:
+            bool: Whether the stage can be skipped.
+        """
+        entry = self.stages.get(stage)
+        if entry is None:
+            return False
+        if entry["inputs"] != inputs or entry["parameters"] != _normalize(parameters):
+            logging.info(f"{self.name}: The inputs or parameters of {stage} changed.")
+            return False
+
+        for path, digest in entry["outputs"].items():
+            if (
+                not os.path.exists(path)
+                or file_digest(path, index_path=self.index_path) != digest
+            ):
+                logging.info(f"{self.name}: The output {path} of {stage} changed.")
+                return False
+        return True
+
+    def outputs(self, stage: str) -> dict:
+        """Returns the digests of the outputs of a completed stage by their path, or an empty dict."""
+        entry = self.stages.get(stage)
+        return dict(entry["outputs"]) if entry else {}
+
+    def complete(
+        self, stage: str, inputs: dict, parameters: dict, outputs: list
+    ) -> None:
+        """Records a completed stage and saves the manifest.
+
+        Args:
+            stage (str): The name of the stage.
+            inputs (dict): The digests of the inputs by their name.
+            parameters (dict): The parameters changing the outputs of the stage.
+            outputs (list): The paths of the files written by the stage.
+        """
+        self.stages[stage] = {
+            "inputs": inputs,
+            "parameters": _normalize(parameters),
+            "outputs": {
+                str(path): file_digest(str(path), index_path=self.index_path)
+                for path in outputs
+            },
+            "completed": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self.save()
+
+    def invalidate(self, stage: str) -> None:
+        """Removes a stage from the manifest and saves it."""
+        if self.stages.pop(stage, None) is not None:
+            self.save()
+
+    def save(self) -> None:
+        """Writes the manifest atomically."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with atomic_output(self.path) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump(
+                    {"version": MANIFEST_VERSION, "stages": self.stages}, f, indent=2
+                )
+
+
+def _normalize(parameters: dict) -> dict:
+    """Not intended for external use. Converts the parameters to their json representation, so they compare equal to
+    loaded parameters."""
+    return json.loads(json.dumps(parameters, sort_keys=True, default=str))
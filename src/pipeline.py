@@ -0,0 +1,150 @@
+"""This module contains a pipeline that processes several items in overlapping stages.
+While one item is in a stage, the next item can already be in the previous stage."""
+import logging
+import queue
+import threading
+
+_STOP = object()
+
+
+class Stage:
+    """This class describes one step of a pipeline."""
+
+    def __init__(self, name: str, function, workers: int = 1):
+        """Creates a Stage.
+
+        Args:
+            name (str): The name of the stage, used for logging.
+            function (callable): The function processing an item. It receives the item and returns the item passed
+                                 to the next stage.
+            workers (int, optional): The number of threads running the function. Defaults to 1.
+        """
+        self.name = name
+        self.function = function
+        self.workers = workers
+
+
+class Pipeline:
+    """This class runs items through stages. The stages are connected by bounded queues and every stage runs in its
+    own worker threads. A failing item is logged and skips the remaining stages, the other items continue.
+    """
+
+    def __init__(self, stages: list, queue_size: int = 1):
+        """Creates a Pipeline.
+
+        Args:
+            stages (list): The stages every item passes in order.
+            queue_size (int, optional): The number of items waiting in front of a stage. Defaults to 1.
+        """
+        self.stages = stages
+        self.queue_size = queue_size
+
+    def run(self, items, on_done=None) -> list:
+        """Runs all items through the stages. The items leave the pipeline in the order they are finished.
+
+        Args:
+            items (iterable): The items to process.
+            on_done (callable, optional): Called with the item and the exception (or None) when an item leaves the
+                                          pipeline. Defaults to None.
+
+        Returns:
+            list: The processed items and their exceptions (or None) as tuples.
+        """
+        queues = [queue.Queue(maxsize=self.queue_size) for _ in self.stages]
+        queues.append(queue.Queue())
+
+        threads = []
+        for index, stage in enumerate(self.stages):
+            finished = _Counter()
+            next_workers = (
+                self.stages[index + 1].workers if index + 1 < len(self.stages) else 1
+            )
+            for worker in range(stage.workers):
+                thread = threading.Thread(
+                    target=self._work,
+                    args=(
+                        stage,
+                        queues[index],
+                        queues[index + 1],
+                        finished,
+                        next_workers,
+                    ),
+                    name=f"{stage.name}-{worker}",
+                    daemon=True,
+                )
+                thread.start()
+                threads.append(thread)
+
+        feeder = threading.Thread(
+            target=self._feed,
+            args=(items, queues[0], self.stages[0].workers),
+            name="feeder",
+            daemon=True,
+        )
+        feeder.start()
+
+        results = []
+        while True:
+            element = queues[-1].get()
+            if element is _STOP:
+                break
+            item, error = element
+            results.append((item, error))
+            if on_done:
+                on_done(item, error)
+
+        for thread in threads + [feeder]:
+            thread.join()
+
+        return results
+
+    @classmethod
+    def _feed(cls, items, input_queue: queue.Queue, workers: int) -> None:
+        """Not intended for external use. Puts all items into the queue of the first stage."""
+        for item in items:
+            input_queue.put((item, None))
+        for _ in range(workers):
+            input_queue.put(_STOP)
+
+    @classmethod
+    def _work(
+        cls,
+        stage: Stage,
+        input_queue: queue.Queue,
+        output_queue: queue.Queue,
+        finished,
+        next_workers: int,
+    ) -> None:
+        """Not intended for external use. Processes the items of one stage until the previous stage is finished."""
+        while True:
+            element = input_queue.get()
+            if element is _STOP:
+                break
+
+            item, error = element
+            if error is None:
+                try:
+                    item = stage.function(item)
+                except Exception as exception:
+                    logging.exception(f"Stage {stage.name} failed.")
+                    error = exception
+
+            output_queue.put((item, error))
+
+        # the last worker of a stage tells the workers of the next stage to stop
+        if finished.increment() == stage.workers:
+            for _ in range(next_workers):
+                output_queue.put(_STOP)
+
+
+class _Counter:
+    """Not intended for external use. A counter that can be incremented by several threads."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def increment(self) -> int:
+        with self._lock:
+            self._value += 1
+            return self._value
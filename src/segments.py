@@ -0,0 +1,192 @@
+"""This module contains a compact table of segments. The segments are stored in numpy columns instead of a list of
+dicts, the texts are stored once in a vocabulary and silences are marked by a flag."""
+import numpy as np
+
+from utils.file_handler import atomic_output
+
+SILENCE_TEXT = "__silence__"
+
+
+class SegmentTable:
+    """This class stores segments in columns. Every row has a start, end and duration in seconds, the index of its text
+    in `vocabulary` and a silence flag. Indexing a row returns a dict with the keys `start`, `end`, `duration`, `text`
+    and `silence`, so a table can be iterated like a list of segments.
+    """
+
+    def __init__(
+        self,
+        start: np.ndarray,
+        end: np.ndarray,
+        text_ids: np.ndarray,
+        vocabulary: list,
+        silence: np.ndarray,
+        duration: np.ndarray = None,
+    ):
+        """Creates a SegmentTable from its columns. Use `from_segments` or `from_whisper` to convert segments.
+
+        Args:
+            start (np.ndarray): The start of the segments in seconds.
+            end (np.ndarray): The end of the segments in seconds.
+            text_ids (np.ndarray): The index of the text of every segment in the vocabulary.
+            vocabulary (list): The distinct texts.
+            silence (np.ndarray): Whether a segment is silence.
+            duration (np.ndarray, optional): The duration of the segments in seconds. Defaults to the rounded
+                                             difference of end and start.
+        """
+        self.start = np.asarray(start, dtype=np.float64)
+        self.end = np.asarray(end, dtype=np.float64)
+        self.text_ids = np.asarray(text_ids, dtype=np.int32)
+        self.vocabulary = list(vocabulary)
+        self.silence = np.asarray(silence, dtype=bool)
+        self.duration = (
+            np.round(self.end - self.start, 2)
+            if duration is None
+            else np.asarray(duration, dtype=np.float64)
+        )
+
+    @classmethod
+    def from_segments(cls, segments: list):
+        """Converts a list of segment dicts, like the results of whisper or `Silence`. Segments with the text
+        `__silence__` or the key `silence` set become silence.
+
+        Args:
+            segments (list): Dicts with the keys start, end and text, and optionally duration.
+
+        Returns:
+            SegmentTable: The table of the segments.
+        """
+        if isinstance(segments, SegmentTable):
+            return segments
+
+        ids = {"": 0}
+        text_ids = np.zeros(len(segments), dtype=np.int32)
+        silence = np.zeros(len(segments), dtype=bool)
+        for i, segment in enumerate(segments):
+            text = segment.get("text", "")
+            if segment.get("silence") or text == SILENCE_TEXT:
+                silence[i] = True
+            else:
+                text_ids[i] = ids.setdefault(text, len(ids))
+
+        start = np.fromiter((s["start"] for s in segments), np.float64, len(segments))
+        end = np.fromiter((s["end"] for s in segments), np.float64, len(segments))
+        duration = None
+        if all("duration" in segment for segment in segments):
+            duration = np.fromiter(
+                (s["duration"] for s in segments), np.float64, len(segments)
+            )
+
+        return cls(start, end, text_ids, list(ids), silence, duration=duration)
+
+    @classmethod
+    def from_whisper(cls, result: dict):
+        """Converts the segments of a whisper result.
+
+        Args:
+            result (dict): The result returned by whisper.
+
+        Returns:
+            SegmentTable: The table of the segments.
+        """
+        return cls.from_segments(result["segments"])
+
+    @classmethod
+    def load(cls, path: str):
+        """Loads a table saved by `save`.
+
+        Args:
+            path (str): The path to the file.
+
+        Returns:
+            SegmentTable: The loaded table.
+        """
+        with np.load(str(path), allow_pickle=False) as data:
+            text_bytes = data["text_bytes"].tobytes()
+            offsets = data["text_offsets"]
+            vocabulary = [
+                text_bytes[offsets[i] : offsets[i + 1]].decode("utf-8")
+                for i in range(len(offsets) - 1)
+            ]
+            return cls(
+                data["start"],
+                data["end"],
+                data["text_ids"],
+                vocabulary,
+                data["silence"],
+                duration=data["duration"],
+            )
+
+    def save(self, path: str) -> None:
+        """Saves the table as a compressed npz file. The vocabulary is stored as utf-8 bytes with their offsets, so no
+        pickling is needed.
+
+        Args:
+            path (str): The path to the file ending in '.npz'.
+        """
+        encoded = [text.encode("utf-8") for text in self.vocabulary]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(text) for text in encoded])
+        with atomic_output(path) as tmp_path:
+            np.savez_compressed(
+                tmp_path,
+                start=self.start,
+                end=self.end,
+                duration=self.duration,
+                text_ids=self.text_ids,
+                silence=self.silence,
+                text_bytes=np.frombuffer(b"".join(encoded), dtype=np.uint8),
+                text_offsets=offsets,
+            )
+
+    def to_segments(self) -> list:
+        """Converts the table to a list of segment dicts, with the text `__silence__` for silence.
+
+        Returns:
+            list: Dicts with the keys start, end, duration and text.
+        """
+        return [
+            {
+                "start": float(start),
+                "end": float(end),
+                "duration": float(duration),
+                "text": SILENCE_TEXT if silence else self.vocabulary[text_id],
+            }
+            for start, end, duration, text_id, silence in zip(
+                self.start, self.end, self.duration, self.text_ids, self.silence
+            )
+        ]
+
+    def text(self, index: int) -> str:
+        """Returns the text of a segment. Silences have an empty text."""
+        return "" if self.silence[index] else self.vocabulary[self.text_ids[index]]
+
+    @property
+    def text_indices(self) -> np.ndarray:
+        """The indices of the segments that are not silence."""
+        return np.flatnonzero(~self.silence)
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return SegmentTable(
+                self.start[index],
+                self.end[index],
+                self.text_ids[index],
+                self.vocabulary,
+                self.silence[index],
+                duration=self.duration[index],
+            )
+
+        return {
+            "start": float(self.start[index]),
+            "end": float(self.end[index]),
+            "duration": float(self.duration[index]),
+            "text": self.text(index),
+            "silence": bool(self.silence[index]),
+        }
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
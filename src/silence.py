@@ -1,11 +1,8 @@
 import logging
-import os
 
-import pydub.silence
-from joblib import dump
-from pydub import AudioSegment
-
-from utils.file_handler import get_audio_length
+from src.segments import SegmentTable
+from src.silence_detector import detect_silence
+from utils.audio import audio_name
 from utils.path_handler import VARIABLE_DIRECTORY
 
 
@@ -15,22 +12,30 @@ class Silence:
 
     @classmethod
     def get_silence_segments_pydub(
-            cls, audio_file: str, silence_duration: float, silence_threshold: float = -50
+            cls,
+            audio_file,
+            silence_duration: float,
+            silence_threshold: float = -50,
+            workers: int = 1,
     ) -> list:
-        """This method uses pydub to detect silence in an audio file.
+        """This method detects silence in an audio file. It returns the same silences as
+        `pydub.silence.detect_silence`, but uses the vectorized `silence_detector.detect_silence`.
 
         Args:
-            audio_file (str): The path to the audio file.
+            audio_file (str | DecodedAudio): The path to the audio file or the decoded audio.
             silence_duration (float): The minimum duration of silence in seconds.
             silence_threshold (float, optional): The upper bound for how quiet is silent in dFBS. Defaults to -50.
                                                  See also `pydub.silence.detect_silence`.
+            workers (int, optional): The number of processes scanning the audio in chunks. Defaults to 1.
 
         Returns:
             list: A list of dicts with the start and end of the silence in seconds.
         """
-        audio = AudioSegment.from_file(audio_file)
-        silences = pydub.silence.detect_silence(
-            audio, int(silence_duration * 1000), silence_threshold
+        silences = detect_silence(
+            audio_file,
+            int(silence_duration * 1000),
+            silence_threshold,
+            workers=workers,
         )
 
         result = []
@@ -41,21 +46,21 @@ class Silence:
 
     @classmethod
     def add_silence_segments_whisper(
-            cls, segments: list, max_duration: int = None
-    ) -> list:
+            cls, segments, max_duration: int = None
+    ) -> SegmentTable:
         """This method adds silence segments to a list of segments. It compares the start and end of the segments and
-        adds silence if there is a difference. If a silence is added the key `text` is set to `__silence__`, since it
-        cannot occur naturally in the text.
+        adds silence if there is a difference.
 
         Args:
-            segments (list): A list of dicts with the start and end of the segments in seconds.
-                             The format is the same as the output of `whisper`.
+            segments (list | SegmentTable): The segments with their start and end in seconds.
+                                            The format of a list is the same as the output of `whisper`.
             max_duration (int): The maximum duration of a resulting segment. Defaults to None.
 
         Returns:
-            list: A list of dicts with the start and end of the segments in seconds,
-                  the content of the segment and the duration of the segment.
+            SegmentTable: The segments with their start, end and duration in seconds and their content.
         """
+        if isinstance(segments, SegmentTable):
+            segments = segments.to_segments()
 
         logging.info("Preparing the results of whisper for TTS.")
 
@@ -119,48 +124,83 @@ class Silence:
 
         logging.info("Preparation finished.")
 
-        return substrings
+        return SegmentTable.from_segments(substrings)
 
     @classmethod
     def add_silence_segments_pydub_whisper(
             cls,
-            segments: list,
-            audio_file: str,
+            segments,
+            audio_file,
             silence_duration: float = 1,
             silence_threshold: float = -50,
             max_duration: int = 30,
-    ):
+            workers: int = 1,
+    ) -> SegmentTable:
         """This method adds silence segments to the result of whisper transcription.
-        It uses the information of both the whisper result and pydub.
+        It uses the information of both the whisper result and pydub, see `align_silences`.
+        The result is also saved to `VARIABLE_DIRECTORY`.
 
         Args:
-            segments (list): The result provided by whisper.
-            audio_file (str): The path to the audio file used for the transcription.
+            segments (list | SegmentTable): The segments provided by whisper.
+            audio_file (str | DecodedAudio): The path to the audio file used for the transcription or the decoded audio.
             silence_duration (float, optional): The minimum length of silence for pydub. Defaults to 1.
             silence_threshold (float, optional): The silence threshold (`get_silence_segments_pydub`). Defaults to -50.
             max_duration (int, optional): The maximum duration of text segments. Defaults to 30.
+            workers (int, optional): The number of processes detecting silence. Defaults to 1.
 
         Raises:
             RuntimeError: If there is a mistake and the start time of a segment is equal to or after the end time.
 
         Returns:
-            list: The list with added silence segments.
+            SegmentTable: The segments with added silence segments.
         """
-        logging.info(
-            f"{os.path.basename(audio_file).split('.')[0]}: Preparing the results of whisper for TTS."
-        )
-
-        result = []
+        name = audio_name(audio_file)
+        logging.info(f"{name}: Preparing the results of whisper for TTS.")
 
         pydub_silences = cls.get_silence_segments_pydub(
             audio_file=audio_file,
             silence_duration=silence_duration,
             silence_threshold=silence_threshold,
+            workers=workers,
         )
+        result = SegmentTable.from_segments(
+            cls.align_silences(segments, pydub_silences, max_duration)
+        )
+
+        result.save(VARIABLE_DIRECTORY / f"{name}_en_segments.npz")
+
+        logging.info(f"{name}: Results prepared.")
+
+        return result
+
+    @classmethod
+    def align_silences(
+            cls, segments, pydub_silences: list, max_duration: int = 30
+    ) -> list:
+        """This method combines the whisper segments with the detected silences in a single sweep over both lists.
+        Gaps between whisper segments become silence segments, the detected silences within a text segment move its
+        start or end, and consecutive silence segments are merged.
+
+        Args:
+            segments (list | SegmentTable): The segments provided by whisper.
+            pydub_silences (list): The silences in seconds, as returned by `get_silence_segments_pydub`.
+            max_duration (int, optional): The maximum duration of text segments. Defaults to 30.
+
+        Raises:
+            RuntimeError: If there is a mistake and the start time of a segment is equal to or after the end time.
+
+        Returns:
+            list: The list with added silence segments. The text of silence segments is `__silence__`.
+        """
+        if isinstance(segments, SegmentTable):
+            segments = segments.to_segments()
+
+        result = []
+        cursor = _SilenceCursor(pydub_silences)
 
         for i, segment in enumerate(segments):
-            pydub_segments = cls._get_pydub_segments_for_whisper_segment(
-                round(segment["start"], 2), round(segment["end"], 2), pydub_silences
+            pydub_segments = cursor.next(
+                round(segment["start"], 2), round(segment["end"], 2)
             )
 
             if i == 0:
@@ -211,27 +251,33 @@ class Silence:
                         max_duration=max_duration,
                     )
 
-        i = 0
-        while i < len(result):
-            segment = result[i]
-            duration = round((segment["end"] - segment["start"]), 2)
-            if duration <= 0:
-                raise RuntimeError(f"Duration of segment is lower than or equal to zero.")
-
-            segment["duration"] = duration
-            if segment["text"] == "__silence__" and len(result) > i + 1 and result[i + 1]["text"] == "__silence__":
-                segment["end"] = result[i + 1]["end"]
-                segment["duration"] = round(abs(segment["end"]-segment["start"]), 2)
-                result.pop(i + 1)
+        merged = []
+        for segment in result:
+            if (
+                merged
+                and segment["text"] == "__silence__"
+                and merged[-1]["text"] == "__silence__"
+            ):
+                merged[-1]["end"] = segment["end"]
+                cls._set_duration(merged[-1])
             else:
-                i += 1
+                cls._set_duration(segment)
+                merged.append(segment)
 
-        name = os.path.basename(audio_file).split(".")[0]
-        dump(result, str(VARIABLE_DIRECTORY / f"{name}_en_segments.joblib"))
+        return merged
 
-        logging.info(f"{name}: Results prepared.")
+    @classmethod
+    def _set_duration(cls, segment: dict) -> None:
+        """Not intended for external use. Sets the duration of a segment.
 
-        return result
+        Raises:
+            RuntimeError: If the start time of the segment is equal to or after the end time.
+        """
+        duration = round((segment["end"] - segment["start"]), 2)
+        if duration <= 0:
+            raise RuntimeError(f"Duration of segment is lower than or equal to zero.")
+
+        segment["duration"] = duration
 
     @classmethod
     def _add_text(
@@ -243,10 +289,10 @@ class Silence:
             max_duration: int,
     ) -> None:
         """Not intended for external use.
-        This method is used by `add_silence_segments_pydub_whisper` to add text segments, including the pydub silence.
+        This method is used by `align_silences` to add text segments, including the pydub silence.
 
         Args:
-            pydub_segments (list): The segments generated by `get_silence_segments_pydub`.
+            pydub_segments (list): The silences of the segment, as returned by `_SilenceCursor.next`.
             result (list): The resulting list to append the text to.
             index (int): The current index in segments.
             segments (list): The segments containing the text information.
@@ -260,15 +306,22 @@ class Silence:
 
         total_pydub_duration = 0
 
+        # The silences at the start are used and the silence after each of them is skipped. This keeps the results of
+        # the former implementation, which removed them from the list while iterating over it.
         pydub_duration = 0
-        if len(pydub_segments) != 0:
-            for pydub_segment in pydub_segments:
-                if pydub_segment["position"] == "start":
-                    pydub_duration += round(
-                        (pydub_segment["end"] - pydub_segment["start"]), 2
-                    )
-
-                    pydub_segments.remove(pydub_segment)
+        remaining = []
+        i = 0
+        while i < len(pydub_segments):
+            pydub_segment = pydub_segments[i]
+            if pydub_segment["position"] == "start":
+                pydub_duration += round(
+                    (pydub_segment["end"] - pydub_segment["start"]), 2
+                )
+                remaining.extend(pydub_segments[i + 1 : i + 2])
+                i += 2
+            else:
+                remaining.append(pydub_segment)
+                i += 1
 
         total_pydub_duration += pydub_duration
 
@@ -307,14 +360,13 @@ class Silence:
 
         pydub_duration = 0
 
-        if len(pydub_segments) != 0:
-            for pydub_segment in pydub_segments:
-                if pydub_segment["position"] == "end":
-                    # add silence to results
+        for pydub_segment in remaining:
+            if pydub_segment["position"] == "end":
+                # add silence to results
 
-                    pydub_duration += round(
-                        (pydub_segment["end"] - pydub_segment["start"]), 2
-                    )
+                pydub_duration += round(
+                    (pydub_segment["end"] - pydub_segment["start"]), 2
+                )
 
         total_pydub_duration += pydub_duration
 
@@ -331,26 +383,51 @@ class Silence:
                     }
                 )
 
-    @classmethod
-    def _get_pydub_segments_for_whisper_segment(
-            cls, start: float, end: float, pydub_silence: list
-    ) -> list:
-        """This method returns silences starting between start and end.
+
+class _SilenceCursor:
+    """Not intended for external use. This class walks through the silences once, while the whisper segments are
+    processed in order. For every segment, it returns the silences starting between its start and end.
+
+    Silences starting before the segment are dropped, and the silence following a dropped one is skipped for this
+    segment. This keeps the results of the former implementation, which removed the silences from the list while
+    iterating over it. Only the silences returned for the previous segment are visited again, the others are visited
+    once.
+    """
+
+    def __init__(self, silences: list):
+        """Creates a _SilenceCursor.
+
+        Args:
+            silences (list): A list of dictionaries containing start and end, sorted by start.
+        """
+        self.silences = silences
+        self.head = 0
+        self.pending = []
+
+    def next(self, start: float, end: float) -> list:
+        """Returns the silences of the next segment.
 
         Args:
-            start (float): The start time in seconds.
-            end (float): The end time in seconds.
-            pydub_silence (list): A list of dictionaries containing start and end.
+            start (float): The start time of the segment in seconds.
+            end (float): The end time of the segment in seconds.
 
         Returns:
-            list: Returns all fitting silences.
+            list: Returns all fitting silences. Their key `position` is set to `start` or `end`.
         """
+        pending = self.pending
+        count = len(pending) + len(self.silences) - self.head
 
-        pydub_segments = []
+        result = []
+        kept = []
+        i = 0
+        while i < count:
+            silence = self._get(i)
 
-        for silence in pydub_silence:
             if silence["start"] < start:
-                pydub_silence.remove(silence)
+                # the silence is dropped and the following one is skipped
+                if i + 1 < count:
+                    kept.append(self._get(i + 1))
+                i += 2
                 continue
 
             if silence["start"] > end:
@@ -366,6 +443,21 @@ class Silence:
                     else "end"
                 )
 
-            pydub_segments.append(silence)
+            result.append(silence)
+            kept.append(silence)
+            i += 1
+
+        i = min(i, count)
+        if i < len(pending):
+            kept.extend(pending[i:])
+        else:
+            self.head += i - len(pending)
+        self.pending = kept
+
+        return result
 
-        return pydub_segments
+    def _get(self, index: int) -> dict:
+        """Not intended for external use. Returns the silence at the index of the remaining silences."""
+        if index < len(self.pending):
+            return self.pending[index]
+        return self.silences[self.head + index - len(self.pending)]
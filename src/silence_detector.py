@@ -0,0 +1,243 @@
+"""This module detects silence with numpy. It returns the same ranges as `pydub.silence.detect_silence` with a seek
+step of one millisecond, but computes the energy of all windows at once from cumulative sums instead of slicing the
+audio millisecond by millisecond.
+The audio is scanned in chunks of windows, so long memory-mapped recordings are never loaded completely. The chunks
+can be processed by several processes."""
+import mmap
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import numpy as np
+
+from utils.audio import CHUNK_SIZE, DecodedAudio, read_wav_header
+
+MAX_AMPLITUDE = 32768
+
+# the number of windows (milliseconds) scanned at once
+CHUNK_LENGTH = 5 * 60 * 1000
+
+
+def detect_silence(
+    audio,
+    min_silence_len: int = 1000,
+    silence_thresh: float = -16,
+    chunk_length: int = CHUNK_LENGTH,
+    workers: int = 1,
+) -> list:
+    """Returns all silent ranges [start, end] in milliseconds, like `pydub.silence.detect_silence`.
+    A window of `min_silence_len` milliseconds starts at every millisecond. It is silent if its RMS is at most the
+    threshold. Overlapping silent windows are combined into one range.
+
+    Args:
+        audio (str | DecodedAudio): The path to the audio file or the decoded audio.
+        min_silence_len (int, optional): The minimum length of silence in milliseconds. Defaults to 1000.
+        silence_thresh (float, optional): The upper bound for how quiet is silent in dFBS. Defaults to -16.
+        chunk_length (int, optional): The number of windows scanned at once. It bounds the memory used.
+                                      Defaults to 5 minutes.
+        workers (int, optional): The number of processes scanning chunks. The samples must be memory-mapped from a
+                                 file. Defaults to 1.
+
+    Returns:
+        list: The silent ranges as lists of start and end in milliseconds.
+    """
+    if not isinstance(audio, DecodedAudio):
+        audio = load(audio)
+
+    length = round(1000 * (audio.frames / audio.sample_rate))
+    if length < min_silence_len:
+        return []
+
+    threshold = (10 ** (silence_thresh / 20.0)) * MAX_AMPLITUDE
+    last_start = length - min_silence_len
+    chunks = [
+        (start, min(start + chunk_length, last_start + 1))
+        for start in range(0, last_start + 1, chunk_length)
+    ]
+
+    source = _mapped_source(audio.samples)
+    if workers > 1 and len(chunks) > 1 and source is not None:
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        ) as pool:
+            chunk_ranges = pool.map(
+                partial(
+                    _detect_mapped_chunk,
+                    source,
+                    audio.sample_rate,
+                    min_silence_len,
+                    threshold,
+                ),
+                chunks,
+            )
+            return _combine_chunks(chunk_ranges, min_silence_len)
+
+    return _combine_chunks(
+        (
+            detect_chunk(
+                audio.samples,
+                audio.sample_rate,
+                start,
+                end,
+                min_silence_len,
+                threshold,
+            )
+            for start, end in chunks
+        ),
+        min_silence_len,
+    )
+
+
+def detect_chunk(
+    samples: np.ndarray,
+    sample_rate: int,
+    start: int,
+    end: int,
+    min_silence_len: int,
+    threshold: float,
+) -> list:
+    """Finds the silent windows starting between `start` and `end`. Only the frames covered by these windows are read.
+
+    Args:
+        samples (np.ndarray): The 16 bit samples of the shape (frames, channels).
+        sample_rate (int): The sample rate of the samples.
+        start (int): The first window start in milliseconds.
+        end (int): The window start in milliseconds after the last window of the chunk.
+        min_silence_len (int): The length of a window in milliseconds.
+        threshold (float): The highest RMS of a silent window.
+
+    Returns:
+        list: The first and last start of consecutive silent windows as lists.
+    """
+    # the same conversion from milliseconds to frames as pydub
+    boundaries = (
+        np.arange(start, end + min_silence_len) * (sample_rate / 1000.0)
+    ).astype(np.int64)
+    first_frame = min(int(boundaries[0]), len(samples))
+    last_frame = min(int(boundaries[-1]), len(samples))
+    energy = cumulative_energy(
+        samples[first_frame:last_frame],
+        np.clip(boundaries, first_frame, last_frame) - first_frame,
+    )
+
+    starts = np.arange(end - start)
+    ends = starts + min_silence_len
+
+    # pydub pads missing frames at the end with zeros, so they count for the mean
+    squares = energy[ends] - energy[starts]
+    count = (boundaries[ends] - boundaries[starts]) * samples.shape[1]
+    mean = np.divide(
+        squares,
+        count,
+        out=np.zeros(len(starts), dtype=np.float64),
+        where=count > 0,
+    )
+    # audioop truncates the RMS to an integer
+    rms = np.floor(np.sqrt(mean))
+
+    silence_starts = np.flatnonzero(rms <= threshold) + start
+    if len(silence_starts) == 0:
+        return []
+
+    # silent windows overlapping or touching each other belong to the same range
+    gaps = np.flatnonzero(np.diff(silence_starts) > min_silence_len)
+    range_starts = silence_starts[np.concatenate(([0], gaps + 1))]
+    range_ends = silence_starts[np.concatenate((gaps, [len(silence_starts) - 1]))]
+
+    return [[int(first), int(last)] for first, last in zip(range_starts, range_ends)]
+
+
+def cumulative_energy(samples: np.ndarray, boundaries: np.ndarray) -> np.ndarray:
+    """Returns the sum of the squared samples of all channels before every boundary. The samples are read in chunks,
+    so memory-mapped audio is never loaded completely.
+
+    Args:
+        samples (np.ndarray): The 16 bit samples of the shape (frames, channels).
+        boundaries (np.ndarray): Sorted frame indices between 0 and the number of frames.
+
+    Returns:
+        np.ndarray: The energy of the frames before each boundary.
+    """
+    energy = np.zeros(len(boundaries), dtype=np.int64)
+    total = 0
+    for start in range(0, len(samples), CHUNK_SIZE):
+        chunk = np.asarray(samples[start : start + CHUNK_SIZE], dtype=np.int64)
+        chunk_energy = np.cumsum(np.einsum("ij,ij->i", chunk, chunk))
+        end = start + len(chunk)
+
+        first, last = np.searchsorted(boundaries, [start, end], side="right")
+        energy[first:last] = total + chunk_energy[boundaries[first:last] - start - 1]
+        total += int(chunk_energy[-1])
+
+    return energy
+
+
+def load(audio_file: str) -> DecodedAudio:
+    """Decodes an audio file for the silence detection. 16 bit wav files keep their sample rate and channels, like
+    `pydub.AudioSegment.from_file`.
+
+    Args:
+        audio_file (str): The path to the audio file.
+
+    Returns:
+        DecodedAudio: The decoded audio.
+    """
+    header = read_wav_header(str(audio_file))
+    if header and header["format"] == 1 and header["bits"] == 16:
+        return DecodedAudio.from_file(
+            audio_file, sample_rate=header["sample_rate"], channels=header["channels"]
+        )
+    return DecodedAudio.from_file(audio_file)
+
+
+def _combine_chunks(chunk_ranges, min_silence_len: int) -> list:
+    """Not intended for external use. Joins the ranges of consecutive chunks. A range crossing the border of two
+    chunks ends in the first chunk and starts in the second one.
+
+    Args:
+        chunk_ranges (iterable): The ranges of window starts of every chunk, as returned by `detect_chunk`.
+        min_silence_len (int): The length of a window in milliseconds.
+
+    Returns:
+        list: The silent ranges as lists of start and end in milliseconds.
+    """
+    result = []
+    for ranges in chunk_ranges:
+        for first, last in ranges:
+            if result and first - result[-1][1] <= min_silence_len:
+                result[-1][1] = last
+            else:
+                result.append([first, last])
+
+    for silence in result:
+        silence[1] += min_silence_len
+    return result
+
+
+def _mapped_source(samples: np.ndarray):
+    """Not intended for external use. Returns the file, offset and shape of memory-mapped samples, so other
+    processes can map them as well, or None if the samples are not mapped from a named file.
+    """
+    # slices of a memmap share its filename and offset, only the mapping itself can be mapped again
+    if (
+        isinstance(samples, np.memmap)
+        and samples.filename
+        and isinstance(samples.base, mmap.mmap)
+    ):
+        return samples.filename, samples.offset, samples.shape
+    return None
+
+
+def _detect_mapped_chunk(
+    source: tuple,
+    sample_rate: int,
+    min_silence_len: int,
+    threshold: float,
+    chunk: tuple,
+) -> list:
+    """Not intended for external use. Maps the samples in a worker process and runs `detect_chunk` for the start and
+    end of the chunk."""
+    filename, offset, shape = source
+    samples = np.memmap(filename, dtype="<i2", mode="r", offset=offset, shape=shape)
+    start, end = chunk
+    return detect_chunk(samples, sample_rate, start, end, min_silence_len, threshold)
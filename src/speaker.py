@@ -1,16 +1,42 @@
 import logging
-import os
 from abc import ABC, abstractmethod
-
-from pydub import AudioSegment
-
-from src.tts_wrapper import speak
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from contextlib import nullcontext
+
+from src.segments import SegmentTable
+from src.timeline import AudioTimeline
+from src.timing import plan_timing
+from src.tts_wrapper import (
+    TTS_MODEL_NAME,
+    create_pool,
+    output_sample_rate,
+    synthesize,
+    synthesize_batch,
+)
 from utils import file_handler
+from utils.cache import DiskCache
+from utils.time_stretch import PHASE_VOCODER
 from utils.path_handler import (
-    AUDIO_DEST_DIRECTORY,
     AUDIO_TRANSLATED_SPEED_DIRECTORY,
+    TTS_CACHE_DIRECTORY,
     VIDEO_DIRECTORY,
 )
+from utils.tracing import Tracer
+from utils.wav_writer import StreamingWavWriter
+
+# The number of batches whose segments are grouped by length before they are written.
+BATCH_WINDOW = 8
+# The number of segments per worker that are synthesized in parallel before they are written.
+POOL_WINDOW = 16
+# The number of windows submitted to the pool ahead, so the workers synthesize while a window is written.
+POOL_WINDOWS_IN_FLIGHT = 2
+TTS_CACHE_MAX_BYTES = 4 * 1024**3
+
+
+def normalize_text(text: str) -> str:
+    """Returns the text without surrounding and repeated whitespace, as it is synthesized and cached."""
+    return " ".join(text.split())
 
 
 class SpeakerInterface(ABC):
@@ -20,135 +46,309 @@ class SpeakerInterface(ABC):
 
 
 class SegmentsSpeaker(SpeakerInterface):
-    def __init__(self, lecture_name: str, segments: list):
+    def __init__(
+        self,
+        lecture_name: str,
+        segments,
+        video_file: str = None,
+        streaming: bool = False,
+        sample_rate: int = None,
+        batch_size: int = 1,
+        workers: int = None,
+        torch_threads: int = None,
+        pool: ProcessPoolExecutor = None,
+        stretch_method: str = PHASE_VOCODER,
+        cache: DiskCache = None,
+        no_cache: bool = False,
+        tracer: Tracer = None,
+    ):
         """Creates a SegmentsSpeaker instance. The segments should look like the result of the methods in silence.py.
 
         Args:
             lecture_name (str): The name of the lecture.
-            segments (list): The segments used to speak the result.
+            segments (SegmentTable | list): The segments used to speak the result.
+            video_file (str, optional): The video whose length the audio is planned for. Defaults to the video without
+                                        audio in `VIDEO_DIRECTORY`.
+            streaming (bool, optional): Whether to append the audio to the file instead of assembling it in memory.
+                                        Use this for lectures that are too long to be kept in memory. Defaults to False.
+            sample_rate (int, optional): The sample rate of the translated audio. The synthesized audio is resampled
+                                         once when it is written. Defaults to the sample rate of the TTS model.
+            batch_size (int, optional): The number of text segments synthesized together. Pending segments are grouped
+                                        by length, so similar segments share a batch. Defaults to 1.
+            workers (int, optional): The number of processes performing tts in parallel. Every worker loads its own
+                                     model. Defaults to None, which performs tts in this process.
+            torch_threads (int, optional): The number of torch threads of every worker. Defaults to the number of
+                                           cpus divided by the number of workers.
+            pool (ProcessPoolExecutor, optional): A pool of `workers` processes created with `create_pool`, which is
+                                                  shared by several speakers, so the workers load their model once.
+                                                  Defaults to None, which creates a pool per call of `speak` if there
+                                                  are workers.
+            stretch_method (str, optional): The method fitting the audio to the durations, `phase_vocoder` or
+                                            `wsola`. Every segment is stretched once in memory. Defaults to
+                                            `phase_vocoder`.
+            cache (DiskCache, optional): The cache for the synthesized audio of every text. It is keyed by the
+                                         normalized text and the model, so it is shared by reruns and lectures.
+                                         Defaults to a cache in `TTS_CACHE_DIRECTORY`.
+            no_cache (bool, optional): If true, all texts are synthesized again and the cache is updated. Defaults to
+                                       False.
+            tracer (Tracer, optional): The tracer the time of fitting the segments to their durations is recorded in,
+                                       as stage `stretch`. Defaults to None.
         """
         self.lecture_name = lecture_name
-        self.segments = segments
+        self.segments = SegmentTable.from_segments(segments)
+        self.video_file = (
+            str(video_file)
+            if video_file
+            else str(VIDEO_DIRECTORY / f"{lecture_name}.mp4")
+        )
+        self.streaming = streaming
+        self.sample_rate = sample_rate
+        self.batch_size = batch_size
+        self.workers = workers
+        self.torch_threads = torch_threads
+        self.pool = pool
+        self.stretch_method = stretch_method
+        self.cache = (
+            cache
+            if cache is not None
+            else DiskCache(TTS_CACHE_DIRECTORY, max_bytes=TTS_CACHE_MAX_BYTES)
+        )
+        self.no_cache = no_cache
+        self.tracer = tracer
 
     def speak(self, use_gpu: bool = True):
-        """This performs tts for all segments.
+        """This performs tts for all segments. The timing of the segments is planned for the length of the video
+        first, so every segment is stretched once to its final duration. The audio is either assembled in memory and
+        written once, or streamed to the file.
 
         Args:
             use_gpu (bool, optional): Determines whether the gpu (cuda) should be used. Defaults to True.
         """
         logging.info(f"{self.lecture_name}: Synthesizing and adjusting audio.")
 
-        if (AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav").exists():
-            os.remove(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav")
+        output_path = AUDIO_TRANSLATED_SPEED_DIRECTORY / f"{self.lecture_name}.wav"
+        length = file_handler.get_video_length(self.video_file)
+        segments = plan_timing(self.segments, length, name=self.lecture_name)
+        if self.pool is not None:
+            pool_context = nullcontext(self.pool)
+        elif self.workers:
+            pool_context = create_pool(
+                workers=self.workers,
+                model_name=TTS_MODEL_NAME,
+                gpu=use_gpu,
+                torch_threads=self.torch_threads,
+            )
+        else:
+            pool_context = nullcontext()
+
+        with pool_context as pool:
+            # the model is only loaded in the workers, if there are any
+            sample_rate = self.sample_rate or (
+                pool.submit(output_sample_rate, TTS_MODEL_NAME, use_gpu).result()
+                if pool is not None
+                else output_sample_rate(model_name=TTS_MODEL_NAME, gpu=use_gpu)
+            )
 
-        for segment in self.segments:
-            if segment["text"] == "__silence__":
-                self._add_silence(segment=segment)
+            if self.streaming:
+                with StreamingWavWriter(output_path, sample_rate=sample_rate) as writer:
+                    self._assemble(segments, sink=writer, use_gpu=use_gpu, pool=pool)
+                    # the audio lasts as long as the video
+                    writer.write_silence(
+                        start=writer.position,
+                        duration=max(length - writer.position, 0),
+                    )
 
             else:
-                self._add_text(segment=segment, use_gpu=use_gpu)
-
-        file_handler.adjust_audio_length_to_video(
-            audio_file=str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav"),
-            video_file=str(VIDEO_DIRECTORY / f"{self.lecture_name}.mp4"),
-            output_path=str(
-                AUDIO_TRANSLATED_SPEED_DIRECTORY / f"{self.lecture_name}.wav"
-            ),
-        )
+                timeline = AudioTimeline(length=length, sample_rate=sample_rate)
+                self._assemble(segments, sink=timeline, use_gpu=use_gpu, pool=pool)
+                timeline.export(output_path)
 
+        # the entries of the lecture are stored without eviction, the cache is trimmed once per lecture
+        self.cache.evict()
         logging.info(f"{self.lecture_name}: Synthesizing and adjusting finished.")
 
-    def _add_silence(self, segment: dict):
-        """Not intended for external use. Adds silence to the translated audio.
+    def _assemble(self, segments: SegmentTable, sink, use_gpu: bool, pool=None):
+        """Not intended for external use. Writes all segments to the sink in the order of the segments. With a pool,
+        the next windows are synthesized by the workers while a window is stretched and written.
 
         Args:
-            segment (dict): A dict containing the start, end and duration of the silence.
+            segments (SegmentTable): The segments with their planned timing.
+            sink (AudioTimeline | StreamingWavWriter): The sink the translated audio is assembled in.
+            use_gpu (bool): Determines whether to use the gpu (cuda).
+            pool (ProcessPoolExecutor, optional): The pool performing tts. Defaults to None.
         """
+        if pool is not None:
+            window_size = (self.workers or 1) * POOL_WINDOW
+            in_flight = POOL_WINDOWS_IN_FLIGHT
+        else:
+            window_size = self.batch_size * BATCH_WINDOW
+            in_flight = 1
 
-        duration = segment["duration"]
+        pending = deque()
+        for i in range(0, len(segments), window_size):
+            window = segments[i : i + window_size]
+            pending.append((window, self._submit(window, use_gpu=use_gpu, pool=pool)))
+            if len(pending) >= in_flight:
+                self._write_window(sink, *pending.popleft())
 
-        if not (AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav").exists():
-            new_audio = AudioSegment.silent(duration=duration * 1000)
-        else:
-            audio = AudioSegment.from_file(
-                AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav"
-            )
-            pause = AudioSegment.silent(duration=duration * 1000)
+        while pending:
+            self._write_window(sink, *pending.popleft())
 
-            new_audio = audio.append(pause, crossfade=0)
+    def _write_window(self, sink, window: SegmentTable, synthesis: dict) -> None:
+        """Not intended for external use. Waits for the synthesis of a window and writes its segments to the sink."""
+        wavs, sample_rate = self._collect(synthesis)
 
-        new_audio.export(
-            AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav", format="wav"
-        )
+        for j, segment in enumerate(window):
+            if segment["silence"]:
+                self._add_silence(sink=sink, segment=segment)
 
-        length = file_handler.get_audio_length(
-            str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav")
-        )
+            else:
+                self._add_text(
+                    sink=sink,
+                    segment=segment,
+                    wav=wavs[j],
+                    sample_rate=sample_rate,
+                )
 
-        end = float(segment["end"])
+    def _submit(self, segments: SegmentTable, use_gpu: bool, pool=None) -> dict:
+        """Not intended for external use. Starts tts for the text segments that are not in the cache. With a pool,
+        the texts are submitted to the workers and the call returns at once, otherwise they are synthesized here.
 
-        if abs(end - length) > 0.1:
-            logging.warning(
-                f"{self.lecture_name}: Audio length is not correct. Should be {end}, but is {length}. Differs by {end - length}."
+        Returns:
+            dict: The state of the synthesis, which is passed to `_collect`.
+        """
+        groups = {}
+        for i in segments.text_indices.tolist():
+            text = normalize_text(segments.text(i))
+            groups.setdefault(text, []).append(i)
+
+        results = {}
+        for text in groups:
+            cached = (
+                None
+                if self.no_cache
+                else self.cache.get(DiskCache.key("tts", TTS_MODEL_NAME, text))
+            )
+            if cached is not None:
+                results[text] = cached
+
+        missing = [text for text in groups if text not in results]
+        futures = {}
+        if missing and pool is not None:
+            logging.debug(
+                f"{self.lecture_name}: Performing TTS in {self.workers} workers."
             )
+            futures = {
+                pool.submit(
+                    synthesize,
+                    model_name=TTS_MODEL_NAME,
+                    text=text,
+                    gpu=use_gpu,
+                ): text
+                for text in missing
+            }
+        elif missing:
+            wavs, sample_rate = self._synthesize_texts(missing, use_gpu=use_gpu)
+            for text, wav in zip(missing, wavs):
+                results[text] = (wav, sample_rate)
+                self._store(text, results[text])
+
+        return {"groups": groups, "results": results, "futures": futures}
+
+    def _collect(self, synthesis: dict) -> tuple:
+        """Not intended for external use. Waits for the texts submitted by `_submit` and maps the waveforms to the
+        text segments.
+
+        Returns:
+            tuple: A dict mapping the index of each text segment to its waveform and the sample rate.
+        """
+        results = synthesis["results"]
+        futures = synthesis["futures"]
+        # the workers finish out of order, every result is mapped back to its text
+        for future in as_completed(futures):
+            results[futures[future]] = future.result()
+            self._store(futures[future], results[futures[future]])
+
+        wavs = {}
+        sample_rate = None
+        for text, indices in synthesis["groups"].items():
+            wav, sample_rate = results[text]
+            for i in indices:
+                wavs[i] = wav
+
+        return wavs, sample_rate
 
-    def _add_text(self, segment: dict, use_gpu: bool):
-        """Not intended for external use. This method performs tts and appends it to the translated audio file.
+    def _store(self, text: str, result: tuple) -> None:
+        """Not intended for external use. Stores the synthesized audio of a text in the cache."""
+        self.cache.put(DiskCache.key("tts", TTS_MODEL_NAME, text), result, evict=False)
+
+    def _synthesize_texts(self, texts: list, use_gpu: bool) -> tuple:
+        """Not intended for external use. Performs tts for the given texts in this process.
 
         Args:
-            segment (dict): A dict containing the start, duration, end and text for TTS.
+            texts (list): The texts to synthesize.
             use_gpu (bool): Determines whether to use the gpu (cuda).
-        """
 
-        if not (AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav").exists():
-            speak(
-                model_name="tts_models/en/ljspeech/tacotron2-DDC_ph",
-                text=segment["text"],
-                output_path=str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav"),
-                gpu=use_gpu,
-            )
-            file_handler.adjust_audio_length(
-                audio_file=str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav"),
-                length=segment["duration"],
-            )
+        Returns:
+            tuple: A list with one waveform per text, in the order of `texts`, and the sample rate.
+        """
+        wavs = [None] * len(texts)
+        sample_rate = None
+
+        if self.batch_size > 1:
+            logging.debug(f"{self.lecture_name}: Performing batched TTS.")
+            indices = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+            for i in range(0, len(indices), self.batch_size):
+                batch = indices[i : i + self.batch_size]
+                batch_wavs, sample_rate = synthesize_batch(
+                    model_name=TTS_MODEL_NAME,
+                    texts=[texts[j] for j in batch],
+                    gpu=use_gpu,
+                )
+                for j, wav in zip(batch, batch_wavs):
+                    wavs[j] = wav
 
         else:
-            speak(
-                model_name="tts_models/en/ljspeech/tacotron2-DDC_ph",
-                text=segment["text"],
-                output_path=str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}_tmp.wav"),
-                gpu=use_gpu,
-            )
+            logging.debug(f"{self.lecture_name}: Performing TTS.")
+            for i, text in enumerate(texts):
+                wavs[i], sample_rate = synthesize(
+                    model_name=TTS_MODEL_NAME, text=text, gpu=use_gpu
+                )
 
-            file_handler.adjust_audio_length(
-                audio_file=str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}_tmp.wav"),
-                length=segment["duration"],
-            )
+        return wavs, sample_rate
 
-            audio = AudioSegment.from_file(
-                file=str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav")
-            )
-            audio_tmp = AudioSegment.from_file(
-                file=str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}_tmp.wav")
-            )
-
-            new_audio = audio.append(audio_tmp, crossfade=0)
+    def _add_silence(self, sink, segment: dict):
+        """Not intended for external use. Adds silence to the translated audio.
 
-            AudioSegment.export(
-                new_audio,
-                str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav"),
-                format="wav",
-            )
+        Args:
+            sink (AudioTimeline | StreamingWavWriter): The sink the translated audio is assembled in.
+            segment (dict): A dict containing the start, end and duration of the silence.
+        """
+        sink.write_silence(start=segment["start"], duration=segment["duration"])
 
-            os.remove(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}_tmp.wav")
+    def _add_text(self, sink, segment: dict, wav, sample_rate: int):
+        """Not intended for external use. This method fits the synthesized audio to the duration of the segment and
+        writes it to the translated audio at the start of the segment.
 
-            length = file_handler.get_audio_length(
-                str(AUDIO_DEST_DIRECTORY / f"{self.lecture_name}.wav")
+        Args:
+            sink (AudioTimeline | StreamingWavWriter): The sink the translated audio is assembled in.
+            segment (dict): A dict containing the start, duration, end and text for TTS.
+            wav (np.ndarray): The synthesized audio of the segment.
+            sample_rate (int): The sample rate of the synthesized audio.
+        """
+        span = (
+            self.tracer.span("stretch", self.lecture_name)
+            if self.tracer
+            else nullcontext()
+        )
+        with span:
+            wav = file_handler.stretch_to_length(
+                wav, sample_rate, segment["duration"], method=self.stretch_method
             )
 
-            end = float(segment["end"])
-
-            if abs(end - length) > 0.1:
-                logging.warning(
-                    f"{self.lecture_name}: Audio length is not correct. Should be {end}, but is {length}. Differs by {end - length}."
-                )
+        sink.write(
+            start=segment["start"],
+            samples=wav,
+            sample_rate=sample_rate,
+            duration=segment["duration"],
+        )
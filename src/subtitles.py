@@ -0,0 +1,226 @@
+"""This module writes subtitles and transcriptions. All requested formats (srt, vtt, txt and json) are written in one
+pass over the segments. Lists of segments are processed in batches, whose timestamps are formatted at once, and the
+files are written with buffered I/O. The segments of a generator are written one by one as it yields them."""
+import json
+import logging
+from collections.abc import Sequence
+from itertools import islice
+
+import numpy as np
+
+from src.segments import SILENCE_TEXT, SegmentTable
+from utils.audio import audio_name
+from utils.file_handler import AtomicOutput
+
+FORMATS = ("srt", "vtt", "txt", "json")
+# the number of segments formatted and written together
+BATCH_SIZE = 1024
+
+
+def format_timestamps(
+    seconds, always_include_hours: bool = False, decimal_marker: str = "."
+) -> list:
+    """Formats timestamps for subtitles, e.g. `01:02.345` or `00:01:02,345`.
+
+    Args:
+        seconds (np.ndarray | list): The timestamps in seconds.
+        always_include_hours (bool, optional): Whether to include the hours if they are zero. Defaults to False.
+        decimal_marker (str, optional): The marker between seconds and milliseconds. Defaults to ".".
+
+    Raises:
+        ValueError: If a timestamp is negative.
+
+    Returns:
+        list: The formatted timestamps.
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    if np.any(seconds < 0):
+        raise ValueError("non-negative timestamp expected")
+
+    # rint rounds half to even, like round
+    milliseconds = np.rint(seconds * 1000.0).astype(np.int64)
+    hours, milliseconds = np.divmod(milliseconds, 3_600_000)
+    minutes, milliseconds = np.divmod(milliseconds, 60_000)
+    seconds, milliseconds = np.divmod(milliseconds, 1_000)
+
+    return [
+        f"{h:02d}:{m:02d}:{s:02d}{decimal_marker}{ms:03d}"
+        if always_include_hours or h > 0
+        else f"{m:02d}:{s:02d}{decimal_marker}{ms:03d}"
+        for h, m, s, ms in zip(
+            hours.tolist(), minutes.tolist(), seconds.tolist(), milliseconds.tolist()
+        )
+    ]
+
+
+def write_subtitles(segments, outputs: dict, batch_size: int = BATCH_SIZE) -> None:
+    """Writes the segments to all given files in one pass.
+
+    Args:
+        segments (dict | SegmentTable | iterable): A whisper result, a SegmentTable or segment dicts with the keys
+                                                   start, end and text. The segments of a generator are written as
+                                                   it yields them, so they are not kept in memory. The files replace
+                                                   the output paths once all segments are written.
+        outputs (dict): The paths of the files by their format, e.g. `{"srt": "lecture.srt", "txt": "lecture.txt"}`.
+        batch_size (int, optional): The number of segments formatted and written together. Defaults to 1024.
+    """
+    with SubtitleWriter(outputs) as writer:
+        writer.write(segments, batch_size=batch_size)
+
+
+class SubtitleWriter:
+    """This class writes segments to subtitle and transcription files in several formats at once. Segments can be
+    written in several calls, e.g. while they are transcribed. The files are written to temporary files, which replace
+    the output paths once the writer is closed without an error. The temporary files are deleted if the writer is
+    aborted or garbage collected before it is closed, see `AtomicOutput`.
+    """
+
+    def __init__(self, outputs: dict):
+        """Opens the files.
+
+        Args:
+            outputs (dict): The paths of the files by their format, one of `srt`, `vtt`, `txt` and `json`.
+
+        Raises:
+            ValueError: If a format is unknown.
+        """
+        unknown = set(outputs) - set(FORMATS)
+        if unknown:
+            raise ValueError(
+                f"Unknown subtitle formats {sorted(unknown)}, use {FORMATS}."
+            )
+
+        self.outputs = {key: str(path) for key, path in outputs.items()}
+        self.cues = 0
+        self._files = {}
+        self._outputs = {}
+        try:
+            for key, path in self.outputs.items():
+                logging.info(f"{audio_name(path)}: Generating {key} subtitles.")
+                self._outputs[key] = AtomicOutput(path)
+                self._files[key] = open(
+                    self._outputs[key].tmp_path, "w", encoding="utf-8"
+                )
+        except BaseException:
+            self.abort()
+            raise
+
+        if "vtt" in self._files:
+            self._files["vtt"].write("WEBVTT\n\n")
+        if "json" in self._files:
+            self._files["json"].write("[")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def write(self, segments, batch_size: int = BATCH_SIZE) -> None:
+        """Writes segments to all files. Silences are skipped.
+
+        Args:
+            segments (dict | SegmentTable | iterable): A whisper result, a SegmentTable or segment dicts with the keys
+                                                       start, end and text. The segments of a generator are written
+                                                       and flushed one by one as it yields them.
+            batch_size (int, optional): The number of segments of a list formatted and written together. Defaults to
+                                        1024.
+        """
+        if isinstance(segments, SegmentTable):
+            indices = segments.text_indices
+            for i in range(0, len(indices), batch_size):
+                batch = indices[i : i + batch_size]
+                self._write_batch(
+                    segments.start[batch],
+                    segments.end[batch],
+                    [segments.text(j) for j in batch.tolist()],
+                )
+            return
+
+        if isinstance(segments, dict):
+            segments = segments["segments"]
+        iterator = (
+            segment
+            for segment in segments
+            if not segment.get("silence") and segment["text"] != SILENCE_TEXT
+        )
+        if not isinstance(segments, Sequence):
+            # a generator may produce its segments slowly, e.g. while transcribing, so none are held back
+            for segment in iterator:
+                self._write_batch(
+                    [segment["start"]], [segment["end"]], [segment["text"]]
+                )
+                for f in self._files.values():
+                    f.flush()
+            return
+
+        while True:
+            batch = list(islice(iterator, batch_size))
+            if not batch:
+                break
+            self._write_batch(
+                [segment["start"] for segment in batch],
+                [segment["end"] for segment in batch],
+                [segment["text"] for segment in batch],
+            )
+
+    def close(self) -> None:
+        """Finishes and closes all files."""
+        if "json" in self._files and not self._files["json"].closed:
+            self._files["json"].write("\n]\n")
+        for key, f in self._files.items():
+            if not f.closed:
+                f.close()
+                self._outputs[key].commit()
+                logging.info(f"{audio_name(self.outputs[key])}: Subtitles generated.")
+
+    def abort(self) -> None:
+        """Closes and deletes the unfinished files. The output paths are not changed."""
+        for key, output in self._outputs.items():
+            if key in self._files:
+                self._files[key].close()
+            output.abort()
+
+    def _write_batch(self, start, end, texts: list) -> None:
+        """Not intended for external use. Formats a batch of segments and writes it to every file."""
+        texts = [text.strip() for text in texts]
+        files = self._files
+
+        if "srt" in files:
+            starts = format_timestamps(start, True, ",")
+            ends = format_timestamps(end, True, ",")
+            files["srt"].write(
+                "".join(
+                    f"{self.cues + i}\n{s} --> {e}\n{text.replace('-->', '->')}\n\n"
+                    for i, (s, e, text) in enumerate(zip(starts, ends, texts), start=1)
+                )
+            )
+
+        if "vtt" in files:
+            starts = format_timestamps(start)
+            ends = format_timestamps(end)
+            files["vtt"].write(
+                "".join(
+                    f"{s} --> {e}\n{text.replace('-->', '->')}\n\n"
+                    for s, e, text in zip(starts, ends, texts)
+                )
+            )
+
+        if "txt" in files:
+            files["txt"].write("".join(f"{text}\n" for text in texts))
+
+        if "json" in files:
+            cues = [
+                {"start": float(s), "end": float(e), "text": text}
+                for s, e, text in zip(start, end, texts)
+            ]
+            # the cues of a batch are encoded at once and appended to the array
+            files["json"].write(
+                ("\n" if self.cues == 0 else ",\n")
+                + json.dumps(cues, ensure_ascii=False)[1:-1]
+            )
+
+        self.cues += len(texts)
@@ -0,0 +1,78 @@
+"""This module contains an in-memory buffer used to assemble the translated audio of a lecture."""
+import logging
+
+import numpy as np
+import soundfile as sf
+
+from utils.file_handler import atomic_output, resample
+
+
+class AudioTimeline:
+    """This class preallocates the PCM samples of a whole lecture. Segments are written at their absolute start
+    offset, so the assembled audio cannot drift from the timestamps of the segments."""
+
+    def __init__(self, length: float, sample_rate: int):
+        """Creates a silent AudioTimeline.
+
+        Args:
+            length (float): The length of the timeline in seconds.
+            sample_rate (int): The sample rate of the timeline.
+        """
+        self.sample_rate = sample_rate
+        self.buffer = np.zeros(int(round(length * sample_rate)), dtype=np.float32)
+
+    @property
+    def length(self) -> float:
+        """The length of the timeline in seconds."""
+        return len(self.buffer) / self.sample_rate
+
+    def write(
+        self,
+        start: float,
+        samples: np.ndarray,
+        sample_rate: int = None,
+        duration: float = None,
+    ) -> None:
+        """Writes samples to the timeline. Samples beyond `duration` or the end of the timeline are dropped.
+
+        Args:
+            start (float): The start of the samples in seconds.
+            samples (np.ndarray): The mono samples to write.
+            sample_rate (int, optional): The sample rate of the samples. They are resampled to the sample rate of the
+                                         timeline if it differs. Defaults to None.
+            duration (float, optional): The maximum duration of the written samples in seconds. Defaults to None.
+        """
+        if sample_rate and sample_rate != self.sample_rate:
+            samples = resample(samples, sample_rate, self.sample_rate)
+
+        offset = self._offset(start)
+        end = len(self.buffer)
+        if duration is not None:
+            end = min(end, offset + int(round(duration * self.sample_rate)))
+
+        samples = samples[: max(end - offset, 0)]
+        self.buffer[offset : offset + len(samples)] = samples
+
+    def write_silence(self, start: float, duration: float) -> None:
+        """Writes silence to the timeline.
+
+        Args:
+            start (float): The start of the silence in seconds.
+            duration (float): The duration of the silence in seconds.
+        """
+        offset = self._offset(start)
+        self.buffer[offset : offset + int(round(duration * self.sample_rate))] = 0
+
+    def export(self, output_path: str) -> None:
+        """Writes the timeline to a wav file.
+
+        Args:
+            output_path (str): The path of the created audio file.
+        """
+        logging.debug(f"Exporting {self.length:.2f}s of audio to {output_path}.")
+        with atomic_output(output_path) as tmp_path:
+            sf.write(tmp_path, self.buffer, self.sample_rate)
+
+    def _offset(self, start: float) -> int:
+        """Not intended for external use. Converts a time in seconds to a sample offset in the buffer."""
+        return min(max(int(round(start * self.sample_rate)), 0), len(self.buffer))
@@ -0,0 +1,46 @@
+"""This module plans the timing of the translated audio before it is synthesized. Every segment gets its final start
+and duration in the translated audio, so the synthesized speech is stretched exactly once."""
+import logging
+
+from src.segments import SegmentTable
+
+
+def plan_timing(segments, length: float, name: str = "") -> SegmentTable:
+    """Plans the final timing of the segments in audio of the given length, usually the length of the video.
+
+    The segments keep the timestamps of the original speech, so the translated speech stays in sync with the video.
+    The time after the last segment becomes silence. Only if the segments end after the given length, all segments
+    and silences are shortened by the same factor, so they fit.
+
+    Args:
+        segments (SegmentTable | list): The segments, like the results of the methods in silence.py.
+        length (float): The length of the translated audio in seconds.
+        name (str, optional): The name of the lecture used in the logs. Defaults to "".
+
+    Returns:
+        SegmentTable: The segments with their final start, end and duration.
+    """
+    segments = SegmentTable.from_segments(segments)
+    if len(segments) == 0:
+        return segments
+
+    end = float(segments.end[-1])
+    if end <= length or end <= 0:
+        logging.debug(
+            f"{name}: The segments end at {end:.2f}s, {length - end:.2f}s of silence are added."
+        )
+        return segments
+
+    scale = length / end
+    logging.info(
+        f"{name}: The segments end at {end:.2f}s after the end of the video at {length:.2f}s, they are shortened by "
+        f"the factor {scale:.4f}."
+    )
+    return SegmentTable(
+        segments.start * scale,
+        segments.end * scale,
+        segments.text_ids,
+        segments.vocabulary,
+        segments.silence,
+        duration=segments.duration * scale,
+    )
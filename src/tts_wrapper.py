@@ -1,14 +1,104 @@
 """This module contains a simple wrapper around the TTS library."""
 import io
 import logging
+import multiprocessing
 import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import redirect_stdout
 
-from TTS.api import TTS
+import numpy as np
+
+TTS_MODEL_NAME = "tts_models/en/ljspeech/tacotron2-DDC_ph"
+
+
+class ModelRegistry:
+    """This class keeps loaded TTS models in memory, so each model is only loaded once per process.
+    Models are keyed by their name and device. The least recently used model is evicted if more than `max_models`
+    models are loaded."""
+
+    def __init__(self, max_models: int = 2):
+        """Creates an empty ModelRegistry.
+
+        Args:
+            max_models (int, optional): The maximum number of models kept in memory. Defaults to 2.
+        """
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, model_name: str, gpu: bool = True):
+        """Returns the requested model. The model is loaded on the first request.
+
+        Args:
+            model_name (str): The name of the model to load.
+            gpu (bool): Whether to use the gpu (cuda) or not.
+
+        Returns:
+            TTS: The loaded model.
+        """
+        key = (model_name, "cuda" if gpu else "cpu")
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                return self._models[key]
+
+            from TTS.api import TTS
+
+            logging.debug(f"Loading TTS model {model_name} on {key[1]}.")
+            f = io.StringIO()
+            with redirect_stdout(f):
+                model = TTS(model_name=model_name, progress_bar=False, gpu=gpu)
+            logging.debug(f.getvalue())
+
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._evict()
+
+            return model
+
+    def clear(self) -> None:
+        """Removes all models from the registry."""
+        with self._lock:
+            while self._models:
+                self._evict()
+
+    def __contains__(self, key: tuple) -> bool:
+        return key in self._models
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def _evict(self) -> None:
+        """Not intended for external use. Removes the least recently used model and frees its cuda memory."""
+        (model_name, device), model = self._models.popitem(last=False)
+        logging.debug(f"Evicting TTS model {model_name} on {device}.")
+        del model
+        if device == "cuda":
+            import torch
+
+            torch.cuda.empty_cache()
+
+
+MODEL_REGISTRY = ModelRegistry()
+
+
+def get_model(model_name: str = TTS_MODEL_NAME, gpu: bool = True):
+    """Returns the model from the process-wide registry, loading it if necessary.
+
+    Args:
+        model_name (str): The path to the model to load.
+        gpu (bool): Whether to use the gpu (cuda) or not.
+
+    Returns:
+        TTS: The loaded model.
+    """
+    return MODEL_REGISTRY.get(model_name=model_name, gpu=gpu)
 
 
 def speak(model_name, text, output_path, gpu: bool = True):
-    """This function performs tts using the TTS api.
+    """This function performs tts using the TTS api. The model is only loaded on the first call.
 
     Args:
         model_name (str): The path to the model to load.
@@ -17,9 +107,160 @@ def speak(model_name, text, output_path, gpu: bool = True):
         gpu (bool): Whether to use the gpu (cuda) or not.
     """
     logging.debug(f"{os.path.basename(output_path).split('.')[0]}: Performing TTS.")
+    tts = get_model(model_name=model_name, gpu=gpu)
     f = io.StringIO()
     with redirect_stdout(f):
-        tts = TTS(model_name=model_name, progress_bar=True, gpu=gpu)
         tts.tts_to_file(text=text, file_path=str(output_path))
     logging.debug(f.getvalue())
     logging.debug(f"{os.path.basename(output_path).split('.')[0]}: TTS finished.")
+
+
+def synthesize(model_name: str, text: str, gpu: bool = True) -> tuple:
+    """This function performs tts and returns the audio in memory instead of writing a file.
+
+    Args:
+        model_name (str): The path to the model to load.
+        text (str): The text to be converted to speech.
+        gpu (bool): Whether to use the gpu (cuda) or not.
+
+    Returns:
+        tuple: The waveform as a float32 numpy array and its sample rate.
+    """
+    tts = get_model(model_name=model_name, gpu=gpu)
+    f = io.StringIO()
+    with redirect_stdout(f):
+        wav = tts.tts(text=text)
+    logging.debug(f.getvalue())
+    return np.asarray(wav, dtype=np.float32), tts.synthesizer.output_sample_rate
+
+
+def output_sample_rate(model_name: str, gpu: bool = True) -> int:
+    """Returns the sample rate of the audio synthesized by the given model."""
+    return get_model(model_name=model_name, gpu=gpu).synthesizer.output_sample_rate
+
+
+def synthesize_batch(model_name: str, texts: list, gpu: bool = True) -> tuple:
+    """This function performs tts for several texts at once. The acoustic model runs once per sentence, since
+    tacotron2 decodes every sentence until its own stop token. The mel spectrograms of all sentences are then padded
+    and passed through the vocoder as one batch, which is where most of the time is spent on cpu.
+
+    Args:
+        model_name (str): The path to the model to load.
+        texts (list): The texts to be converted to speech.
+        gpu (bool): Whether to use the gpu (cuda) or not.
+
+    Returns:
+        tuple: A list with one float32 waveform per text, in the order of `texts`, and the sample rate.
+    """
+    tts = get_model(model_name=model_name, gpu=gpu)
+    synthesizer = tts.synthesizer
+    if synthesizer.vocoder_model is None:
+        wavs = [
+            synthesize(model_name=model_name, text=text, gpu=gpu)[0] for text in texts
+        ]
+        return wavs, synthesizer.output_sample_rate
+
+    import torch
+    from TTS.tts.utils.synthesis import synthesis, trim_silence
+    from TTS.vocoder.utils.generic_utils import interpolate_vocoder_input
+
+    device = "cuda" if synthesizer.use_cuda else "cpu"
+    hop_length = synthesizer.vocoder_config.audio["hop_length"]
+    scale_factor = [
+        1,
+        synthesizer.vocoder_config.audio["sample_rate"]
+        / synthesizer.tts_model.ap.sample_rate,
+    ]
+    trim = synthesizer.tts_config.audio.get("do_trim_silence", False)
+
+    with torch.no_grad():
+        # run the acoustic model and remember which text each sentence belongs to
+        mels = []
+        for index, text in enumerate(texts):
+            for sentence in synthesizer.split_into_sentences(text):
+                outputs = synthesis(
+                    model=synthesizer.tts_model,
+                    text=sentence,
+                    CONFIG=synthesizer.tts_config,
+                    use_cuda=synthesizer.use_cuda,
+                    use_griffin_lim=False,
+                )
+                mel = outputs["outputs"]["model_outputs"][0].detach().cpu().numpy()
+                mel = synthesizer.tts_model.ap.denormalize(mel.T).T
+                vocoder_input = synthesizer.vocoder_ap.normalize(mel.T)
+                if scale_factor[1] != 1:
+                    vocoder_input = interpolate_vocoder_input(
+                        scale_factor, vocoder_input
+                    )
+                else:
+                    vocoder_input = torch.tensor(vocoder_input).unsqueeze(0)
+                mels.append((index, vocoder_input[0]))
+
+        if not mels:
+            return [
+                np.zeros(0, dtype=np.float32) for _ in texts
+            ], synthesizer.output_sample_rate
+
+        # run the vocoder on the padded batch of all sentences
+        frames = [mel.shape[-1] for _, mel in mels]
+        batch = torch.full(
+            (len(mels), mels[0][1].shape[0], max(frames)),
+            fill_value=float(min(mel.min() for _, mel in mels)),
+        )
+        for i, (_, mel) in enumerate(mels):
+            batch[i, :, : mel.shape[-1]] = mel
+        waveforms = synthesizer.vocoder_model.inference(batch.to(device)).cpu().numpy()
+
+    wavs = [[] for _ in texts]
+    for (index, _), waveform, length in zip(mels, waveforms, frames):
+        waveform = waveform.squeeze()[: length * hop_length]
+        if trim:
+            waveform = trim_silence(waveform, synthesizer.tts_model.ap)
+        wavs[index].append(waveform)
+        # the TTS api adds the same pause after every sentence
+        wavs[index].append(np.zeros(10000, dtype=np.float32))
+
+    wavs = [
+        np.concatenate(wav).astype(np.float32) if wav else np.zeros(0, dtype=np.float32)
+        for wav in wavs
+    ]
+    return wavs, synthesizer.output_sample_rate
+
+
+def create_pool(
+    workers: int,
+    model_name: str = TTS_MODEL_NAME,
+    gpu: bool = True,
+    torch_threads: int = None,
+) -> ProcessPoolExecutor:
+    """Creates a process pool for tts. Every worker loads its own model when it starts.
+    Submit `synthesize` to the pool to perform tts in a worker.
+
+    Args:
+        workers (int): The number of worker processes.
+        model_name (str): The path to the model to load.
+        gpu (bool): Whether to use the gpu (cuda) or not.
+        torch_threads (int, optional): The number of torch threads of every worker. Defaults to the number of cpus
+                                       divided by the number of workers.
+
+    Returns:
+        ProcessPoolExecutor: The pool with the initialized workers.
+    """
+    torch_threads = torch_threads or max(1, (os.cpu_count() or 1) // workers)
+    logging.debug(
+        f"Starting {workers} TTS workers with {torch_threads} torch threads each."
+    )
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(model_name, gpu, torch_threads),
+    )
+
+
+def _init_worker(model_name: str, gpu: bool, torch_threads: int) -> None:
+    """Not intended for external use. Limits the torch threads of a pool worker and loads its model."""
+    import torch
+
+    torch.set_num_threads(torch_threads)
+    get_model(model_name=model_name, gpu=gpu)
@@ -1,51 +1,84 @@
 import logging
-import os
-
-import whisper
-from joblib import dump, load
 
+from src.subtitles import format_timestamps, write_subtitles
+from utils.audio import WHISPER_SAMPLE_RATE, DecodedAudio, audio_name
+from utils.cache import DiskCache
 from utils.file_handler import get_audio_length
-from utils.path_handler import VARIABLE_DIRECTORY
+from utils.path_handler import WHISPER_CACHE_DIRECTORY
+
+WHISPER_CACHE_MAX_BYTES = 2 * 1024**3
 
 
 class Transcriber:
     """This class is a simple wrapper for the whisper library"""
 
-    def __init__(self, model: str = "large", fp16_settings: bool = False):
+    def __init__(
+        self,
+        model: str = "large",
+        fp16_settings: bool = False,
+        cache: DiskCache = None,
+    ):
         """Initializes a Transcriber object. You can set the model size and specify the fp16 settings.
+        The model is only loaded when a transcription is needed, so cached results are returned without loading it.
 
 
         Args:
             model (str, optional): The size of the transcription model. Defaults to "small".
             fp16_settings (bool, optional): Whether to use fp16 (or fp32). Defaults to False.
+            cache (DiskCache, optional): The cache for the results. They are keyed by the content of the audio file,
+                                         the model and the decoding options. Defaults to a cache in
+                                         `WHISPER_CACHE_DIRECTORY`.
         """
 
-        self.model = whisper.load_model(name=model)
+        self.model_name = model
         self.fp16_settings = fp16_settings
+        self.cache = (
+            cache
+            if cache is not None
+            else DiskCache(WHISPER_CACHE_DIRECTORY, max_bytes=WHISPER_CACHE_MAX_BYTES)
+        )
+        self._model = None
+
+    @property
+    def model(self):
+        """The whisper model. It is loaded on first access."""
+        return self.load_model()
+
+    def load_model(self):
+        """Loads the whisper model, if it has not been loaded yet.
+
+        Returns:
+            whisper.Whisper: The loaded model.
+        """
+        if self._model is None:
+            import whisper
+
+            logging.info(f"Loading the whisper model {self.model_name}.")
+            self._model = whisper.load_model(name=self.model_name)
+        return self._model
 
-    def transcribe(self, audio_file: str, no_cache=False) -> dict:
+    def transcribe(self, audio_file, no_cache=False) -> dict:
         """This method transcribes a given audio file.
 
         Args:
-            audio_file (str): The path to the audio file.
+            audio_file (str | DecodedAudio): The path to the audio file or the decoded audio.
             no_cache (bool): If false, it loads previous transcriptions. Defaults to False.
 
         Returns:
             dict: The result of the transcription. The plain text can be accessed by 'result["text"]'.
         """
-        name = os.path.basename(audio_file).split(".")[0]
-        if (VARIABLE_DIRECTORY / f"{name}_original.joblib").exists() and not no_cache:
-            logging.info(f"{name}: Loading variable with joblib.")
-            result = load(VARIABLE_DIRECTORY / f"{name}_original.joblib")
+        name = audio_name(audio_file)
+        key = self._cache_key(audio_file, {"task": "transcribe"})
+        result = None if no_cache else self.cache.get(key)
+        if result is not None:
+            logging.info(f"{name}: Loading cached transcription.")
         else:
-            logging.info(
-                f"{os.path.basename(audio_file).split('.')[0]}: Transcribing audio."
-            )
-            result = self.model.transcribe(audio_file, fp16=self.fp16_settings)
-            dump(result, VARIABLE_DIRECTORY / f"{name}_original.joblib")
-            logging.info(
-                f"{os.path.basename(audio_file).split('.')[0]}: Transcription finished."
+            logging.info(f"{audio_name(audio_file)}: Transcribing audio.")
+            result = self.model.transcribe(
+                self._whisper_input(audio_file), fp16=self.fp16_settings
             )
+            self.cache.put(key, result)
+            logging.info(f"{audio_name(audio_file)}: Transcription finished.")
 
         result["segments"] = self._adjust_end_time_whisper(
             result["segments"], audio_file=audio_file
@@ -53,27 +86,28 @@ class Transcriber:
 
         return result
 
-    def transcribe_and_translate(self, audio_file: str, no_cache=False) -> dict:
+    def transcribe_and_translate(self, audio_file, no_cache=False) -> dict:
         """This method transcribes the audio file and translates the transcription to english.
 
         Args:
-            audio_file (str): The path to the audio file.
+            audio_file (str | DecodedAudio): The path to the audio file or the decoded audio.
             no_cache (bool): If false, it loads previous transcriptions. Defaults to False.
 
         Returns:
             dict: The result of the transcription. The plain text can be accessed by 'result["text"]'.
         """
-        name = os.path.basename(audio_file).split(".")[0]
-        if (VARIABLE_DIRECTORY / f"{name}_en.joblib").exists() and not no_cache:
-            logging.info(f"{name}: Loading variable with joblib.")
-            result = load(VARIABLE_DIRECTORY / f"{name}_en.joblib")
+        name = audio_name(audio_file)
+        options = {"task": "translate", "suppress_blank": False}
+        key = self._cache_key(audio_file, options)
+        result = None if no_cache else self.cache.get(key)
+        if result is not None:
+            logging.info(f"{name}: Loading cached translation.")
         else:
             logging.info(f"{name}: Transcribing and translating the audio file.")
-            options = {"task": "translate", "suppress_blank": False}
             result = self.model.transcribe(
-                audio_file, fp16=self.fp16_settings, **options
+                self._whisper_input(audio_file), fp16=self.fp16_settings, **options
             )
-            dump(result, VARIABLE_DIRECTORY / f"{name}_en.joblib")
+            self.cache.put(key, result)
             logging.info(f"{name}: Transcription and translation finished.")
 
         result["segments"] = Transcriber._adjust_end_time_whisper(
@@ -82,76 +116,287 @@ class Transcriber:
 
         return result
 
+    def transcribe_bilingual(self, audio_file, no_cache=False) -> tuple:
+        """This method transcribes the audio file in its original language and translates it to english.
+        The audio is decoded once and every 30 second window is encoded once, both tasks decode from the shared
+        encoder output. Unlike `transcribe`, the windows do not move with the decoded timestamps, since both tasks
+        have to use the same windows.
+
+        Args:
+            audio_file (str | DecodedAudio): The path to the audio file or the decoded audio.
+            no_cache (bool): If false, it loads previous transcriptions. Defaults to False.
+
+        Returns:
+            tuple: The result of the transcription and the result of the translation.
+        """
+        name = audio_name(audio_file)
+        tasks = (
+            {"task": "transcribe"},
+            {"task": "translate", "suppress_blank": False},
+        )
+        keys = [
+            self._cache_key(audio_file, {**options, "decoder": "shared_encoder"})
+            for options in tasks
+        ]
+        results = [None, None] if no_cache else [self.cache.get(key) for key in keys]
+        if all(result is not None for result in results):
+            logging.info(f"{name}: Loading cached transcription and translation.")
+            result_original, result_english = results
+        else:
+            logging.info(f"{name}: Transcribing and translating with a shared encoder.")
+            result_original, result_english = self._decode_shared_encoder(
+                audio_file, tasks=tasks
+            )
+            self.cache.put(keys[0], result_original)
+            self.cache.put(keys[1], result_english)
+            logging.info(f"{name}: Transcription and translation finished.")
+
+        for result in (result_original, result_english):
+            result["segments"] = Transcriber._adjust_end_time_whisper(
+                result["segments"], audio_file=audio_file
+            )
+
+        return result_original, result_english
+
+    def _cache_key(self, audio_file, options: dict) -> str:
+        """Not intended for external use. Creates the cache key of a result from the content of the audio file, the
+        model and the decoding options."""
+        return DiskCache.key(
+            audio_file.digest()
+            if isinstance(audio_file, DecodedAudio)
+            else self.cache.digest(audio_file),
+            self.model_name,
+            self.fp16_settings,
+            options,
+        )
+
     @classmethod
-    def write_vtt(cls, result, output_dir):
-        """This method generates a vtt subtitle file.
+    def _whisper_input(cls, audio_file):
+        """Not intended for external use. Returns the 16 kHz mono samples of decoded audio, so whisper does not
+        decode the file again, or the path to the audio file."""
+        if isinstance(audio_file, DecodedAudio):
+            return audio_file.resampled(WHISPER_SAMPLE_RATE)
+        return str(audio_file)
+
+    def _decode_shared_encoder(self, audio_file, tasks: tuple) -> list:
+        """Not intended for external use. Runs several decoding tasks on the same encoder output.
+        It follows `whisper.transcribe`, including the temperature fallback and the no speech detection.
 
         Args:
-            result (dict): The "segments" key of the dict result returned by whisper.
-            output_dir (str): The path to the subtitle file ending in '.vtt'.
+            audio_file (str | DecodedAudio): The path to the audio file or the decoded audio.
+            tasks (tuple): The decoding options of every task, e.g. `{"task": "translate"}`.
+
+        Returns:
+            list: One whisper result per task.
         """
-        logging.info(
-            f"{os.path.basename(output_dir).split('.')[0]}: Generating vtt subtitles."
+        import torch
+        from whisper.audio import (
+            HOP_LENGTH,
+            N_FRAMES,
+            SAMPLE_RATE,
+            log_mel_spectrogram,
+            pad_or_trim,
         )
-        with open(str(output_dir), "w") as f:
-            print("WEBVTT\n", file=f)
-            for segment in result["segments"]:
-                print(
-                    f"{cls._format_timestamp(segment['start'])} --> {cls._format_timestamp(segment['end'])}\n"
-                    f"{segment['text'].strip().replace('-->', '->')}\n",
-                    file=f,
-                    flush=True,
+        from whisper.tokenizer import get_tokenizer
+
+        model = self.model
+        dtype = torch.float16 if self.fp16_settings else torch.float32
+
+        mel = log_mel_spectrogram(self._whisper_input(audio_file))
+        n_frames = mel.shape[-1]
+        input_stride = N_FRAMES // model.dims.n_audio_ctx
+        time_precision = input_stride * HOP_LENGTH / SAMPLE_RATE
+        audio_duration = n_frames * HOP_LENGTH / SAMPLE_RATE
+
+        language = None
+        states = [
+            {"tokens": [], "segments": [], "prompt_reset_since": 0} for _ in tasks
+        ]
+
+        for seek in range(0, n_frames, N_FRAMES):
+            segment = pad_or_trim(mel[:, seek:], N_FRAMES).to(model.device).to(dtype)
+            audio_features = model.embed_audio(segment.unsqueeze(0))[0]
+
+            if language is None:
+                if model.is_multilingual:
+                    _, probs = model.detect_language(audio_features)
+                    language = max(probs, key=probs.get)
+                else:
+                    language = "en"
+
+            timestamp_offset = seek * HOP_LENGTH / SAMPLE_RATE
+            window_end = min(
+                timestamp_offset + N_FRAMES * HOP_LENGTH / SAMPLE_RATE, audio_duration
+            )
+
+            for options, state in zip(tasks, states):
+                tokenizer = get_tokenizer(
+                    model.is_multilingual, language=language, task=options["task"]
                 )
-        logging.info(
-            f"{os.path.basename(output_dir).split('.')[0]}: Subtitles generated."
+                result = self._decode_with_fallback(
+                    audio_features,
+                    language=language,
+                    prompt=state["tokens"][state["prompt_reset_since"] :],
+                    **options,
+                )
+
+                skip = result.no_speech_prob > 0.6 and result.avg_logprob <= -1.0
+                if not skip:
+                    self._add_window_segments(
+                        state,
+                        tokens=result.tokens,
+                        result=result,
+                        tokenizer=tokenizer,
+                        seek=seek,
+                        timestamp_offset=timestamp_offset,
+                        window_end=window_end,
+                        time_precision=time_precision,
+                    )
+
+                if result.temperature > 0.5:
+                    state["prompt_reset_since"] = len(state["tokens"])
+
+        results = []
+        for options, state in zip(tasks, states):
+            tokenizer = get_tokenizer(
+                model.is_multilingual, language=language, task=options["task"]
+            )
+            results.append(
+                {
+                    "text": tokenizer.decode(
+                        [token for token in state["tokens"] if token < tokenizer.eot]
+                    ),
+                    "segments": state["segments"],
+                    "language": language,
+                }
+            )
+        return results
+
+    def _decode_with_fallback(self, audio_features, **options):
+        """Not intended for external use. Decodes the encoded audio and raises the temperature if the result is too
+        repetitive or too unlikely, like `whisper.transcribe`.
+
+        Args:
+            audio_features (torch.Tensor): The encoder output of one 30 second window.
+
+        Returns:
+            whisper.DecodingResult: The decoding result.
+        """
+        from whisper.decoding import DecodingOptions
+
+        for temperature in (0.0, 0.2, 0.4, 0.6, 0.8, 1.0):
+            decoding_options = DecodingOptions(
+                temperature=temperature, fp16=self.fp16_settings, **options
+            )
+            result = self.model.decode(audio_features, decoding_options)
+            if result.compression_ratio <= 2.4 and result.avg_logprob >= -1.0:
+                break
+
+        return result
+
+    @classmethod
+    def _add_window_segments(
+        cls,
+        state: dict,
+        tokens: list,
+        result,
+        tokenizer,
+        seek: int,
+        timestamp_offset: float,
+        window_end: float,
+        time_precision: float,
+    ) -> None:
+        """Not intended for external use. Splits the tokens of one window into segments at the timestamp tokens and
+        appends them to the state of the task. Text after the last pair of timestamps ends at the last timestamp or
+        at the end of the window.
+        """
+        timestamp_begin = tokenizer.timestamp_begin
+
+        def add_segment(start: float, end: float, text_tokens: list):
+            text = tokenizer.decode(
+                [token for token in text_tokens if token < tokenizer.eot]
+            )
+            if len(text.strip()) == 0:
+                return
+            state["segments"].append(
+                {
+                    "id": len(state["segments"]),
+                    "seek": seek,
+                    "start": start,
+                    "end": min(end, window_end),
+                    "text": text,
+                    "tokens": text_tokens,
+                    "temperature": result.temperature,
+                    "avg_logprob": result.avg_logprob,
+                    "compression_ratio": result.compression_ratio,
+                    "no_speech_prob": result.no_speech_prob,
+                }
+            )
+
+        last_slice = 0
+        for current_slice in range(1, len(tokens)):
+            if (
+                tokens[current_slice - 1] >= timestamp_begin
+                and tokens[current_slice] >= timestamp_begin
+            ):
+                sliced_tokens = tokens[last_slice:current_slice]
+                add_segment(
+                    start=timestamp_offset
+                    + (sliced_tokens[0] - timestamp_begin) * time_precision,
+                    end=timestamp_offset
+                    + (sliced_tokens[-1] - timestamp_begin) * time_precision,
+                    text_tokens=sliced_tokens[1:-1],
+                )
+                last_slice = current_slice
+
+        remaining = tokens[last_slice:]
+        timestamps = [token for token in remaining if token >= timestamp_begin]
+        start = timestamp_offset
+        if timestamps and remaining[0] >= timestamp_begin:
+            start += (remaining[0] - timestamp_begin) * time_precision
+        end = window_end
+        if len(timestamps) > 1 and remaining[-1] >= timestamp_begin:
+            end = timestamp_offset + (remaining[-1] - timestamp_begin) * time_precision
+        add_segment(
+            start=start,
+            end=end,
+            text_tokens=[token for token in remaining if token < timestamp_begin],
         )
 
+        state["tokens"].extend(tokens)
+
+    @classmethod
+    def write_vtt(cls, result, output_dir):
+        """This method generates a vtt subtitle file. See `subtitles.write_subtitles` to write several formats in one
+        pass.
+
+        Args:
+            result (dict | SegmentTable): The dict result returned by whisper or its segments.
+            output_dir (str): The path to the subtitle file ending in '.vtt'.
+        """
+        write_subtitles(result, {"vtt": output_dir})
+
     @classmethod
     def write_srt(cls, result: dict, output_dir: str):
-        """This method generates a srt subtitle file.
+        """This method generates a srt subtitle file. See `subtitles.write_subtitles` to write several formats in one
+        pass.
 
         Args:
-            result (dict): The "segments" key of the dict result returned by whisper.
+            result (dict | SegmentTable): The dict result returned by whisper or its segments.
             output_dir (str): The path to the subtitle file ending in '.srt'.
         """
-        logging.info(
-            f"{os.path.basename(output_dir).split('.')[0]}: Generating srt subtitles."
-        )
-        with open(str(output_dir), "w") as f:
-            for i, segment in enumerate(result["segments"], start=1):
-                print(
-                    f"{i}\n"
-                    f"{cls._format_timestamp(segment['start'], always_include_hours=True, decimal_marker=',')} --> "
-                    f"{cls._format_timestamp(segment['end'], always_include_hours=True, decimal_marker=',')}\n"
-                    f"{segment['text'].strip().replace('-->', '->')}\n",
-                    file=f,
-                    flush=True,
-                )
-        logging.info(
-            f"{os.path.basename(output_dir).split('.')[0]}: Subtitles generated."
-        )
+        write_subtitles(result, {"srt": output_dir})
 
     @classmethod
     def write_txt(cls, result: dict, output_dir: str):
-        """This method generates a txt file with the transcription.
+        """This method generates a txt file with the transcription. See `subtitles.write_subtitles` to write several
+        formats in one pass.
 
         Args:
-            result (dict): The "segments" key of the dict result returned by whisper.
+            result (dict | SegmentTable): The dict result returned by whisper or its segments.
             output_dir (str): The path to the txt file.
         """
-        logging.info(
-            f"{os.path.basename(output_dir).split('.')[0]}: Generating txt file."
-        )
-        with open(str(output_dir), "w") as f:
-            for segment in result["segments"]:
-                print(
-                    segment['text'].strip(),
-                    file=f,
-                    flush=True,
-                )
-        logging.info(
-            f"{os.path.basename(output_dir).split('.')[0]}: Txt file generated."
-        )
+        write_subtitles(result, {"txt": output_dir})
 
     @classmethod
     def _format_timestamp(
@@ -161,30 +406,18 @@ class Transcriber:
         decimal_marker: str = ".",
     ):
         """This method is not intended for external use. It formats time stamps for the subtitles."""
-        assert seconds >= 0, "non-negative timestamp expected"
-        milliseconds = round(seconds * 1000.0)
-
-        hours = milliseconds // 3_600_000
-        milliseconds -= hours * 3_600_000
-
-        minutes = milliseconds // 60_000
-        milliseconds -= minutes * 60_000
-
-        seconds = milliseconds // 1_000
-        milliseconds -= seconds * 1_000
-
-        hours_marker = f"{hours:02d}:" if always_include_hours or hours > 0 else ""
-        return f"{hours_marker}{minutes:02d}:{seconds:02d}{decimal_marker}{milliseconds:03d}"
+        return format_timestamps([seconds], always_include_hours, decimal_marker)[0]
 
     @classmethod
-    def _adjust_end_time_whisper(cls, segments: list, audio_file: str) -> list:
+    def _adjust_end_time_whisper(cls, segments: list, audio_file) -> list:
         """This method adjusts the final segment of the transcription. The end time of the last segment is greater than
         the length of the audio file. This caused problems for later use. To ensure all future methods work with the
         same transcription, this method is call right after the transcription.
 
         Args:
             segments (list): The segments from the whisper result. (Key "segments").
-            audio_file (str): The path to the audio file to adjust the end time to.
+            audio_file (str | DecodedAudio): The path to the audio file to adjust the end time to or the decoded
+                                             audio.
 
         Returns:
             list: Returns the segments with the modified last entry.
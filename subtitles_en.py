@@ -2,8 +2,6 @@ import argparse
 import logging
 from pathlib import Path
 
-from rtpt import RTPT
-
 from src import whisper_wrapper
 from utils.file_handler import embed_subtitles_in_mp4, get_audio_from_video_file
 from utils.path_handler import (
@@ -19,6 +17,8 @@ def main(video_directory: str = None, no_cache=False, use_rtpt=False):
     video_directory = video_directory if video_directory else ORIGINAL_VIDEO_DIRECTORY
 
     if use_rtpt:
+        from rtpt import RTPT
+
         rtpt = RTPT(
             name_initials="DP",
             experiment_name="Translate_Lecture:_Intro_to_AI",
@@ -28,6 +28,9 @@ def main(video_directory: str = None, no_cache=False, use_rtpt=False):
 
     create_folders()
 
+    # The model is shared by all videos and only loaded if a video has not been transcribed yet.
+    transcriber = whisper_wrapper.Transcriber(model="large")
+
     for video in video_directory.iterdir():
         name = video.stem
         video_file = ORIGINAL_VIDEO_DIRECTORY / f"{name}.mp4"
@@ -36,7 +39,6 @@ def main(video_directory: str = None, no_cache=False, use_rtpt=False):
 
         logging.info(name)
 
-        transcriber = whisper_wrapper.Transcriber(model="large")
         result_english = transcriber.transcribe_and_translate(
             audio_file, no_cache=no_cache
         )
@@ -54,6 +56,7 @@ def main(video_directory: str = None, no_cache=False, use_rtpt=False):
         if use_rtpt:
             rtpt.step()
 
+    transcriber.cache.log_stats("whisper")
     logging.info("Finished.")
 
 
@@ -2,8 +2,6 @@ import argparse
 import logging
 from pathlib import Path
 
-from rtpt import RTPT
-
 from src import whisper_wrapper
 from utils.file_handler import embed_two_subtitles_in_mp4, get_audio_from_video_file
 from utils.path_handler import (
@@ -18,6 +16,8 @@ from utils.path_handler import (
 def main(video_directory: str = None, no_cache=False, use_rtpt=True):
     video_directory = video_directory if video_directory else ORIGINAL_VIDEO_DIRECTORY
     if use_rtpt:
+        from rtpt import RTPT
+
         rtpt = RTPT(
             name_initials="DP",
             experiment_name="Translate_Lecture:_Intro_to_AI",
@@ -27,21 +27,23 @@ def main(video_directory: str = None, no_cache=False, use_rtpt=True):
 
     create_folders()
 
+    # The model is shared by all videos and only loaded if a video has not been transcribed yet.
+    transcriber = whisper_wrapper.Transcriber(model="large")
+
     for video in video_directory.iterdir():
         name = video.stem
         video_file = ORIGINAL_VIDEO_DIRECTORY / f"{name}.mp4"
         audio_file = str(AUDIO_DIRECTORY / f"{name}.wav")
         get_audio_from_video_file(video_file=video_file, output_path=audio_file)
 
-        transcriber = whisper_wrapper.Transcriber(model="large")
-        result_original = transcriber.transcribe(audio_file, no_cache=no_cache)
+        # Both results are decoded from the same encoder output.
+        result_original, result_english = transcriber.transcribe_bilingual(
+            audio_file, no_cache=no_cache
+        )
         whisper_wrapper.Transcriber.write_srt(
             result=result_original,
             output_dir=str(SUBTITLES_DIRECTORY / f"{name}_original.srt"),
         )
-        result_english = transcriber.transcribe_and_translate(
-            audio_file, no_cache=no_cache
-        )
         whisper_wrapper.Transcriber.write_srt(
             result=result_english,
             output_dir=str(SUBTITLES_DIRECTORY / f"{name}_en.srt"),
@@ -64,6 +66,7 @@ def main(video_directory: str = None, no_cache=False, use_rtpt=True):
             output_path=output_path,
         )
 
+    transcriber.cache.log_stats("whisper")
     logging.info("Finished.")
 
 
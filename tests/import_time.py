@@ -0,0 +1,32 @@
+"""This module measures the imports of a module with `-X importtime`. It is used by the import time test and the
+import time benchmark."""
+import subprocess
+import sys
+
+# these dependencies take seconds to import and are only imported when they are used
+HEAVY_MODULES = ("torch", "whisper", "TTS", "librosa", "numba", "moviepy", "scipy")
+
+
+def import_times(module: str) -> dict:
+    """Imports a module in a fresh interpreter and returns the cumulative import time of every imported module in
+    seconds."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:") :].split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+def heavy_imports(times: dict) -> list:
+    """Returns the heavy dependencies among the imported modules, see `HEAVY_MODULES`."""
+    return sorted(name for name in times if name.split(".")[0] in HEAVY_MODULES)
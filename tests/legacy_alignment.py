@@ -0,0 +1,236 @@
+"""This module contains the former alignment of whisper segments and silences, which the tests compare the current
+alignment with."""
+import copy
+
+
+class LegacyAlignment:
+    """The alignment of `Silence.add_silence_segments_pydub_whisper` before it was rewritten as a single sweep.
+    It is copied without changes, apart from the detection of the silences and storing the result.
+    """
+
+    @classmethod
+    def align(
+        cls, segments: list, pydub_silences: list, max_duration: int = 30
+    ) -> list:
+        result = []
+
+        for i, segment in enumerate(segments):
+            pydub_segments = cls._get_pydub_segments_for_whisper_segment(
+                round(segment["start"], 2), round(segment["end"], 2), pydub_silences
+            )
+
+            if i == 0:
+                cls._add_text(
+                    pydub_segments,
+                    result,
+                    index=i,
+                    segments=segments,
+                    max_duration=max_duration,
+                )
+                continue
+
+            else:
+                difference = round(abs((segment["start"] - segments[i - 1]["end"])), 2)
+                if segment["text"] == "...":
+                    result.append(
+                        {
+                            "start": round(segments[i - 1]["end"], 2),
+                            "end": round(segment["end"], 2),
+                            "text": "__silence__",
+                        }
+                    )
+
+                elif difference > 0.1:
+                    result.append(
+                        {
+                            "start": round(segments[i - 1]["end"], 2),
+                            "end": round(segment["start"], 2),
+                            "text": "__silence__",
+                        }
+                    )
+
+                    result.append(
+                        {
+                            "start": round(segment["start"], 2),
+                            "end": round(segment["end"], 2),
+                            "duration": round((segment["end"] - segment["start"]), 2),
+                            "text": segment["text"],
+                        }
+                    )
+
+                else:
+                    cls._add_text(
+                        pydub_segments,
+                        result,
+                        index=i,
+                        segments=segments,
+                        max_duration=max_duration,
+                    )
+
+        i = 0
+        while i < len(result):
+            segment = result[i]
+            duration = round((segment["end"] - segment["start"]), 2)
+            if duration <= 0:
+                raise RuntimeError(
+                    f"Duration of segment is lower than or equal to zero."
+                )
+
+            segment["duration"] = duration
+            if (
+                segment["text"] == "__silence__"
+                and len(result) > i + 1
+                and result[i + 1]["text"] == "__silence__"
+            ):
+                segment["end"] = result[i + 1]["end"]
+                segment["duration"] = round(abs(segment["end"] - segment["start"]), 2)
+                result.pop(i + 1)
+            else:
+                i += 1
+
+        return result
+
+    @classmethod
+    def _add_text(
+        cls,
+        pydub_segments: list,
+        result: list,
+        index: int,
+        segments: list,
+        max_duration: int,
+    ) -> None:
+        """Not intended for external use.
+        This method is used by `align` to add text segments, including the pydub silence.
+
+        Args:
+            pydub_segments (list): The segments generated by `get_silence_segments_pydub`.
+            result (list): The resulting list to append the text to.
+            index (int): The current index in segments.
+            segments (list): The segments containing the text information.
+            max_duration (int): The maximum duration of resulting text segments.
+        """
+        segment = segments[index]
+
+        segment_start = segment["start"]
+        segment_end = segment["end"]
+        segment_duration = segment_end - segment_start
+
+        total_pydub_duration = 0
+
+        pydub_duration = 0
+        if len(pydub_segments) != 0:
+            for pydub_segment in pydub_segments:
+                if pydub_segment["position"] == "start":
+                    pydub_duration += round(
+                        (pydub_segment["end"] - pydub_segment["start"]), 2
+                    )
+
+                    pydub_segments.remove(pydub_segment)
+
+        total_pydub_duration += pydub_duration
+
+        if pydub_duration > 0:
+            if total_pydub_duration > segment_duration:
+                start = segment_start
+            elif index == 0:
+                start = 0
+            else:
+                start = round(result[-1]["end"], 2)
+
+            result.append(
+                {
+                    "start": round(start, 2),
+                    "end": round(start + pydub_duration, 2),
+                    "text": "__silence__",
+                }
+            )
+
+        if ((index == 0) or (result[-1]["text"] == "__silence__")) or (
+            (result[-1]["text"] != "__silence__")
+            and (result[-1]["duration"] > max_duration)
+        ):
+            result.append(
+                {
+                    "start": round((segment["start"] + pydub_duration), 2),
+                    "end": round(segment["end"], 2),
+                    "duration": round((segment["end"] - segment["start"]), 2),
+                    "text": segment["text"],
+                }
+            )
+        else:
+            result[-1]["text"] += segment["text"]
+            result[-1]["end"] = round(segment["end"], 2)
+            result[-1]["duration"] = round((result[-1]["end"] - result[-1]["start"]), 2)
+
+        pydub_duration = 0
+
+        if len(pydub_segments) != 0:
+            for pydub_segment in pydub_segments:
+                if pydub_segment["position"] == "end":
+                    # add silence to results
+
+                    pydub_duration += round(
+                        (pydub_segment["end"] - pydub_segment["start"]), 2
+                    )
+
+        total_pydub_duration += pydub_duration
+
+        if pydub_duration > 0:
+            if not (total_pydub_duration > segment_duration):
+                end = round(result[-1]["end"], 2)
+                result[-1]["end"] = round((end - pydub_duration), 2)
+
+                result.append(
+                    {
+                        "start": round(result[-1]["end"], 2),
+                        "end": round(end, 2),
+                        "text": "__silence__",
+                    }
+                )
+
+    @classmethod
+    def _get_pydub_segments_for_whisper_segment(
+        cls, start: float, end: float, pydub_silence: list
+    ) -> list:
+        """This method returns silences starting between start and end.
+
+        Args:
+            start (float): The start time in seconds.
+            end (float): The end time in seconds.
+            pydub_silence (list): A list of dictionaries containing start and end.
+
+        Returns:
+            list: Returns all fitting silences.
+        """
+
+        pydub_segments = []
+
+        for silence in pydub_silence:
+            if silence["start"] < start:
+                pydub_silence.remove(silence)
+                continue
+
+            if silence["start"] > end:
+                break
+
+            if end < silence["end"]:
+                silence["position"] = "end"
+            else:
+                middle = round((silence["start"] + silence["end"]) / 2, 2)
+                silence["position"] = (
+                    "start"
+                    if abs(middle - silence["start"]) < abs(middle - silence["end"])
+                    else "end"
+                )
+
+            pydub_segments.append(silence)
+
+        return pydub_segments
+
+
+def run(function, segments: list, silences: list, max_duration: int):
+    """Returns the result of an alignment or the exception it raised."""
+    try:
+        return function(copy.deepcopy(segments), copy.deepcopy(silences), max_duration)
+    except (RuntimeError, TypeError) as exception:
+        return repr(exception)
@@ -0,0 +1,21 @@
+"""Checks that the scripts and the modules of `src` import no heavy dependency at module load and import quickly."""
+from pathlib import Path
+
+import pytest
+
+from tests.import_time import heavy_imports, import_times
+
+MODULES = ["translate_lecture"] + [
+    f"src.{path.stem}"
+    for path in sorted((Path(__file__).parents[1] / "src").glob("*.py"))
+    if path.stem != "__init__"
+]
+# the budget of a fresh import in seconds, about five times the import time of translate_lecture
+MAX_SECONDS = 1.0
+
+
+@pytest.mark.parametrize("module", MODULES)
+def test_import_is_lazy_and_fast(module):
+    times = import_times(module)
+    assert heavy_imports(times) == []
+    assert times[module] < MAX_SECONDS
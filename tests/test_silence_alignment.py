@@ -0,0 +1,68 @@
+"""Compares the alignment of whisper segments and silences with the former implementation on generated lectures."""
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+
+from src.silence import Silence
+from tests.legacy_alignment import LegacyAlignment, run
+
+
+@st.composite
+def lectures(draw, max_segments: int = 30) -> tuple:
+    """Draws whisper segments and silences in seconds, similar to a lecture: segments separated by gaps, silences inside
+    segments or crossing into the next one, and a few empty, short or `...` segments."""
+    whisper_segments = []
+    silences = []
+    position = 0.0
+    for index in range(draw(st.integers(0, max_segments))):
+        gap = draw(
+            st.one_of(
+                st.just(0.0),
+                st.sampled_from([0.05, 0.1, 0.5]),
+                st.floats(0, 5, allow_nan=False),
+            )
+        )
+        if gap >= 1 and draw(st.booleans()):
+            silences.append({"start": position, "end": position + gap})
+        position += gap
+
+        duration = draw(
+            st.one_of(
+                st.sampled_from([0.0, 0.01, 0.3]),
+                st.floats(2, 20, allow_nan=False),
+            )
+        )
+        start = round(position, draw(st.sampled_from([2, 3])))
+        end = round(position + duration, draw(st.sampled_from([2, 3])))
+        text = draw(st.sampled_from([f" word {index}", "..."]))
+        whisper_segments.append({"start": start, "end": end, "text": text})
+
+        silence_start = position
+        for offset, length in draw(
+            st.lists(
+                st.tuples(
+                    st.floats(0, duration / 2 + 0.5, allow_nan=False),
+                    st.floats(1, 2.5, allow_nan=False),
+                ),
+                max_size=3,
+            )
+        ):
+            silence_start += offset
+            silences.append(
+                {
+                    "start": round(silence_start, 3),
+                    "end": round(silence_start + length, 3),
+                }
+            )
+            silence_start += length
+        position = max(position + duration, silence_start)
+
+    return whisper_segments, silences
+
+
+@settings(max_examples=300, deadline=None, suppress_health_check=[HealthCheck.too_slow])
+@given(lectures(), st.sampled_from([None, 5, 30]))
+def test_align_silences_matches_legacy_alignment(lecture, max_duration):
+    segments, silences = lecture
+    expected = run(LegacyAlignment.align, segments, silences, max_duration)
+    actual = run(Silence.align_silences, segments, silences, max_duration)
+    assert actual == expected
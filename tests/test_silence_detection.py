@@ -0,0 +1,71 @@
+"""Compares the numpy silence detection with `pydub.silence.detect_silence` on generated audio."""
+import os
+import tempfile
+
+import numpy as np
+import pydub.silence
+import soundfile as sf
+from hypothesis import HealthCheck, given, settings
+from hypothesis import strategies as st
+
+from src.silence_detector import detect_silence
+from utils.audio import DecodedAudio
+
+# the standard deviations of the noise, around and far from the thresholds
+LEVELS = [0, 2, 8, 20, 60, 100, 110, 200, 3000]
+
+
+@st.composite
+def audio(draw) -> DecodedAudio:
+    """Draws 16 bit audio of runs of noise with different loudness, similar to speech and pauses."""
+    sample_rate = draw(st.sampled_from([8000, 16000, 44100]))
+    channels = draw(st.sampled_from([1, 2]))
+    runs = draw(
+        st.lists(
+            st.tuples(st.integers(0, 1500), st.sampled_from(LEVELS)),
+            min_size=1,
+            max_size=6,
+        )
+    )
+    generator = np.random.default_rng(draw(st.integers(0, 2**32 - 1)))
+    samples = np.concatenate(
+        [
+            generator.normal(0, level, (length * sample_rate // 1000, channels))
+            for length, level in runs
+        ]
+    )
+    return DecodedAudio(samples.astype(np.int16), sample_rate)
+
+
+def write_wav(audio: DecodedAudio, directory: str) -> DecodedAudio:
+    """Writes the audio to a wav file and maps it from there, so it is detected in chunks like a decoded lecture."""
+    path = os.path.join(directory, "lecture.wav")
+    sf.write(path, audio.samples, audio.sample_rate, subtype="PCM_16")
+    return DecodedAudio.from_file(path, audio.sample_rate, audio.channels)
+
+
+detection_settings = settings(
+    max_examples=100, deadline=None, suppress_health_check=[HealthCheck.too_slow]
+)
+
+
+@detection_settings
+@given(audio(), st.sampled_from([100, 500, 1000]), st.sampled_from([-60, -50, -40]))
+def test_detect_silence_matches_pydub(audio, silence_duration, silence_threshold):
+    expected = pydub.silence.detect_silence(
+        audio.to_audio_segment(), silence_duration, silence_threshold
+    )
+    assert detect_silence(audio, silence_duration, silence_threshold) == expected
+
+
+@detection_settings
+@given(audio(), st.sampled_from([100, 500, 1000]), st.integers(1, 3000))
+def test_chunked_detection_matches_pydub(audio, silence_duration, chunk_length):
+    expected = pydub.silence.detect_silence(
+        audio.to_audio_segment(), silence_duration, -50
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        mapped = write_wav(audio, directory)
+        actual = detect_silence(mapped, silence_duration, -50, chunk_length)
+        del mapped
+    assert actual == expected
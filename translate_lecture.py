@@ -1,24 +1,42 @@
 """This module is used to translate the videos."""
 import argparse
 import logging
+import time
+from functools import partial
 from pathlib import Path
 
-from rtpt import RTPT
-
+from src.manifest import LectureManifest
+from src.pipeline import Pipeline, Stage
+from src.segments import SegmentTable
 from src.silence import Silence
-from src.speaker import SegmentsSpeaker
+from src.speaker import TTS_CACHE_MAX_BYTES, SegmentsSpeaker
+from src.tts_wrapper import TTS_MODEL_NAME, create_pool
 from src.whisper_wrapper import Transcriber
 from utils import file_handler
+from utils.audio import DecodedAudio
+from utils.cache import DiskCache, file_digest
+from utils.time_stretch import METHODS, PHASE_VOCODER
 from utils.path_handler import (
     AUDIO_DIRECTORY,
     AUDIO_TRANSLATED_SPEED_DIRECTORY,
     ORIGINAL_VIDEO_DIRECTORY,
+    REPORT_DIRECTORY,
     SUBTITLES_DIRECTORY,
+    TTS_CACHE_DIRECTORY,
+    VARIABLE_DIRECTORY,
     VIDEO_DEST_DIRECTORY,
     VIDEO_DIRECTORY,
     VIDEO_SUBTITLES_DIRECTORY,
     create_folders,
 )
+from utils.tracing import Tracer, format_eta
+
+
+STAGES = ("split", "transcribe", "align", "synthesize", "mux")
+# the stages that run in several threads, whisper and TTS keep one thread
+PARALLEL_STAGES = ("split", "align", "mux")
+# the stages recorded in the manifest of a lecture, splitting only decodes the audio in memory
+RESUMABLE_STAGES = ("transcribe", "align", "synthesize", "mux")
 
 
 def main(
@@ -27,39 +45,124 @@ def main(
     use_rtpt: bool = True,
     use_cuda: bool = True,
     no_cache=False,
+    stream_audio: bool = False,
+    tts_batch_size: int = 1,
+    tts_workers: int = None,
+    tts_threads: int = None,
+    stage_workers: dict = None,
+    keep_intermediate_videos: bool = False,
+    silence_workers: int = 1,
+    stretch_method: str = PHASE_VOCODER,
+    prometheus_textfile: str = None,
 ):
     """This function is the main function of the program. It is called when the program is executed.
     It is responsible for the whole process of translating a lecture.
+    The videos pass the steps in a pipeline, so different videos can be in different steps at the same time.
     Steps:
-    - split all videos into audio files and video files without audio
+    - extract the audio of all videos
     - translate and transcribe the audio files
     - generate subtitles and text files
     - synthesize the audio files
-    - merge the audio files and the video files
-    - merge the video files and the subtitles
+    - mux the original video, the synthesized audio and the subtitles in one pass
+    Every lecture has a manifest of its completed stages. A lecture resumes at the first stage that has not been
+    completed with the same inputs and parameters, or whose outputs changed.
+    The wall time, cpu time and real-time factor of every stage are traced and written to a run report in
+    `REPORT_DIRECTORY` after every stage. The remaining time is estimated from the observed real-time factors.
+
+    Args:
+        stage_workers (dict, optional): The number of threads of the steps in `PARALLEL_STAGES`, e.g.
+                                        `{"split": 2}`. Whisper and TTS keep one thread. Defaults to one thread per
+                                        step.
+        keep_intermediate_videos (bool, optional): Whether to also write the videos without audio and the translated
+                                                   videos without subtitles. Defaults to False.
+        silence_workers (int, optional): The number of processes detecting silence in a video. Defaults to 1.
+        stretch_method (str, optional): The method fitting the synthesized audio to the durations, `phase_vocoder`
+                                        or `wsola`. Defaults to `phase_vocoder`.
+        prometheus_textfile (str, optional): The path the traced metrics are also written to in the Prometheus text
+                                             format, e.g. in the directory of the textfile collector of the node
+                                             exporter. Defaults to None.
+
+    Raises:
+        ValueError: If `stage_workers` contains a step that does not run in several threads.
     """
+    stage_workers = stage_workers or {}
+    unknown = set(stage_workers) - set(PARALLEL_STAGES)
+    if unknown:
+        raise ValueError(
+            f"Only {', '.join(PARALLEL_STAGES)} run in several threads, got {sorted(unknown)}."
+        )
 
     logging.info(
         f"Starting the translation process for all videos in {video_directory}."
     )
 
+    videos = list(video_directory.iterdir())
+
     if use_rtpt:
         logging.debug("Initializing and starting the RTPT process.")
+        from rtpt import RTPT
+
         rtpt = RTPT(
             name_initials="DP",
             experiment_name="Translating:IntroAI",
-            max_iterations=len(list(video_directory.iterdir())),
+            max_iterations=len(videos),
         )
 
         rtpt.start()
 
     create_folders()
 
-    for original_video in video_directory.iterdir():
+    # The model is shared by all videos and only loaded if a video has not been transcribed yet.
+    transcriber = Transcriber(model="large", fp16_settings=True)
+    tts_cache = DiskCache(TTS_CACHE_DIRECTORY, max_bytes=TTS_CACHE_MAX_BYTES)
+    # The TTS workers are shared by all videos, so every worker loads its model once. They are only started when the
+    # first text is synthesized.
+    tts_pool = (
+        create_pool(
+            workers=tts_workers,
+            model_name=TTS_MODEL_NAME,
+            gpu=use_cuda,
+            torch_threads=tts_threads,
+        )
+        if tts_workers
+        else None
+    )
+
+    tracer = Tracer(
+        STAGES,
+        workers={stage: stage_workers.get(stage, 1) for stage in PARALLEL_STAGES},
+    )
+    report_path = REPORT_DIRECTORY / f"{time.strftime('%Y%m%d-%H%M%S')}_run.json"
+
+    def export() -> None:
+        tracer.write_report(report_path)
+        if prometheus_textfile:
+            tracer.write_prometheus(prometheus_textfile)
+
+    # the parameters changing the outputs of every stage, a change runs the stage again
+    parameters = {
+        "transcribe": {
+            "model": transcriber.model_name,
+            "fp16": transcriber.fp16_settings,
+        },
+        "align": {"max_segment_duration": max_segment_duration},
+        "synthesize": {"model": TTS_MODEL_NAME, "stretch_method": stretch_method},
+        "mux": {
+            "language": "eng",
+            "keep_intermediate_videos": keep_intermediate_videos,
+        },
+    }
+
+    lectures = []
+    for original_video in videos:
         lecture_name = original_video.stem
+        manifest = LectureManifest(lecture_name)
 
-        # if there is a video with the same name in VIDEO_SUBTITLES_DIRECTORY , skip this video
-        if (VIDEO_DEST_DIRECTORY / f"{lecture_name}.mp4").exists():
+        # videos translated before the manifests existed are skipped, as before
+        if (
+            not manifest.stages
+            and (VIDEO_SUBTITLES_DIRECTORY / f"{lecture_name}.mp4").exists()
+        ):
             logging.warning(
                 f"{lecture_name}: Skipped, since a video with the same name exists at {VIDEO_SUBTITLES_DIRECTORY}."
             )
@@ -67,53 +170,382 @@ def main(
                 rtpt.step()
             continue
 
-        logging.info(lecture_name)
+        # the stage the lecture resumes at is found by the split workers, which hash the video, see `resume`
+        lecture = {
+            "name": lecture_name,
+            "video": original_video,
+            "manifest": manifest,
+            "parameters": parameters,
+        }
+        tracer.add_lecture(
+            lecture_name, file_handler.get_video_length(str(original_video))
+        )
+        lectures.append(lecture)
+    pipeline = Pipeline(
+        [
+            Stage(
+                "split",
+                traced(
+                    partial(split, keep_intermediate_videos=keep_intermediate_videos),
+                    "split",
+                    tracer,
+                    export,
+                    prepare=partial(resume, tracer=tracer, no_cache=no_cache),
+                ),
+                workers=stage_workers.get("split", 1),
+            ),
+            Stage(
+                "transcribe",
+                traced(
+                    partial(transcribe, transcriber=transcriber, no_cache=no_cache),
+                    "transcribe",
+                    tracer,
+                    export,
+                ),
+            ),
+            Stage(
+                "align",
+                traced(
+                    partial(
+                        align,
+                        max_segment_duration=max_segment_duration,
+                        silence_workers=silence_workers,
+                    ),
+                    "align",
+                    tracer,
+                    export,
+                ),
+                workers=stage_workers.get("align", 1),
+            ),
+            Stage(
+                "synthesize",
+                traced(
+                    partial(
+                        synthesize,
+                        use_cuda=use_cuda,
+                        stream_audio=stream_audio,
+                        tts_batch_size=tts_batch_size,
+                        tts_workers=tts_workers,
+                        tts_pool=tts_pool,
+                        stretch_method=stretch_method,
+                        tts_cache=tts_cache,
+                        no_cache=no_cache,
+                        tracer=tracer,
+                    ),
+                    "synthesize",
+                    tracer,
+                    export,
+                ),
+            ),
+            Stage(
+                "mux",
+                traced(
+                    partial(mux, keep_intermediate_videos=keep_intermediate_videos),
+                    "mux",
+                    tracer,
+                    export,
+                ),
+                workers=stage_workers.get("mux", 1),
+            ),
+        ]
+    )
 
-        file_handler.split_video(str(original_video))
+    finished = 0
 
-        # If the audio file has already been transcribed, this method uses the stored results.
-        transcriber = Transcriber(model="large", fp16_settings=True)
-        result = transcriber.transcribe_and_translate(
-            str(AUDIO_DIRECTORY / f"{lecture_name}.wav"), no_cache=no_cache
-        )
+    def on_done(lecture: dict, error: Exception):
+        nonlocal finished
+        finished += 1
+        tracer.finish_lecture(lecture["name"], error)
+        eta = format_eta(tracer.eta())
+        if error is None:
+            logging.info(
+                f"{lecture['name']}: Finished. ({finished}/{len(lectures)}, remaining {eta})"
+            )
+        else:
+            logging.error(
+                f"{lecture['name']}: Failed with {error!r}. ({finished}/{len(lectures)}, remaining {eta})"
+            )
+        export()
+        if use_rtpt:
+            rtpt.step(subtitle=f"eta{eta}")
+
+    try:
+        pipeline.run(lectures, on_done=on_done)
+    finally:
+        if tts_pool is not None:
+            tts_pool.shutdown()
+
+    transcriber.cache.log_stats("whisper")
+    tts_cache.log_stats("tts")
+    if lectures:
+        tracer.log_summary()
+        export()
+        logging.info(f"The run report was written to {report_path}.")
+    logging.info(f"Finished processing all videos in {video_directory}.")
+
+
+def parse_stage_workers(values: list) -> dict:
+    """Parses the number of threads of the stages from values like `split=2`.
+
+    Args:
+        values (list): The values of the form `<stage>=<threads>`.
+
+    Raises:
+        ValueError: If a value is malformed, the stage does not run in several threads or the number is not positive.
+
+    Returns:
+        dict: The number of threads by the name of the stage.
+    """
+    stage_workers = {}
+    for value in values:
+        name, separator, count = value.partition("=")
+        if not separator:
+            raise ValueError(
+                f"stage_workers: expected <stage>=<threads>, got {value!r}"
+            )
+        if name not in PARALLEL_STAGES:
+            raise ValueError(
+                f"stage_workers: unknown stage {name!r}, only {', '.join(PARALLEL_STAGES)} run in several threads"
+            )
+        try:
+            stage_workers[name] = int(count)
+        except ValueError:
+            raise ValueError(
+                f"stage_workers: the threads of {name} must be an integer, got {count!r}"
+            ) from None
+        if stage_workers[name] < 1:
+            raise ValueError(
+                f"stage_workers: the threads of {name} must be at least 1, got {count!r}"
+            )
+    return stage_workers
+
+
+def stage_outputs(lecture: dict, stage: str) -> list:
+    """Returns the paths of the files written by a stage of the lecture."""
+    name = lecture["name"]
+    if stage == "transcribe":
+        return [
+            VARIABLE_DIRECTORY / f"{name}_transcription.npz",
+            SUBTITLES_DIRECTORY / f"{name}.srt",
+        ]
+    if stage == "align":
+        return [VARIABLE_DIRECTORY / f"{name}_en_segments.npz"]
+    if stage == "synthesize":
+        return [AUDIO_TRANSLATED_SPEED_DIRECTORY / f"{name}.wav"]
+
+    outputs = [VIDEO_SUBTITLES_DIRECTORY / f"{name}.mp4"]
+    if lecture["parameters"]["mux"]["keep_intermediate_videos"]:
+        outputs.append(VIDEO_DEST_DIRECTORY / f"{name}.mp4")
+    return outputs
+
+
+def stage_inputs(lecture: dict, stage: str) -> dict:
+    """Returns the digests of the inputs of a stage of the lecture. These are the original video and the outputs of
+    the previous stage, and the subtitles for muxing."""
+    manifest = lecture["manifest"]
+    inputs = {"video": lecture["video_digest"]}
+    index = RESUMABLE_STAGES.index(stage)
+    if index > 0:
+        inputs.update(manifest.outputs(RESUMABLE_STAGES[index - 1]))
+    if stage == "mux":
+        inputs.update(manifest.outputs("transcribe"))
+    return inputs
+
+
+def first_invalid_stage(lecture: dict):
+    """Returns the first stage of the lecture that has to run, or None if all stages are valid."""
+    for stage in RESUMABLE_STAGES:
+        if not lecture["manifest"].is_valid(
+            stage, stage_inputs(lecture, stage), lecture["parameters"][stage]
+        ):
+            return stage
+    return None
+
+
+def resume(lecture: dict, tracer: Tracer, no_cache: bool) -> dict:
+    """Hashes the original video and finds the first stage of the lecture that has to run. It runs in the workers of
+    the split stage, so the videos are hashed in parallel with the other stages and not all before the pipeline
+    starts."""
+    lecture_name = lecture["name"]
+    lecture["video_digest"] = file_digest(str(lecture["video"]))
+    lecture["resume"] = (
+        RESUMABLE_STAGES[0] if no_cache else first_invalid_stage(lecture)
+    )
+    if lecture["resume"] is None:
+        logging.info(f"{lecture_name}: Skipped, since all stages are complete.")
+    elif lecture["resume"] != RESUMABLE_STAGES[0]:
+        logging.info(f"{lecture_name}: Resuming at {lecture['resume']}.")
+
+    tracer.plan_stages(
+        lecture_name,
+        [stage for stage in STAGES if not is_stage_skipped(lecture, stage)],
+    )
+    return lecture
+
+
+def is_skipped(lecture: dict, stage: str) -> bool:
+    """Returns whether a stage of the lecture is still valid from a previous run. All stages are valid, if the
+    lecture resumes at no stage."""
+    if lecture["resume"] is None:
+        return True
+    return RESUMABLE_STAGES.index(stage) < RESUMABLE_STAGES.index(lecture["resume"])
+
+
+def is_stage_skipped(lecture: dict, stage: str) -> bool:
+    """Returns whether a stage of the pipeline has nothing to do for the lecture, see `is_skipped`."""
+    # splitting only decodes the audio for the transcription and alignment
+    return is_skipped(lecture, "align" if stage == "split" else stage)
+
+
+def complete(lecture: dict, stage: str) -> None:
+    """Records a finished stage of the lecture in its manifest."""
+    lecture["manifest"].complete(
+        stage,
+        inputs=stage_inputs(lecture, stage),
+        parameters=lecture["parameters"][stage],
+        outputs=stage_outputs(lecture, stage),
+    )
 
-        # Write the subtitle file
-        Transcriber.write_srt(
-            result=result, output_dir=str(SUBTITLES_DIRECTORY / f"{lecture_name}.srt")
-        )
 
-        # Prepare the results for tts
-        segments = Silence.add_silence_segments_pydub_whisper(
-            result["segments"],
-            AUDIO_DIRECTORY / f"{lecture_name}.wav",
-            max_duration=max_segment_duration,
+def traced(function, stage: str, tracer: Tracer, export, prepare=None) -> callable:
+    """Returns the function of a stage, which records its time in the tracer and exports the records afterwards.
+    Stages that are still valid from a previous run are recorded as skipped. The function `prepare` runs before the
+    stage and is not recorded, e.g. `resume`, which decides whether the stage is skipped.
+    """
+
+    def run(lecture: dict) -> dict:
+        if prepare:
+            lecture = prepare(lecture)
+        skipped = is_stage_skipped(lecture, stage)
+        with tracer.span(stage, lecture["name"], skipped=skipped):
+            lecture = function(lecture)
+        export()
+        return lecture
+
+    return run
+
+
+def split(lecture: dict, keep_intermediate_videos: bool) -> dict:
+    """Decodes the audio of the video once. All following steps share the decoded audio.
+    The audio file and the video without audio are only written if they are kept. Nothing is decoded, if the
+    transcription and alignment of a previous run are still valid."""
+    logging.info(lecture["name"])
+    if is_skipped(lecture, "align"):
+        if (
+            keep_intermediate_videos
+            and not (VIDEO_DIRECTORY / f"{lecture['name']}.mp4").exists()
+        ):
+            file_handler.remove_audio_from_video_file(str(lecture["video"]))
+        return lecture
+
+    if keep_intermediate_videos:
+        file_handler.split_video(str(lecture["video"]))
+        lecture["audio"] = DecodedAudio.from_file(
+            AUDIO_DIRECTORY / f"{lecture['name']}.wav"
         )
+    else:
+        lecture["audio"] = DecodedAudio.from_file(lecture["video"])
+    return lecture
 
-        # Synthesize the results
-        speaker = SegmentsSpeaker(lecture_name=lecture_name, segments=segments)
-        speaker.speak(use_gpu=use_cuda)
 
-        # Merge audio and video file.
+def transcribe(lecture: dict, transcriber: Transcriber, no_cache: bool) -> dict:
+    """Transcribes and translates the audio and writes the subtitle file."""
+    lecture_name = lecture["name"]
+    transcription_path, subtitles_path = stage_outputs(lecture, "transcribe")
+
+    if is_skipped(lecture, "transcribe"):
+        if not is_skipped(lecture, "align"):
+            lecture["segments"] = SegmentTable.load(transcription_path)
+        return lecture
+
+    # If the audio file has already been transcribed, this method uses the stored results.
+    result = transcriber.transcribe_and_translate(lecture["audio"], no_cache=no_cache)
+    lecture["segments"] = SegmentTable.from_whisper(result)
+    lecture["segments"].save(transcription_path)
+
+    # Write the subtitle file
+    Transcriber.write_srt(result=lecture["segments"], output_dir=str(subtitles_path))
+    complete(lecture, "transcribe")
+    return lecture
+
+
+def align(lecture: dict, max_segment_duration: int, silence_workers: int) -> dict:
+    """Prepares the segments for tts by adding the silence segments."""
+    if is_skipped(lecture, "align"):
+        if not is_skipped(lecture, "synthesize"):
+            lecture["segments"] = SegmentTable.load(stage_outputs(lecture, "align")[0])
+        return lecture
+
+    lecture["segments"] = Silence.add_silence_segments_pydub_whisper(
+        lecture["segments"],
+        lecture["audio"],
+        max_duration=max_segment_duration,
+        workers=silence_workers,
+    )
+
+    # The decoded audio is not needed anymore.
+    del lecture["audio"]
+    complete(lecture, "align")
+    return lecture
+
+
+def synthesize(
+    lecture: dict,
+    use_cuda: bool,
+    stream_audio: bool,
+    tts_batch_size: int,
+    tts_workers: int,
+    tts_pool,
+    stretch_method: str,
+    tts_cache: DiskCache,
+    no_cache: bool,
+    tracer: Tracer = None,
+) -> dict:
+    """Synthesizes the translated audio. Texts synthesized before are loaded from the cache."""
+    if is_skipped(lecture, "synthesize"):
+        return lecture
+
+    speaker = SegmentsSpeaker(
+        lecture_name=lecture["name"],
+        segments=lecture["segments"],
+        video_file=lecture["video"],
+        streaming=stream_audio,
+        batch_size=tts_batch_size,
+        workers=tts_workers,
+        pool=tts_pool,
+        stretch_method=stretch_method,
+        cache=tts_cache,
+        no_cache=no_cache,
+        tracer=tracer,
+    )
+    speaker.speak(use_gpu=use_cuda)
+    complete(lecture, "synthesize")
+    return lecture
+
+
+def mux(lecture: dict, keep_intermediate_videos: bool) -> dict:
+    """Muxes the original video, the translated audio and the subtitles into the final video."""
+    if is_skipped(lecture, "mux"):
+        return lecture
+
+    lecture_name = lecture["name"]
+
+    file_handler.mux_translated_video(
+        video_file=str(lecture["video"]),
+        audio_file=str(AUDIO_TRANSLATED_SPEED_DIRECTORY / f"{lecture_name}.wav"),
+        subtitles_file=str(SUBTITLES_DIRECTORY / f"{lecture_name}.srt"),
+        language="eng",
+        output_path=str(VIDEO_SUBTITLES_DIRECTORY / lecture_name) + ".mp4",
+    )
+
+    if keep_intermediate_videos:
         file_handler.merge_audio_and_video_to_mp4(
             video_file=str(VIDEO_DIRECTORY / f"{lecture_name}.mp4"),
             audio_file=str(AUDIO_TRANSLATED_SPEED_DIRECTORY / f"{lecture_name}.wav"),
             output_path=str(VIDEO_DEST_DIRECTORY / lecture_name) + ".mp4",
         )
-
-        # Embed the subtitles in the video
-        file_handler.embed_subtitles_in_mp4(
-            video_file=VIDEO_DEST_DIRECTORY / f"{lecture_name}.mp4",
-            subtitles_file=SUBTITLES_DIRECTORY / f"{lecture_name}.srt",
-            output_path=str(VIDEO_SUBTITLES_DIRECTORY / lecture_name) + ".mp4",
-            language="eng",
-        )
-
-        logging.info(f"{lecture_name}: Finished.")
-
-        if use_rtpt:
-            rtpt.step()
-
-    logging.info(f"Finished processing all videos in {video_directory}.")
+    complete(lecture, "mux")
+    return lecture
 
 
 if __name__ == "__main__":
@@ -150,9 +582,66 @@ if __name__ == "__main__":
     parser.add_argument(
         "-no_cache",
         "--no_cache",
-        help="disable the use of stored translation results",
+        help="disable the use of stored translation results and synthesized audio",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-stream_audio",
+        "--stream_audio",
+        help="write the synthesized audio directly to disk instead of assembling it in memory",
+        action="store_true",
+    )
+    parser.add_argument(
+        "-tts_batch_size",
+        "--tts_batch_size",
+        help="the number of text segments synthesized together",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-tts_workers",
+        "--tts_workers",
+        help="the number of processes performing text-to-speech in parallel",
+        type=int,
+    )
+    parser.add_argument(
+        "-tts_threads",
+        "--tts_threads",
+        help="the number of torch threads of every text-to-speech process",
+        type=int,
+    )
+    parser.add_argument(
+        "-stage_workers",
+        "--stage_workers",
+        help=f"the number of threads of a step, e.g. split=2 align=2 mux=2, only {', '.join(PARALLEL_STAGES)} run in several threads",
+        nargs="+",
+        default=[],
+    )
+    parser.add_argument(
+        "-keep_intermediate_videos",
+        "--keep_intermediate_videos",
+        help="also write the videos without audio and the translated videos without subtitles",
         action="store_true",
     )
+    parser.add_argument(
+        "-silence_workers",
+        "--silence_workers",
+        help="the number of processes detecting silence in a video",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-stretch_method",
+        "--stretch_method",
+        help="the method fitting the synthesized audio to the durations, wsola is faster",
+        choices=METHODS,
+        default=PHASE_VOCODER,
+    )
+    parser.add_argument(
+        "-prometheus_textfile",
+        "--prometheus_textfile",
+        help="also write the traced time of every stage to this file in the Prometheus text format",
+    )
 
     args = parser.parse_args()
     if args.verbose:
@@ -175,10 +664,23 @@ if __name__ == "__main__":
         no_cache = True
     else:
         no_cache = False
+    try:
+        stage_workers = parse_stage_workers(args.stage_workers)
+    except ValueError as error:
+        parser.error(str(error))
 
     main(
         max_segment_duration=max_segment_duration,
         use_rtpt=use_rtpt,
         use_cuda=use_cuda,
         no_cache=no_cache,
+        stream_audio=args.stream_audio,
+        tts_batch_size=args.tts_batch_size,
+        tts_workers=args.tts_workers,
+        tts_threads=args.tts_threads,
+        stage_workers=stage_workers,
+        keep_intermediate_videos=args.keep_intermediate_videos,
+        silence_workers=args.silence_workers,
+        stretch_method=args.stretch_method,
+        prometheus_textfile=args.prometheus_textfile,
     )
@@ -0,0 +1,249 @@
+"""This module contains the decoded audio of a lecture. It is decoded once and shared by all steps, which accept it
+instead of a path to the audio file."""
+import hashlib
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+
+import numpy as np
+
+SAMPLE_RATE = 44100
+CHANNELS = 2
+WHISPER_SAMPLE_RATE = 16000
+
+CHUNK_SIZE = 1 << 20
+
+
+class DecodedAudio:
+    """This class holds 16 bit PCM samples in a memory-mapped numpy array of the shape (frames, channels).
+    Derived views, like the 16 kHz mono audio for whisper, are computed once and cached.
+    """
+
+    def __init__(self, samples: np.ndarray, sample_rate: int, path: str = None):
+        """Creates a DecodedAudio object. Use `from_file` to decode a file.
+
+        Args:
+            samples (np.ndarray): The 16 bit samples of the shape (frames, channels).
+            sample_rate (int): The sample rate of the samples.
+            path (str, optional): The path of the decoded file. Defaults to None.
+        """
+        self.samples = samples
+        self.sample_rate = sample_rate
+        self.path = str(path) if path else None
+        self._resampled = {}
+        self._digest = None
+        self._backing_file = None
+
+    @classmethod
+    def from_file(
+        cls, path: str, sample_rate: int = SAMPLE_RATE, channels: int = CHANNELS
+    ):
+        """Decodes the audio of an audio or video file. 16 bit wav files with the requested format are mapped
+        directly. Other files are decoded by ffmpeg, which pipes the samples into a memory-mapped buffer without
+        writing a wav file.
+
+        Args:
+            path (str): The path to the audio or video file.
+            sample_rate (int, optional): The sample rate of the decoded audio. Defaults to 44100.
+            channels (int, optional): The number of channels of the decoded audio. Defaults to 2.
+
+        Returns:
+            DecodedAudio: The decoded audio.
+        """
+        path = str(path)
+        header = read_wav_header(path)
+        if (
+            header
+            and header["format"] == 1
+            and header["bits"] == 16
+            and header["sample_rate"] == sample_rate
+            and header["channels"] == channels
+        ):
+            frames = header["data_size"] // (2 * channels)
+            samples = np.memmap(
+                path,
+                dtype="<i2",
+                mode="r",
+                offset=header["data_offset"],
+                shape=(frames, channels),
+            )
+            return cls(samples, sample_rate, path=path)
+
+        command = [
+            "ffmpeg",
+            "-nostdin",
+            "-i",
+            path,
+            "-vn",
+            "-f",
+            "s16le",
+            "-acodec",
+            "pcm_s16le",
+            "-ac",
+            str(channels),
+            "-ar",
+            str(sample_rate),
+            "-",
+            "-hide_banner",
+            "-loglevel",
+            "error",
+        ]
+        # a named file, so other processes can map the samples as well
+        backing_file = tempfile.NamedTemporaryFile(suffix=".pcm")
+        with subprocess.Popen(command, stdout=subprocess.PIPE) as process:
+            shutil.copyfileobj(process.stdout, backing_file, CHUNK_SIZE)
+        if process.returncode != 0:
+            backing_file.close()
+            raise RuntimeError(f"ffmpeg could not decode {path}.")
+
+        frames = backing_file.tell() // (2 * channels)
+        if frames == 0:
+            backing_file.close()
+            return cls(np.zeros((0, channels), dtype="<i2"), sample_rate, path=path)
+
+        samples = np.memmap(
+            backing_file, dtype="<i2", mode="r", shape=(frames, channels)
+        )
+        audio = cls(samples, sample_rate, path=path)
+        audio._backing_file = backing_file
+        return audio
+
+    @property
+    def name(self) -> str:
+        """The name of the decoded file without its extension."""
+        return os.path.basename(self.path).split(".")[0] if self.path else "audio"
+
+    @property
+    def channels(self) -> int:
+        """The number of channels."""
+        return self.samples.shape[1]
+
+    @property
+    def frames(self) -> int:
+        """The number of frames."""
+        return self.samples.shape[0]
+
+    @property
+    def duration(self) -> float:
+        """The length of the audio in seconds."""
+        return self.frames / float(self.sample_rate)
+
+    def mono(self) -> np.ndarray:
+        """Returns the audio as float32 mono samples between -1 and 1 at the original sample rate."""
+        mono = np.empty(self.frames, dtype=np.float32)
+        start = 0
+        for block in self.mono_blocks():
+            mono[start : start + len(block)] = block
+            start += len(block)
+        return mono
+
+    def mono_blocks(self, block_size: int = CHUNK_SIZE):
+        """Yields the audio as float32 mono samples between -1 and 1 in blocks, without converting it at once.
+
+        Args:
+            block_size (int, optional): The number of frames per block. Defaults to 1048576.
+        """
+        for start in range(0, self.frames, block_size):
+            chunk = self.samples[start : start + block_size]
+            block = chunk.mean(axis=1, dtype=np.float32)
+            block /= 32768.0
+            yield block
+
+    def resampled(self, sample_rate: int = WHISPER_SAMPLE_RATE) -> np.ndarray:
+        """Returns the audio as float32 mono samples at the given sample rate. The result is cached.
+
+        Args:
+            sample_rate (int, optional): The sample rate. Defaults to 16000, which whisper expects.
+
+        Returns:
+            np.ndarray: The resampled mono audio.
+        """
+        if sample_rate not in self._resampled:
+            from scipy.signal import resample_poly
+
+            mono = self.mono()
+            if sample_rate != self.sample_rate:
+                divisor = np.gcd(sample_rate, self.sample_rate)
+                mono = resample_poly(
+                    mono, sample_rate // divisor, self.sample_rate // divisor
+                ).astype(np.float32)
+            self._resampled[sample_rate] = mono
+        return self._resampled[sample_rate]
+
+    def to_audio_segment(self):
+        """Returns the audio as a pydub AudioSegment."""
+        from pydub import AudioSegment
+
+        return AudioSegment(
+            data=np.ascontiguousarray(self.samples).tobytes(),
+            sample_width=2,
+            frame_rate=self.sample_rate,
+            channels=self.channels,
+        )
+
+    def digest(self) -> str:
+        """Returns the sha256 hash of the samples. It is computed in chunks and cached."""
+        if self._digest is None:
+            sha256 = hashlib.sha256(struct.pack("<II", self.sample_rate, self.channels))
+            for start in range(0, self.frames, CHUNK_SIZE):
+                sha256.update(
+                    np.ascontiguousarray(self.samples[start : start + CHUNK_SIZE])
+                )
+            self._digest = sha256.hexdigest()
+        return self._digest
+
+
+def audio_name(audio) -> str:
+    """Returns the name of a path or a DecodedAudio object without the extension, as used in the logs."""
+    if isinstance(audio, DecodedAudio):
+        return audio.name
+    return os.path.basename(str(audio)).split(".")[0]
+
+
+def read_wav_header(path: str):
+    """Reads the format and the position of the samples of a wav file.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        dict: The format, channels, sample_rate, bits, data_offset and data_size, or None if it is not a wav file.
+    """
+    with open(path, "rb") as f:
+        riff = f.read(12)
+        if len(riff) < 12 or riff[:4] != b"RIFF" or riff[8:12] != b"WAVE":
+            return None
+
+        header = {}
+        while True:
+            chunk = f.read(8)
+            if len(chunk) < 8:
+                return None
+            chunk_id, chunk_size = struct.unpack("<4sI", chunk)
+
+            if chunk_id == b"fmt ":
+                fmt = f.read(chunk_size + chunk_size % 2)
+                (
+                    header["format"],
+                    header["channels"],
+                    header["sample_rate"],
+                    _,
+                    _,
+                    header["bits"],
+                ) = struct.unpack("<HHIIHH", fmt[:16])
+                if header["format"] == 0xFFFE and len(fmt) >= 26:
+                    # WAVE_FORMAT_EXTENSIBLE stores the actual format in the sub format
+                    header["format"] = struct.unpack("<H", fmt[24:26])[0]
+
+            elif chunk_id == b"data":
+                if "format" not in header:
+                    return None
+                header["data_offset"] = f.tell()
+                file_size = os.fstat(f.fileno()).st_size
+                header["data_size"] = min(chunk_size, file_size - f.tell())
+                return header
+
+            else:
+                f.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
@@ -0,0 +1,260 @@
+"""This module contains a content-addressed cache on disk.
+Entries are keyed by a hash of their inputs, so renamed files still hit the cache and changed files miss it.
+"""
+import atexit
+import hashlib
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+
+from joblib import dump, load
+
+from utils.file_handler import atomic_output
+from utils.path_handler import CACHE_DIRECTORY
+
+DIGEST_INDEX_NAME = "digests.json"
+DIGEST_INDEX_PATH = CACHE_DIRECTORY / DIGEST_INDEX_NAME
+# the maximum number of digests kept in an index, the least recently used are dropped
+MAX_DIGESTS = 10000
+# the number of new digests after which an index is written, the rest is written at exit
+SAVE_INTERVAL = 64
+
+_digest_indexes = {}
+_digest_lock = threading.Lock()
+
+
+def file_digest(
+    path: str, chunk_size: int = 1 << 20, index_path: str = DIGEST_INDEX_PATH
+) -> str:
+    """Returns the sha256 hash of the content of a file. The file is read in chunks. The hash is reused without
+    reading the file again, as long as its modification time and size are unchanged.
+
+    Args:
+        path (str): The path to the file.
+        chunk_size (int, optional): The number of bytes read at once. Defaults to 1 MiB.
+        index_path (str, optional): The json file the digests are stored in between runs. None keeps them in memory
+                                    only. Defaults to `DIGEST_INDEX_PATH`.
+
+    Returns:
+        str: The hex digest of the file content.
+    """
+    path = os.path.realpath(path)
+    stat = os.stat(path)
+
+    with _digest_lock:
+        index = _get_digest_index(index_path)
+        entry = index["entries"].pop(path, None)
+        if (
+            entry
+            and entry["mtime_ns"] == stat.st_mtime_ns
+            and entry["size"] == stat.st_size
+        ):
+            # reinserted as the most recently used entry
+            index["entries"][path] = entry
+            return entry["digest"]
+
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    digest = sha256.hexdigest()
+
+    with _digest_lock:
+        index = _get_digest_index(index_path)
+        index["entries"].pop(path, None)
+        index["entries"][path] = {
+            "mtime_ns": stat.st_mtime_ns,
+            "size": stat.st_size,
+            "digest": digest,
+        }
+        index["unsaved"] += 1
+        if index["unsaved"] >= SAVE_INTERVAL:
+            _save_digest_index(index_path, index)
+
+    return digest
+
+
+def save_digest_indexes() -> None:
+    """Writes the digests that have not been stored yet. This is called at exit."""
+    with _digest_lock:
+        for index_path, index in _digest_indexes.items():
+            if index["unsaved"]:
+                _save_digest_index(index_path, index)
+
+
+atexit.register(save_digest_indexes)
+
+
+def _get_digest_index(index_path) -> dict:
+    """Not intended for external use. Returns the loaded index, the lock must be held."""
+    key = str(index_path) if index_path else None
+    if key not in _digest_indexes:
+        _digest_indexes[key] = {
+            "entries": _load_digest_index(key) if key else {},
+            "unsaved": 0,
+        }
+    return _digest_indexes[key]
+
+
+def _load_digest_index(index_path: str) -> dict:
+    """Not intended for external use. Loads the stored file digests."""
+    try:
+        with open(index_path, "r") as f:
+            entries = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return entries if isinstance(entries, dict) else {}
+
+
+def _save_digest_index(index_path, index: dict) -> None:
+    """Not intended for external use. Drops the digests of deleted files and the least recently used digests beyond
+    `MAX_DIGESTS` and stores the others. The lock must be held."""
+    index["unsaved"] = 0
+    entries = index["entries"]
+    for path in [path for path in entries if not os.path.exists(path)]:
+        del entries[path]
+    for path in list(entries)[: max(len(entries) - MAX_DIGESTS, 0)]:
+        del entries[path]
+    if index_path is None:
+        return
+
+    try:
+        os.makedirs(os.path.dirname(str(index_path)), exist_ok=True)
+        with atomic_output(str(index_path)) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump(entries, f)
+    except OSError as error:
+        logging.warning(f"The file digests could not be stored: {error!r}")
+
+
+class DiskCache:
+    """This class stores values with joblib in a directory. If the entries exceed `max_bytes`, the least recently used
+    entries are deleted."""
+
+    def __init__(self, directory: Path, max_bytes: int):
+        """Creates a DiskCache.
+
+        Args:
+            directory (Path): The directory the entries are stored in.
+            max_bytes (int): The maximum size of all entries in bytes.
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts) -> str:
+        """Creates a key from the given parts. The parts must be serializable as json.
+
+        Returns:
+            str: The hex digest of the parts.
+        """
+        return hashlib.sha256(
+            json.dumps(parts, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+
+    def get(self, key: str, default=None):
+        """Returns the value stored for the key and marks it as recently used.
+
+        Args:
+            key (str): The key of the entry.
+            default (optional): The value returned if there is no entry. Defaults to None.
+
+        Returns:
+            The stored value or the default.
+        """
+        path = self._path(key)
+        try:
+            value = load(path)
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+            return default
+        except Exception as error:
+            # a truncated or incompatible entry is a miss and is replaced by the next put
+            logging.warning(f"Deleting the unreadable cache entry {path}: {error!r}")
+            try:
+                path.unlink(missing_ok=True)
+            except OSError:
+                pass
+            with self._lock:
+                self.misses += 1
+            return default
+
+        with self._lock:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value, evict: bool = True) -> None:
+        """Stores the value for the key and evicts the least recently used entries, if the cache is too large.
+
+        Args:
+            key (str): The key of the entry.
+            value: The value to store.
+            evict (bool, optional): Whether to evict entries now. Call `evict` after storing several entries instead.
+                                    Defaults to True.
+        """
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._path(key)
+        with atomic_output(path) as tmp_path:
+            dump(value, tmp_path)
+        if evict:
+            self.evict()
+
+    def evict(self) -> None:
+        """Deletes the least recently used entries until the cache is smaller than `max_bytes`. Every entry is
+        listed, so call it once after storing many entries rather than after each one. Temporary files of entries that
+        are still being written are skipped."""
+        with self._lock:
+            entries = []
+            for path in self.directory.glob("*.joblib"):
+                if ".tmp." in path.name:
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+
+            size = sum(entry[1] for entry in entries)
+            for _, entry_size, path in sorted(entries):
+                if size <= self.max_bytes:
+                    break
+                path.unlink(missing_ok=True)
+                size -= entry_size
+                self.evictions += 1
+
+    def digest(self, path: str) -> str:
+        """Returns the digest of a file like `file_digest`, but stores the digests in the directory of the cache."""
+        return file_digest(path, index_path=self.directory / DIGEST_INDEX_NAME)
+
+    @property
+    def stats(self) -> dict:
+        """The number of hits, misses and evictions since the cache was created."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+    def log_stats(self, name: str) -> None:
+        """Logs the statistics of the cache.
+
+        Args:
+            name (str): The name of the cache in the log.
+        """
+        stats = self.stats
+        logging.info(
+            f"{name} cache: {stats['hits']} hits, {stats['misses']} misses, {stats['evictions']} evictions."
+        )
+
+    def _path(self, key: str) -> Path:
+        """Not intended for external use. Returns the path of the entry for the key."""
+        return self.directory / f"{key}.joblib"
@@ -2,20 +2,23 @@
 This includes:
 - splitting a video into audio and video files
 - merging audio and video files
+- muxing a video, translated audio and subtitles in one pass
 - deleting files
 - merging video and subtitles
 - adjusting the speed of an audio file
+- writing files atomically
 """
+import itertools
 import logging
 import os
 import subprocess
-import wave
+import threading
+import weakref
 
-import librosa
 import soundfile as sf
-from moviepy.editor import *
-from moviepy.video.io.VideoFileClip import VideoFileClip
 
+from utils import media_probe, time_stretch
+from utils.audio import DecodedAudio, audio_name
 from utils.path_handler import (
     AUDIO_DIRECTORY,
     VIDEO_DEST_DIRECTORY,
@@ -24,6 +27,98 @@ from utils.path_handler import (
 )
 
 
+class AtomicOutput:
+    """This class writes a file through a temporary file next to it. The temporary file replaces the file at the path
+    once it is committed, or is deleted if it is aborted, so a partially written file never has the final name. The
+    temporary file is also deleted if the object is garbage collected or the interpreter exits before it is committed.
+    The temporary path keeps the extension, so tools can still infer the format from it.
+
+    Use it as a context manager, which commits if the block finishes and aborts if it raises, or call `commit` and
+    `abort`, e.g. in writers that stay open for several calls.
+    """
+
+    def __init__(self, path: str):
+        """Creates a temporary path for the given path. Every instance has its own temporary path, even for the same
+        path in the same thread.
+
+        Args:
+            path (str): The path of the written file.
+        """
+        self.path = str(path)
+        root, extension = os.path.splitext(self.path)
+        self.tmp_path = f"{root}.{os.getpid()}-{threading.get_ident()}-{next(_tmp_counter)}.tmp{extension}"
+        self._finalizer = weakref.finalize(self, _remove_file, self.tmp_path)
+
+    def __enter__(self) -> str:
+        return self.tmp_path
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+
+    def commit(self) -> None:
+        """Replaces the file at the path with the temporary file."""
+        try:
+            os.replace(self.tmp_path, self.path)
+        finally:
+            self.abort()
+
+    def abort(self) -> None:
+        """Deletes the temporary file, if it still exists. The file at the path is not changed."""
+        self._finalizer()
+
+
+_tmp_counter = itertools.count()
+
+
+def _remove_file(path: str) -> None:
+    """Not intended for external use. Deletes a file, if it exists."""
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def atomic_output(path: str) -> AtomicOutput:
+    """Returns a context manager yielding a temporary path next to the given path, see `AtomicOutput`.
+
+    Args:
+        path (str): The path of the written file.
+
+    Returns:
+        AtomicOutput: The context manager yielding the temporary path to write to.
+    """
+    return AtomicOutput(path)
+
+
+def run_ffmpeg(arguments: list, output_path: str) -> None:
+    """Runs ffmpeg with the given arguments and writes its output atomically to the output path. The arguments are
+    passed to ffmpeg as they are, without a shell, so paths may contain any character.
+
+    Args:
+        arguments (list): The arguments of ffmpeg before the output file, e.g. the inputs and the codecs.
+        output_path (str): The path of the written file.
+
+    Raises:
+        RuntimeError: If ffmpeg fails. The output path is not changed then.
+    """
+    with atomic_output(output_path) as tmp_path:
+        command = [
+            "ffmpeg",
+            "-y",
+            *[str(argument) for argument in arguments],
+            tmp_path,
+            "-hide_banner",
+            "-loglevel",
+            "error",
+        ]
+        returncode = subprocess.call(command)
+        if returncode != 0:
+            raise RuntimeError(
+                f"ffmpeg failed with exit code {returncode} writing {output_path}."
+            )
+
+
 def get_audio_from_video_file(video_file: str, output_path: str = None) -> None:
     """Extracts the audio from the given video file and saves it to the audio directory."""
     audio_path = (
@@ -34,8 +129,10 @@ def get_audio_from_video_file(video_file: str, output_path: str = None) -> None:
         )
     )
 
-    command = f"ffmpeg -y -i {video_file} -ab 160k -ac 2 -ar 44100 -vn {audio_path} -hide_banner -loglevel error"
-    subprocess.call(command, shell=True)
+    run_ffmpeg(
+        ["-i", video_file, "-ab", "160k", "-ac", "2", "-ar", "44100", "-vn"],
+        audio_path,
+    )
 
 
 def remove_audio_from_video_file(video_file: str, output_path: str = None) -> None:
@@ -48,8 +145,7 @@ def remove_audio_from_video_file(video_file: str, output_path: str = None) -> No
         )
     )
 
-    command = f"ffmpeg -y -i {str(video_file)} -vcodec copy -an {output_path} -hide_banner -loglevel error"
-    subprocess.call(command, shell=True)
+    run_ffmpeg(["-i", video_file, "-vcodec", "copy", "-an"], output_path)
 
 
 def split_video(
@@ -57,7 +153,11 @@ def split_video(
     video_output_path: str = None,
     audio_output_path: str = None,
 ) -> None:
-    """Splits the given video file into an audio file and a video file without audio."""
+    """Splits the given video file into an audio file and a video file without audio.
+
+    Raises:
+        RuntimeError: If ffmpeg fails, see `run_ffmpeg`.
+    """
     logging.info(
         f"{os.path.basename(video_file).split('.')[0]}: Splitting video into audio and video file."
     )
@@ -83,23 +183,95 @@ def merge_audio_and_video_to_mp4(
         f"{os.path.basename(output_path).split('.')[0]}: Merging audio and video."
     )
 
-    command = f"ffmpeg -y -i {video_file} -i {audio_file} -c:v copy -c:a aac -strict experimental -b:a 192k {output_path} -hide_banner -loglevel error"
-    subprocess.call(command, shell=True)
+    run_ffmpeg(
+        [
+            "-i",
+            video_file,
+            "-i",
+            audio_file,
+            "-c:v",
+            "copy",
+            "-c:a",
+            "aac",
+            "-strict",
+            "experimental",
+            "-b:a",
+            "192k",
+        ],
+        output_path,
+    )
+
+
+def mux_translated_video(
+    video_file: str,
+    audio_file: str,
+    subtitles_file: str,
+    language: str,
+    output_path: str = None,
+) -> None:
+    """Maps the video stream of the original video, the translated audio and the subtitles into one file.
+    The video stream is copied once, without intermediate video files. The subtitles must be formatted in .srt
+    """
+    output_path = (
+        str(output_path)
+        if output_path
+        else str(
+            VIDEO_SUBTITLES_DIRECTORY
+            / str(os.path.basename(video_file).split(".")[0] + ".mp4")
+        )
+    )
+    logging.info(
+        f"{os.path.basename(output_path).split('.')[0]}: Muxing video, translated audio and subtitles."
+    )
+
+    run_ffmpeg(
+        [
+            "-i",
+            video_file,
+            "-i",
+            audio_file,
+            "-i",
+            subtitles_file,
+            "-map",
+            "0:v",
+            "-map",
+            "1:a",
+            "-map",
+            "2:s",
+            "-c:v",
+            "copy",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "192k",
+            "-c:s",
+            "mov_text",
+            "-metadata:s:s:0",
+            f"language={language}",
+        ],
+        output_path,
+    )
 
 
 def get_video_length(video_file: str) -> float:
-    """Returns the length of the given video file in seconds."""
-    return VideoFileClip(video_file).duration
+    """Returns the length of the given video file in seconds. See `media_probe.get_duration`."""
+    return media_probe.get_duration(video_file)
+
 
+def get_audio_length(audio_file) -> float:
+    """Returns the audio file length in seconds. Accepts a path or a DecodedAudio object.
+    See `media_probe.get_duration`."""
+    if isinstance(audio_file, DecodedAudio):
+        return audio_file.duration
 
-def get_audio_length(audio_file: str) -> float:
-    """Returns the audio file length in seconds."""
-    with wave.open(audio_file, "r") as f:
-        return f.getnframes() / float(f.getframerate())
+    return media_probe.get_duration(audio_file)
 
 
 def adjust_audio_length_to_video(
-    audio_file: str, video_file: str, output_path: str = None
+    audio_file: str,
+    video_file: str,
+    output_path: str = None,
+    method: str = time_stretch.PHASE_VOCODER,
 ) -> None:
     """Adjusts the audio length of the given audio file to the length of the given video file."""
     output_path = output_path if output_path else audio_file
@@ -109,20 +281,66 @@ def adjust_audio_length_to_video(
         audio_file=audio_file,
         length=length,
         output_path=output_path,
+        method=method,
     )
 
 
-def adjust_audio_length(audio_file: str, length: float, output_path: str = None):
-    """Adjusts the speed of an audio file, so it matches the given length."""
-    output_path = output_path if output_path else audio_file
-    y, sr = librosa.load(audio_file)
-    length_ms = length * 1000
-    factor = (librosa.get_duration(y, sr) * 1000) / length_ms
-    short_y = librosa.effects.time_stretch(y, factor)
+def adjust_audio_length(
+    audio_file,
+    length: float,
+    output_path: str = None,
+    method: str = time_stretch.PHASE_VOCODER,
+):
+    """Adjusts the speed of an audio file, so it matches the given length. Accepts a path or a DecodedAudio object.
+    The audio keeps its sample rate and is written as mono. WSOLA and audio longer than
+    `time_stretch.IN_MEMORY_DURATION` are stretched in blocks, so the memory used does not depend on the length.
+    """
+    duration = get_audio_length(audio_file)
+    if method != time_stretch.WSOLA and duration > time_stretch.IN_MEMORY_DURATION:
+        logging.info(
+            f"{audio_name(audio_file)}: Streaming the time stretch of {duration:.0f} s of audio with {time_stretch.WSOLA}."
+        )
+        method = time_stretch.WSOLA
+
+    if isinstance(audio_file, DecodedAudio):
+        output_path = output_path if output_path else audio_file.path
+        if method == time_stretch.WSOLA:
+            time_stretch.write_stretched(
+                audio_file.mono_blocks(time_stretch.BLOCK_SIZE),
+                audio_file.frames,
+                audio_file.sample_rate,
+                length=length,
+                output_path=output_path,
+            )
+            return
+        y, sr = audio_file.mono(), audio_file.sample_rate
+    else:
+        output_path = output_path if output_path else audio_file
+        if method == time_stretch.WSOLA:
+            time_stretch.stretch_file(audio_file, output_path, length=length)
+            return
+        y, sr = sf.read(str(audio_file), dtype="float32", always_2d=True)
+        y = y.mean(axis=1)
+    short_y = stretch_to_length(y, sr, length, method=method)
 
     sf.write(output_path, short_y, sr)
 
 
+def resample(y, orig_sr: int, target_sr: int):
+    """Resamples the given samples in memory from `orig_sr` to `target_sr`."""
+    import librosa
+
+    return librosa.resample(y, orig_sr=orig_sr, target_sr=target_sr)
+
+
+def stretch_to_length(
+    y, sr: int, length: float, method: str = time_stretch.PHASE_VOCODER
+):
+    """Adjusts the speed of the given samples in memory, so they match the given length in seconds.
+    See `time_stretch.stretch_to_length`."""
+    return time_stretch.stretch_to_length(y, sr, length, method=method)
+
+
 def embed_subtitles_in_mp4(
     video_file: str,
     subtitles_file: str,
@@ -139,8 +357,21 @@ def embed_subtitles_in_mp4(
         f"{os.path.basename(output_path).split('.')[0]}: Embedding subtitle in the video."
     )
 
-    command = f"ffmpeg -i {video_file} -i {subtitles_file} -c copy -c:s mov_text -metadata:s:s:0 language={language} {output_path} -hide_banner -loglevel error"
-    subprocess.call(command, shell=True)
+    run_ffmpeg(
+        [
+            "-i",
+            video_file,
+            "-i",
+            subtitles_file,
+            "-c",
+            "copy",
+            "-c:s",
+            "mov_text",
+            "-metadata:s:s:0",
+            f"language={language}",
+        ],
+        output_path,
+    )
 
 
 def embed_two_subtitles_in_mp4(
@@ -160,8 +391,35 @@ def embed_two_subtitles_in_mp4(
         f"{os.path.basename(output_path).split('.')[0]}: Embedding subtitles in the video."
     )
 
-    command = f"ffmpeg -i {video_file} -i {first_subtitles_file} -i {second_subtitles_file} -metadata:s:s:0 language={first_language} -metadata:s:s:1 language={second_language} -c:v copy -c:a copy -c:s mov_text -map 0:v -map 0:a -map 1:s -map 2:s {output_path} -hide_banner -loglevel error"
-    subprocess.call(command, shell=True)
+    run_ffmpeg(
+        [
+            "-i",
+            video_file,
+            "-i",
+            first_subtitles_file,
+            "-i",
+            second_subtitles_file,
+            "-metadata:s:s:0",
+            f"language={first_language}",
+            "-metadata:s:s:1",
+            f"language={second_language}",
+            "-c:v",
+            "copy",
+            "-c:a",
+            "copy",
+            "-c:s",
+            "mov_text",
+            "-map",
+            "0:v",
+            "-map",
+            "0:a",
+            "-map",
+            "1:s",
+            "-map",
+            "2:s",
+        ],
+        output_path,
+    )
 
 
 def print_subtitles_on_video(
@@ -180,5 +438,4 @@ def print_subtitles_on_video(
         f"{os.path.basename(output_path).split('.')[0]}: Printing subtitles on the video frames."
     )
 
-    command = f"ffmpeg -y -i {video_file} -vf subtitles={subtitles_file} {output_path} -hide_banner -loglevel error"
-    subprocess.call(command, shell=True)
+    run_ffmpeg(["-i", video_file, "-vf", f"subtitles={subtitles_file}"], output_path)
@@ -0,0 +1,171 @@
+"""This module reads the duration of media files without decoding them.
+It parses the `mvhd` box of mp4/mov files and the header of wav files, and falls back to ffprobe for other formats.
+The durations are cached by the path, the modification time and the size of the file.
+"""
+import logging
+import os
+import struct
+import subprocess
+import threading
+
+from utils.audio import read_wav_header
+
+MP4_EXTENSIONS = (".mp4", ".m4a", ".m4v", ".mov")
+
+_durations = {}
+_lock = threading.Lock()
+
+
+def get_duration(path: str) -> float:
+    """Returns the duration of a media file in seconds. The result is cached until the file changes.
+
+    Args:
+        path (str): The path to the video or audio file.
+
+    Raises:
+        RuntimeError: If the duration cannot be determined.
+
+    Returns:
+        float: The duration in seconds.
+    """
+    path = os.path.abspath(str(path))
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+
+    with _lock:
+        cached = _durations.get(path)
+    if cached is not None and cached[0] == key:
+        return cached[1]
+
+    duration = None
+    if path.lower().endswith(MP4_EXTENSIONS):
+        duration = read_mp4_duration(path)
+    if duration is None:
+        duration = read_wav_duration(path)
+    if duration is None:
+        logging.debug(f"Probing the duration of {path} with ffprobe.")
+        duration = probe_duration(path)
+
+    with _lock:
+        _durations[path] = (key, duration)
+    return duration
+
+
+def read_mp4_duration(path: str):
+    """Reads the duration from the movie header (`moov/mvhd`) of an mp4 or mov file.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        float: The duration in seconds, or None if the file has no valid movie header or its duration is 0.
+    """
+    with open(path, "rb") as f:
+        file_size = os.fstat(f.fileno()).st_size
+        moov = _find_box(f, b"moov", 0, file_size)
+        if moov is None:
+            return None
+        mvhd = _find_box(f, b"mvhd", *moov)
+        if mvhd is None:
+            return None
+
+        f.seek(mvhd[0])
+        version = f.read(4)[:1]
+        if version == b"\x01":
+            data = f.read(28)
+            if len(data) < 28:
+                return None
+            timescale, duration = struct.unpack(">16xIQ", data)
+            unknown = duration == 0xFFFFFFFFFFFFFFFF
+        else:
+            data = f.read(16)
+            if len(data) < 16:
+                return None
+            timescale, duration = struct.unpack(">8xII", data)
+            unknown = duration == 0xFFFFFFFF
+
+    # fragmented files write 0 and keep the duration in their fragments, ffprobe reads them
+    if timescale == 0 or duration == 0 or unknown:
+        return None
+    return duration / timescale
+
+
+def read_wav_duration(path: str):
+    """Reads the duration of a wav file from its header.
+
+    Args:
+        path (str): The path to the file.
+
+    Returns:
+        float: The duration in seconds, or None if it is not a wav file.
+    """
+    header = read_wav_header(path)
+    if header is None or not header["sample_rate"] or not header["bits"]:
+        return None
+
+    frame_size = header["channels"] * header["bits"] // 8
+    return header["data_size"] // frame_size / header["sample_rate"]
+
+
+def probe_duration(path: str) -> float:
+    """Reads the duration of a media file with ffprobe.
+
+    Args:
+        path (str): The path to the file.
+
+    Raises:
+        RuntimeError: If ffprobe does not report a duration.
+
+    Returns:
+        float: The duration in seconds.
+    """
+    command = [
+        "ffprobe",
+        "-v",
+        "error",
+        "-show_entries",
+        "format=duration",
+        "-of",
+        "default=noprint_wrappers=1:nokey=1",
+        path,
+    ]
+    try:
+        result = subprocess.run(command, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except FileNotFoundError:
+        raise RuntimeError(
+            f"The duration of {path} could not be determined, ffprobe is not installed."
+        )
+    except ValueError:
+        raise RuntimeError(
+            f"The duration of {path} could not be determined: {result.stderr.strip()}"
+        )
+
+
+def _find_box(f, box_type: bytes, start: int, end: int):
+    """Not intended for external use. Searches the boxes between start and end for the given type.
+
+    Returns:
+        tuple: The start and end of the content of the box, or None if it is not found.
+    """
+    position = start
+    while position + 8 <= end:
+        f.seek(position)
+        size, current_type = struct.unpack(">I4s", f.read(8))
+        header_size = 8
+        if size == 1:
+            large_size = f.read(8)
+            if len(large_size) < 8:
+                return None
+            size = struct.unpack(">Q", large_size)[0]
+            header_size = 16
+        elif size == 0:
+            size = end - position
+        if size < header_size:
+            return None
+
+        if current_type == box_type:
+            return position + header_size, min(position + size, end)
+        position += size
+
+    return None
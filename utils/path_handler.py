@@ -68,6 +68,26 @@ def get_variable_directory() -> Path:
     return get_data_directory() / "variables"
 
 
+def get_report_directory() -> Path:
+    """Returns the path to the report directory."""
+    return get_data_directory() / "reports"
+
+
+def get_cache_directory() -> Path:
+    """Returns the path to the cache directory."""
+    return get_data_directory() / "cache"
+
+
+def get_whisper_cache_directory() -> Path:
+    """Returns the path to the whisper cache directory."""
+    return get_cache_directory() / "whisper"
+
+
+def get_tts_cache_directory() -> Path:
+    """Returns the path to the tts cache directory."""
+    return get_cache_directory() / "tts"
+
+
 PROJECT_DIRECTORY = get_project_directory()
 DATA_DIRECTORY = get_data_directory()
 
@@ -84,6 +104,11 @@ VIDEO_SUBTITLES_DIRECTORY = get_video_subtitles_directory()
 SUBTITLES_DIRECTORY = get_subtitles_directory()
 
 VARIABLE_DIRECTORY = get_variable_directory()
+REPORT_DIRECTORY = get_report_directory()
+
+CACHE_DIRECTORY = get_cache_directory()
+WHISPER_CACHE_DIRECTORY = get_whisper_cache_directory()
+TTS_CACHE_DIRECTORY = get_tts_cache_directory()
 
 
 def create_folders():
@@ -111,3 +136,9 @@ def create_folders():
         os.makedirs(ORIGINAL_VIDEO_SUBTITLES_DIRECTORY)
     if not os.path.exists(VARIABLE_DIRECTORY):
         os.makedirs(VARIABLE_DIRECTORY)
+    if not os.path.exists(REPORT_DIRECTORY):
+        os.makedirs(REPORT_DIRECTORY)
+    if not os.path.exists(WHISPER_CACHE_DIRECTORY):
+        os.makedirs(WHISPER_CACHE_DIRECTORY)
+    if not os.path.exists(TTS_CACHE_DIRECTORY):
+        os.makedirs(TTS_CACHE_DIRECTORY)
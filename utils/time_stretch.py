@@ -0,0 +1,310 @@
+"""This module changes the speed of audio without changing its pitch or its sample rate.
+It offers two methods:
+- the phase vocoder of librosa, which was used so far
+- WSOLA (waveform similarity overlap-add), which is faster and keeps speech natural for moderate rates
+WSOLA also works on a stream of blocks, so files of any length are stretched with constant memory.
+"""
+
+import numpy as np
+import soundfile as sf
+
+PHASE_VOCODER = "phase_vocoder"
+WSOLA = "wsola"
+METHODS = (PHASE_VOCODER, WSOLA)
+
+# the length of a WSOLA frame in seconds, frames overlap by half
+FRAME_DURATION = 0.03
+# the number of frames read from a file at once
+BLOCK_SIZE = 1 << 16
+# the phase vocoder keeps several spectrograms of the whole audio, longer audio is streamed with WSOLA
+IN_MEMORY_DURATION = 10 * 60
+
+
+def time_stretch(
+    y: np.ndarray, rate: float, sample_rate: int, method: str = PHASE_VOCODER
+) -> np.ndarray:
+    """Changes the speed of mono audio. A rate greater than 1 makes the audio faster and shorter.
+
+    Args:
+        y (np.ndarray): The mono samples.
+        rate (float): The factor the speed is multiplied by.
+        sample_rate (int): The sample rate of the samples. It is kept.
+        method (str, optional): `phase_vocoder` or `wsola`. Defaults to `phase_vocoder`.
+
+    Raises:
+        ValueError: If the method is unknown or the rate is not positive.
+
+    Returns:
+        np.ndarray: The stretched samples with about `len(y) / rate` samples.
+    """
+    if rate <= 0:
+        raise ValueError(f"The rate must be positive, but is {rate}.")
+    if method == PHASE_VOCODER:
+        import librosa
+
+        return librosa.effects.time_stretch(np.asarray(y, dtype=np.float32), rate=rate)
+    if method == WSOLA:
+        return wsola(y, rate, sample_rate)
+    raise ValueError(f"Unknown time stretch method {method}, use one of {METHODS}.")
+
+
+def stretch_to_length(
+    y: np.ndarray, sample_rate: int, length: float, method: str = PHASE_VOCODER
+) -> np.ndarray:
+    """Changes the speed of mono audio, so it lasts exactly the given length.
+
+    Args:
+        y (np.ndarray): The mono samples.
+        sample_rate (int): The sample rate of the samples. It is kept.
+        length (float): The length of the result in seconds.
+        method (str, optional): `phase_vocoder` or `wsola`. Defaults to `phase_vocoder`.
+
+    Returns:
+        np.ndarray: The stretched samples with `round(length * sample_rate)` samples.
+    """
+    target = int(round(length * sample_rate))
+    if target <= 0 or len(y) == 0:
+        return np.zeros(max(target, 0), dtype=np.float32)
+
+    stretched = time_stretch(y, len(y) / target, sample_rate, method=method)
+    if len(stretched) >= target:
+        return stretched[:target]
+    return np.pad(stretched, (0, target - len(stretched)))
+
+
+def wsola(
+    y: np.ndarray,
+    rate: float,
+    sample_rate: int,
+    frame_duration: float = FRAME_DURATION,
+) -> np.ndarray:
+    """Changes the speed of mono audio with WSOLA, see `WsolaStretcher`.
+
+    Args:
+        y (np.ndarray): The mono samples.
+        rate (float): The factor the speed is multiplied by.
+        sample_rate (int): The sample rate of the samples.
+        frame_duration (float, optional): The length of a frame in seconds. Defaults to 0.03.
+
+    Returns:
+        np.ndarray: The stretched samples with `round(len(y) / rate)` samples.
+    """
+    stretcher = WsolaStretcher(rate, sample_rate, frame_duration=frame_duration)
+    return np.concatenate((stretcher.process(y), stretcher.flush()))
+
+
+def stretch_file(
+    audio_file: str,
+    output_path: str,
+    length: float,
+    block_size: int = BLOCK_SIZE,
+) -> None:
+    """Changes the speed of an audio file with WSOLA, so it lasts the given length. The file is read and written in
+    blocks, so the memory used does not depend on its length. The result is mono and keeps the sample rate.
+
+    Args:
+        audio_file (str): The path to the audio file.
+        output_path (str): The path to the resulting wav file. It may be the audio file.
+        length (float): The length of the result in seconds.
+        block_size (int, optional): The number of frames read at once. Defaults to 65536.
+    """
+    with sf.SoundFile(str(audio_file)) as source:
+        sample_rate = source.samplerate
+        blocks = (
+            block.mean(axis=1)
+            for block in source.blocks(block_size, dtype="float32", always_2d=True)
+        )
+        write_stretched(
+            blocks, source.frames, sample_rate, length=length, output_path=output_path
+        )
+
+
+def write_stretched(
+    blocks, frames: int, sample_rate: int, length: float, output_path: str
+) -> None:
+    """Stretches mono blocks with WSOLA and writes them to a wav file as they are produced. The file is written next
+    to the output path and replaces it at the end, so the output may also be the source of the blocks.
+
+    Args:
+        blocks (iterable): The mono blocks of the audio.
+        frames (int): The number of frames of all blocks.
+        sample_rate (int): The sample rate of the audio. It is kept.
+        length (float): The length of the result in seconds.
+        output_path (str): The path to the resulting wav file.
+    """
+    # file_handler imports this module
+    from utils.file_handler import atomic_output
+
+    target = int(round(length * sample_rate))
+    with atomic_output(output_path) as tmp_path:
+        with sf.SoundFile(
+            tmp_path, "w", samplerate=sample_rate, channels=1, format="WAV"
+        ) as sink:
+            if frames > 0 and target > 0:
+                stretcher = WsolaStretcher(frames / target, sample_rate)
+                for block in blocks:
+                    sink.write(stretcher.process(block))
+                sink.write(stretcher.flush())
+            # the rounding of the rate may change the length by a sample
+            if sink.frames < target:
+                sink.write(np.zeros(target - sink.frames, dtype=np.float32))
+        if target < sf.info(tmp_path).frames:
+            with sf.SoundFile(tmp_path, "r+") as sink:
+                sink.truncate(target)
+
+
+class WsolaStretcher:
+    """This class changes the speed of mono audio with WSOLA. The output is assembled from windowed frames of the
+    input with a fixed hop. The input frames are taken at the hop times the rate, each shifted within a tolerance, so
+    it continues the waveform of the previous frame as similarly as possible.
+
+    The audio can be passed in blocks of any size. Every frame is computed as soon as its input is available and only
+    the input and output of the current frames are kept. The result does not depend on the block sizes, so there are
+    no seams between blocks.
+    """
+
+    def __init__(
+        self, rate: float, sample_rate: int, frame_duration: float = FRAME_DURATION
+    ):
+        """Creates a WsolaStretcher.
+
+        Args:
+            rate (float): The factor the speed is multiplied by.
+            sample_rate (int): The sample rate of the audio.
+            frame_duration (float, optional): The length of a frame in seconds. Defaults to 0.03.
+
+        Raises:
+            ValueError: If the rate is not positive.
+        """
+        if rate <= 0:
+            raise ValueError(f"The rate must be positive, but is {rate}.")
+        self.rate = rate
+        self.hop = max(int(frame_duration * sample_rate) // 2, 2)
+        self.frame = 2 * self.hop
+        self.tolerance = self.hop // 2
+        # a periodic hann window, whose overlapping halves add up to one
+        self.window = np.hanning(self.frame + 1)[: self.frame].astype(np.float32)
+        # the input is padded with zeros, so the first frames can be shifted as well
+        self.offset = self.hop + self.tolerance
+
+        self._input = np.zeros(self.offset, dtype=np.float32)
+        self._input_start = 0
+        self._received = 0
+        # the frame k covers the output from (k - 1) * hop to (k + 1) * hop, the first hop is dropped
+        self._output = np.zeros(0, dtype=np.float32)
+        self._output_start = 0
+        self._written = 0
+        self._emitted = 0
+        self._index = 0
+        self._previous = None
+
+    def process(self, block: np.ndarray) -> np.ndarray:
+        """Adds the next block of the audio.
+
+        Args:
+            block (np.ndarray): The mono samples.
+
+        Returns:
+            np.ndarray: The output samples that are finished.
+        """
+        block = np.asarray(block, dtype=np.float32)
+        self._input = np.concatenate((self._input, block))
+        self._received += len(block)
+        return self._run(available=self._input_start + len(self._input))
+
+    def flush(self) -> np.ndarray:
+        """Finishes the audio after the last block.
+
+        Returns:
+            np.ndarray: The remaining output samples. All output has `round(samples / rate)` samples.
+        """
+        output_length = int(round(self._received / self.rate))
+        frames = output_length // self.hop + 2
+        end = (
+            self.offset
+            + int(np.ceil(frames * self.hop * self.rate))
+            + self.tolerance
+            + 2 * self.frame
+        )
+        available = self._input_start + len(self._input)
+        if end > available:
+            self._input = np.concatenate(
+                (self._input, np.zeros(end - available, dtype=np.float32))
+            )
+
+        output = self._run(available=end, frames=frames, final=True)
+        output = output[: max(output_length - (self._emitted - len(output)), 0)]
+        return output
+
+    def _run(self, available: int, frames: int = None, final: bool = False):
+        """Not intended for external use. Adds all frames whose input is available and returns the finished output.
+
+        Args:
+            available (int): The end of the available input, including the padding.
+            frames (int, optional): The number of frames of the whole audio, once it is known. Defaults to None.
+            final (bool, optional): Whether to return all output. Defaults to False.
+        """
+        hop, frame, tolerance = self.hop, self.frame, self.tolerance
+        while frames is None or self._index < frames:
+            k = self._index
+            position = self.offset + int(round(k * hop * self.rate)) - hop
+            if self._previous is None:
+                end = position + frame
+            else:
+                end = max(position + tolerance + frame, self._previous + hop + frame)
+            if end > available:
+                break
+
+            if self._previous is not None:
+                # the natural continuation of the previous frame
+                template = self._slice(self._previous + hop, frame)
+                region = self._slice(position - tolerance, frame + 2 * tolerance)
+                similarity = np.correlate(region, template, mode="valid")
+                position += int(np.argmax(similarity)) - tolerance
+
+            start = k * hop - self._output_start
+            if len(self._output) < start + frame:
+                # the buffer grows by doubling, so large blocks are not copied for every frame
+                grown = np.zeros(max(start + frame, 2 * len(self._output)), np.float32)
+                grown[: len(self._output)] = self._output
+                self._output = grown
+            self._written = start + frame
+            self._output[start : start + frame] += self.window * self._slice(
+                position, frame
+            )
+            self._previous = position
+            self._index += 1
+
+        # the input before the next frames is not needed anymore
+        next_position = (
+            self.offset + int(round(self._index * hop * self.rate)) - hop - tolerance
+        )
+        keep = (
+            next_position
+            if self._previous is None
+            else min(next_position, self._previous + hop)
+        )
+        if keep > self._input_start:
+            self._input = self._input[keep - self._input_start :]
+            self._input_start = keep
+
+        # the output before the next frame is finished
+        finished = self._written if final else self._index * hop - self._output_start
+        output = self._output[:finished].copy()
+        self._output[: self._written - finished] = self._output[
+            finished : self._written
+        ]
+        self._output[self._written - finished : self._written] = 0
+        self._written -= finished
+        self._output_start += finished
+
+        # the first hop of the output is dropped
+        drop = max(hop - (self._output_start - finished), 0)
+        output = output[drop:]
+        self._emitted += len(output)
+        return output
+
+    def _slice(self, start: int, length: int) -> np.ndarray:
+        """Not intended for external use. Returns a part of the padded input."""
+        start -= self._input_start
+        return self._input[start : start + length]
@@ -0,0 +1,320 @@
+"""This module contains a lightweight tracer for the stages of the translation.
+It records the wall time, the cpu time and the real-time factor (the wall time per second of lecture audio) of every
+stage of every lecture. The records are exported as a json run report and as a Prometheus textfile, and the observed
+real-time factors estimate the remaining time of a run.
+"""
+import json
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from utils.file_handler import atomic_output
+
+METRIC_PREFIX = "lecture_translation"
+
+
+class Tracer:
+    """This class records spans of the stages of lectures. Spans of the same stage and lecture are summed up, so a
+    step that runs once per segment, e.g. stretching, is recorded as one stage. The tracer can be used by several
+    threads at once.
+
+    The cpu time is the time of the thread running the stage. Subprocesses like ffmpeg and the processes of the TTS
+    workers are not included.
+    """
+
+    def __init__(self, stages: list, workers: dict = None):
+        """Creates an empty Tracer.
+
+        Args:
+            stages (list): The stages every lecture passes in order. They are used to estimate the remaining time.
+                           Other stages, e.g. parts of a stage, can also be recorded.
+            workers (dict, optional): The number of threads of the stages that run in several threads. Defaults to one
+                                      thread per stage.
+        """
+        self.stages = list(stages)
+        self.workers = workers or {}
+        self.started = time.time()
+        self.lectures = {}
+        self.records = {}
+        self._lock = threading.Lock()
+
+    def add_lecture(self, name: str, audio_seconds: float, stages: list = None) -> None:
+        """Registers a lecture and the length of its audio, which the real-time factors refer to.
+
+        Args:
+            name (str): The name of the lecture.
+            audio_seconds (float): The length of the audio of the lecture in seconds.
+            stages (list, optional): The stages the lecture runs, e.g. without the stages that are still valid from a
+                                     previous run. Only these are part of the estimate. Defaults to all stages.
+        """
+        with self._lock:
+            self.lectures[name] = {
+                "audio_seconds": audio_seconds,
+                "planned_stages": list(self.stages if stages is None else stages),
+                "status": "pending",
+            }
+
+    def plan_stages(self, name: str, stages: list) -> None:
+        """Sets the stages a registered lecture runs, e.g. once it is known where the lecture resumes. See
+        `add_lecture`."""
+        with self._lock:
+            self.lectures[name]["planned_stages"] = list(stages)
+
+    def finish_lecture(self, name: str, error: Exception = None) -> None:
+        """Marks a lecture as finished or failed. Its remaining stages are not part of the estimate anymore."""
+        with self._lock:
+            self.lectures[name]["status"] = "finished" if error is None else "failed"
+
+    @contextmanager
+    def span(self, stage: str, lecture: str, skipped: bool = False):
+        """Records the time spent in the block as part of a stage of a lecture.
+
+        Args:
+            stage (str): The name of the stage.
+            lecture (str): The name of the lecture.
+            skipped (bool, optional): Whether the stage was skipped, e.g. since it is still valid from a previous
+                                      run. Skipped stages are not part of the real-time factors. Defaults to False.
+        """
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(
+                stage,
+                lecture,
+                time.perf_counter() - wall,
+                time.thread_time() - cpu,
+                skipped,
+            )
+
+    def add(
+        self,
+        stage: str,
+        lecture: str,
+        wall_seconds: float,
+        cpu_seconds: float,
+        skipped: bool = False,
+    ) -> None:
+        """Adds a measured time to a stage of a lecture. See `span`."""
+        with self._lock:
+            record = self.records.setdefault(
+                (stage, lecture),
+                {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0, "skipped": True},
+            )
+            record["wall_seconds"] += wall_seconds
+            record["cpu_seconds"] += cpu_seconds
+            record["calls"] += 1
+            record["skipped"] = record["skipped"] and skipped
+
+    def realtime_factors(self) -> dict:
+        """Returns the observed real-time factor of every stage, the wall time of all lectures that ran the stage
+        divided by the length of their audio."""
+        with self._lock:
+            return self._realtime_factors()
+
+    def eta(self):
+        """Estimates the remaining time of the run in seconds from the observed real-time factors. The stages run in
+        parallel, so the run takes as long as the stage with the most remaining work.
+
+        Returns:
+            float | None: The remaining seconds, or None if a stage with remaining work has not been observed yet.
+        """
+        with self._lock:
+            return self._eta()
+
+    def report(self) -> dict:
+        """Returns the run report with the lectures, the records of their stages and the totals of every stage."""
+        with self._lock:
+            factors = self._realtime_factors()
+            lectures = {}
+            for name, lecture in self.lectures.items():
+                lectures[name] = dict(lecture, stages={})
+                for (stage, record_lecture), record in self.records.items():
+                    if record_lecture == name:
+                        lectures[name]["stages"][stage] = dict(
+                            record,
+                            realtime_factor=_realtime_factor(
+                                record["wall_seconds"], lecture["audio_seconds"]
+                            ),
+                        )
+
+            stages = {}
+            for (stage, name), record in self.records.items():
+                total = stages.setdefault(
+                    stage, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "lectures": 0}
+                )
+                total["wall_seconds"] += record["wall_seconds"]
+                total["cpu_seconds"] += record["cpu_seconds"]
+                total["lectures"] += 1
+            for stage, total in stages.items():
+                total["realtime_factor"] = factors.get(stage)
+
+            return {
+                "started": time.strftime(
+                    "%Y-%m-%dT%H:%M:%S", time.localtime(self.started)
+                ),
+                "elapsed_seconds": time.time() - self.started,
+                "eta_seconds": self._eta(),
+                "stages": stages,
+                "lectures": lectures,
+            }
+
+    def write_report(self, path: str) -> None:
+        """Writes the run report as json. The file is replaced atomically, so it can be read during the run."""
+        with atomic_output(str(path)) as tmp_path:
+            with open(tmp_path, "w") as f:
+                json.dump(self.report(), f, indent=2)
+
+    def write_prometheus(self, path: str) -> None:
+        """Writes the records in the Prometheus text format, e.g. for the textfile collector of the node exporter.
+        The file is replaced atomically, as the collector expects."""
+        report = self.report()
+        lines = []
+
+        def metric(name: str, kind: str, description: str, samples: list) -> None:
+            lines.append(f"# HELP {METRIC_PREFIX}_{name} {description}")
+            lines.append(f"# TYPE {METRIC_PREFIX}_{name} {kind}")
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ",".join(
+                    f'{key}="{_escape(str(label))}"' for key, label in labels.items()
+                )
+                lines.append(f"{METRIC_PREFIX}_{name}{{{label_text}}} {value!r}")
+
+        per_stage = [
+            (name, stage, record)
+            for name, lecture in report["lectures"].items()
+            for stage, record in lecture["stages"].items()
+        ]
+        metric(
+            "stage_wall_seconds",
+            "gauge",
+            "The wall time of a stage of a lecture.",
+            [
+                ({"lecture": name, "stage": stage}, record["wall_seconds"])
+                for name, stage, record in per_stage
+            ],
+        )
+        metric(
+            "stage_cpu_seconds",
+            "gauge",
+            "The cpu time of the thread running a stage of a lecture.",
+            [
+                ({"lecture": name, "stage": stage}, record["cpu_seconds"])
+                for name, stage, record in per_stage
+            ],
+        )
+        metric(
+            "stage_realtime_factor",
+            "gauge",
+            "The wall time of a stage per second of lecture audio.",
+            [
+                ({"stage": stage}, total["realtime_factor"])
+                for stage, total in report["stages"].items()
+            ],
+        )
+        metric(
+            "audio_seconds",
+            "gauge",
+            "The length of the audio of a lecture.",
+            [
+                ({"lecture": name}, lecture["audio_seconds"])
+                for name, lecture in report["lectures"].items()
+            ],
+        )
+        metric(
+            "lectures",
+            "gauge",
+            "The number of lectures by their status.",
+            [
+                (
+                    {"status": status},
+                    sum(
+                        lecture["status"] == status
+                        for lecture in report["lectures"].values()
+                    ),
+                )
+                for status in ("pending", "finished", "failed")
+            ],
+        )
+        metric(
+            "elapsed_seconds",
+            "gauge",
+            "The time since the run started.",
+            [({}, report["elapsed_seconds"])],
+        )
+        metric(
+            "eta_seconds",
+            "gauge",
+            "The estimated remaining time of the run.",
+            [({}, report["eta_seconds"])],
+        )
+
+        with atomic_output(str(path)) as tmp_path:
+            with open(tmp_path, "w") as f:
+                f.write("\n".join(lines) + "\n")
+
+    def log_summary(self) -> None:
+        """Logs the totals of every stage."""
+        for stage, total in self.report()["stages"].items():
+            factor = total["realtime_factor"]
+            logging.info(
+                f"{stage}: {total['wall_seconds']:.1f} s wall, {total['cpu_seconds']:.1f} s cpu, "
+                f"real-time factor {'unknown' if factor is None else f'{factor:.3f}'}."
+            )
+
+    def _realtime_factors(self) -> dict:
+        """Not intended for external use. Computes the real-time factors, the lock must be held."""
+        totals = {}
+        for (stage, name), record in self.records.items():
+            lecture = self.lectures.get(name)
+            if record["skipped"] or not lecture or not lecture["audio_seconds"]:
+                continue
+            wall, audio = totals.get(stage, (0.0, 0.0))
+            totals[stage] = (
+                wall + record["wall_seconds"],
+                audio + lecture["audio_seconds"],
+            )
+        return {stage: wall / audio for stage, (wall, audio) in totals.items()}
+
+    def _eta(self):
+        """Not intended for external use. Computes the estimate, the lock must be held."""
+        factors = self._realtime_factors()
+        remaining = 0.0
+        for stage in self.stages:
+            audio = sum(
+                lecture["audio_seconds"]
+                for name, lecture in self.lectures.items()
+                if lecture["status"] == "pending"
+                and stage in lecture["planned_stages"]
+                and (stage, name) not in self.records
+            )
+            if not audio:
+                continue
+            if stage not in factors:
+                return None
+            remaining = max(
+                remaining, audio * factors[stage] / self.workers.get(stage, 1)
+            )
+        return remaining
+
+
+def format_eta(seconds) -> str:
+    """Formats an estimated remaining time, e.g. `1:02:03`."""
+    if seconds is None:
+        return "unknown"
+    minutes, seconds = divmod(int(round(seconds)), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{seconds:02d}"
+
+
+def _realtime_factor(wall_seconds: float, audio_seconds: float):
+    """Not intended for external use. Returns the wall time per second of audio, or None without audio."""
+    return wall_seconds / audio_seconds if audio_seconds else None
+
+
+def _escape(value: str) -> str:
+    """Not intended for external use. Escapes a label value of the Prometheus text format."""
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
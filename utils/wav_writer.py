@@ -0,0 +1,145 @@
+"""This module contains an append-only wav writer. It is used to assemble audio that is too long to be kept in memory."""
+import logging
+import struct
+
+import numpy as np
+
+from utils.file_handler import AtomicOutput, resample
+
+HEADER_SIZE = 44
+SILENCE_CHUNK_FRAMES = 65_536
+
+
+class StreamingWavWriter:
+    """This class appends 16 bit PCM frames to an open wav file and patches the RIFF header when it is closed.
+    Its memory use does not depend on the length of the written audio. The audio is written to a temporary file, which
+    only replaces the output path once the writer is closed without an error."""
+
+    def __init__(self, output_path: str, sample_rate: int, channels: int = 1):
+        """Opens the wav file and writes a placeholder header.
+
+        Args:
+            output_path (str): The path of the created audio file.
+            sample_rate (int): The sample rate of the written audio.
+            channels (int, optional): The number of channels. Defaults to 1.
+        """
+        self.output_path = str(output_path)
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.frames_written = 0
+
+        self._output = AtomicOutput(self.output_path)
+        self._file = open(self._output.tmp_path, "wb")
+        self._write_header()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    @property
+    def position(self) -> float:
+        """The length of the written audio in seconds."""
+        return self.frames_written / self.sample_rate
+
+    def write(
+        self,
+        start: float,
+        samples: np.ndarray,
+        sample_rate: int = None,
+        duration: float = None,
+    ) -> None:
+        """Appends samples at the given start. The gap to the end of the written audio is filled with silence.
+        Samples overlapping audio that has already been written are dropped.
+
+        Args:
+            start (float): The start of the samples in seconds.
+            samples (np.ndarray): The float samples to write.
+            sample_rate (int, optional): The sample rate of the samples. They are resampled to the sample rate of the
+                                         file if it differs. Defaults to None.
+            duration (float, optional): The maximum duration of the written samples in seconds. Defaults to None.
+        """
+        if sample_rate and sample_rate != self.sample_rate:
+            samples = resample(samples, sample_rate, self.sample_rate)
+
+        offset = int(round(start * self.sample_rate))
+        end = offset + len(samples)
+        if duration is not None:
+            end = min(end, offset + int(round(duration * self.sample_rate)))
+
+        self._pad_to(offset)
+        samples = samples[max(self.frames_written - offset, 0) : max(end - offset, 0)]
+        self._append(samples)
+
+    def write_silence(self, start: float, duration: float) -> None:
+        """Appends silence until the end of the given silence.
+
+        Args:
+            start (float): The start of the silence in seconds.
+            duration (float): The duration of the silence in seconds.
+        """
+        self._pad_to(int(round((start + duration) * self.sample_rate)))
+
+    def close(self) -> None:
+        """Patches the sizes in the RIFF header and closes the file."""
+        if self._file.closed:
+            return
+
+        data_size = self.frames_written * self.channels * 2
+        self._file.seek(4)
+        self._file.write(struct.pack("<I", HEADER_SIZE - 8 + data_size))
+        self._file.seek(40)
+        self._file.write(struct.pack("<I", data_size))
+        self._file.close()
+        self._output.commit()
+        logging.debug(f"Wrote {self.position:.2f}s of audio to {self.output_path}.")
+
+    def abort(self) -> None:
+        """Closes and deletes the unfinished file. The output path is not changed."""
+        if not self._file.closed:
+            self._file.close()
+        self._output.abort()
+
+    def _write_header(self) -> None:
+        """Not intended for external use. Writes a wav header with empty sizes."""
+        block_align = self.channels * 2
+        self._file.write(
+            struct.pack(
+                "<4sI4s4sIHHIIHH4sI",
+                b"RIFF",
+                0,
+                b"WAVE",
+                b"fmt ",
+                16,
+                1,
+                self.channels,
+                self.sample_rate,
+                self.sample_rate * block_align,
+                block_align,
+                16,
+                b"data",
+                0,
+            )
+        )
+
+    def _pad_to(self, frame: int) -> None:
+        """Not intended for external use. Appends silence until the given frame is reached."""
+        while self.frames_written < frame:
+            frames = min(frame - self.frames_written, SILENCE_CHUNK_FRAMES)
+            self._append(np.zeros((frames, self.channels), dtype=np.float32))
+
+    def _append(self, samples: np.ndarray) -> None:
+        """Not intended for external use. Converts float samples to 16 bit PCM and appends them to the file."""
+        if len(samples) == 0:
+            return
+
+        if samples.ndim == 1:
+            samples = np.repeat(samples[:, np.newaxis], self.channels, axis=1)
+
+        pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype("<i2")
+        self._file.write(pcm.tobytes())
+        self.frames_written += len(pcm)